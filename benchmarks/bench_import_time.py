@@ -0,0 +1,87 @@
+"""Import-time benchmark for the server module.
+
+Runs ``python -X importtime`` in fresh interpreters, parses its report and prints
+the cumulative import time of the server module and of the heavy third-party
+packages it may pull in. Provider SDKs should only appear once a server builds
+its LLM client.
+
+Run from the repository root::
+
+    PYTHONPATH=src python benchmarks/bench_import_time.py [--runs 5] [--json]
+"""
+
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+from typing import Dict
+
+TRACKED_PACKAGES = (
+    "insight.server",
+    "mcp",
+    "langchain_core",
+    "langchain",
+    "langchain_openai",
+    "langchain_anthropic",
+    "openai",
+    "anthropic",
+    "tiktoken",
+)
+
+_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)$")
+
+
+def measure(statement: str) -> Dict[str, float]:
+    """Return the cumulative import time in seconds of each tracked package."""
+    env = {**os.environ, "OPENAI_API_KEY": os.getenv("OPENAI_API_KEY", "benchmark")}
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        capture_output=True,
+        text=True,
+        env=env,
+        check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        match = _LINE.match(line)
+        if match and match.group(4) in TRACKED_PACKAGES:
+            times[match.group(4)] = int(match.group(2)) / 1e6
+    return times
+
+
+def main():
+    """Run the import-time benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5, help="interpreter launches")
+    parser.add_argument(
+        "--statement",
+        default="import insight.server",
+        help="statement to time, e.g. 'from insight.server import WorkflowServer; "
+        "WorkflowServer()'",
+    )
+    parser.add_argument("--json", action="store_true", help="print JSON results")
+    args = parser.parse_args()
+
+    runs = [measure(args.statement) for _ in range(args.runs)]
+    results = {
+        package: statistics.median(run.get(package, 0.0) for run in runs)
+        for package in TRACKED_PACKAGES
+        if any(package in run for run in runs)
+    }
+
+    if args.json:
+        print(json.dumps({"statement": args.statement, "median_seconds": results}))
+        return
+    print(f"{args.statement!r}, median of {args.runs} runs")
+    for package, seconds in results.items():
+        print(f"  {package:<24} {seconds * 1000:8.1f} ms")
+    for package in TRACKED_PACKAGES:
+        if package not in results:
+            print(f"  {package:<24} {'not imported':>11}")
+
+
+if __name__ == "__main__":
+    main()
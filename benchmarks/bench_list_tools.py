@@ -0,0 +1,75 @@
+"""Micro-benchmark for the tools/list request.
+
+Compares rebuilding every phase's ``Tool`` objects on each request (the previous
+behaviour) with the cached listing served by the tool registry.
+
+Run from the repository root::
+
+    PYTHONPATH=src python benchmarks/bench_list_tools.py
+"""
+
+import asyncio
+import timeit
+
+import mcp.types as types
+
+from insight.handlers import (
+    architecture_handlers,
+    concept_handlers,
+    implementation_handlers,
+    integration_test_handlers,
+    requirements_handlers,
+)
+from insight.server import WorkflowServer
+
+ITERATIONS = 10_000
+
+
+def rebuild_tools() -> list[types.Tool]:
+    """Build the tool list from scratch the way every request used to."""
+    return [
+        *concept_handlers.get_concept_tools(),
+        *architecture_handlers.get_architecture_tools(),
+        *requirements_handlers.get_requirements_tools(),
+        *implementation_handlers.get_implementation_tools(),
+        *integration_test_handlers.get_integration_test_tools(),
+    ]
+
+
+def report(label: str, seconds: float) -> None:
+    """Print the per-call cost of a benchmark case."""
+    print(f"{label:<32} {seconds / ITERATIONS * 1e6:10.2f} us/call")
+
+
+def main():
+    """Run the tools/list benchmark cases."""
+    server = WorkflowServer()
+    handler = server.server.request_handlers[types.ListToolsRequest]
+    request = types.ListToolsRequest(method="tools/list")
+    loop = asyncio.new_event_loop()
+
+    def rebuild_and_serialize():
+        types.ListToolsResult(tools=rebuild_tools()).model_dump(
+            mode="json", by_alias=True, exclude_none=True
+        )
+
+    report("rebuild tools", timeit.timeit(rebuild_tools, number=ITERATIONS))
+    report(
+        "rebuild + serialize",
+        timeit.timeit(rebuild_and_serialize, number=ITERATIONS),
+    )
+    report(
+        "registry.list_tools",
+        timeit.timeit(server.registry.list_tools, number=ITERATIONS),
+    )
+    report(
+        "tools/list request handler",
+        timeit.timeit(
+            lambda: loop.run_until_complete(handler(request)), number=ITERATIONS
+        ),
+    )
+    loop.close()
+
+
+if __name__ == "__main__":
+    main()
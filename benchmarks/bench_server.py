@@ -0,0 +1,337 @@
+"""End-to-end server benchmark with a deterministic fake LLM.
+
+Drives a ``WorkflowServer`` through in-memory MCP streams, the same request path a
+client takes minus the transport, with the LLM replaced by
+``fake_llm.FakeStreamingChatModel``. Each scenario runs at several concurrency
+levels and reports latency percentiles and throughput. Results can be written as
+JSON and compared against a stored baseline, failing when a scenario regresses
+beyond the tolerance. The comparison is only advisory, reporting regressions
+without failing, when the baseline was recorded on another Python minor version
+or MCP SDK version.
+
+Run from the repository root::
+
+    PYTHONPATH=src python benchmarks/bench_server.py
+    PYTHONPATH=src python benchmarks/bench_server.py --json results.json
+    PYTHONPATH=src python benchmarks/bench_server.py --update-baseline
+
+The response cache is disabled and the gateway's rate limits are lifted, so every
+LLM-backed request reaches the fake model.
+"""
+
+import argparse
+import asyncio
+import importlib.metadata
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from typing import Any, Awaitable, Callable, Dict, List
+
+os.environ["INSIGHT_CACHE_ENABLED"] = "false"
+os.environ["INSIGHT_METRICS_TEXTFILE"] = ""
+for limit in ("RPM", "TPM", "MAX_CONCURRENCY"):
+    os.environ[f"INSIGHT_LLM_{limit}"] = "1000000000"
+
+from fake_llm import FakeStreamingChatModel  # noqa: E402
+from mcp.client.session import ClientSession  # noqa: E402
+from mcp.shared.memory import create_connected_server_and_client_session  # noqa: E402
+
+from insight.llm.gateway import with_gateway  # noqa: E402
+from insight.server import WorkflowServer  # noqa: E402
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+DEFAULT_CONCURRENCY = (1, 10, 100)
+DEFAULT_TOLERANCE = 0.25
+
+BRIEF = """# Product brief
+
+A command-line tool that keeps a personal reading list, with tags, notes and an
+export to Markdown.
+"""
+
+REQUIREMENTS = """# Requirements
+
+## 1. Functional Requirements
+1.1 The tool MUST add, list and remove reading list entries.
+1.2 The tool MUST support tags on entries.
+1.3 The tool SHOULD export the list to Markdown.
+
+## 2. Non-Functional Requirements
+2.1 The tool MUST store its data in a single local file.
+"""
+
+Request = Callable[[ClientSession, int], Awaitable[Any]]
+
+
+def build_scenarios(workdir: str) -> Dict[str, Request]:
+    """Return the benchmark scenarios keyed by name."""
+    requirements_path = os.path.join(workdir, "requirements-input.md")
+    with open(requirements_path, "w") as f:
+        f.write(REQUIREMENTS)
+
+    def brief_path(index: int) -> str:
+        # Each brief gets its own directory since requirements.md is written next
+        # to it
+        directory = os.path.join(workdir, f"brief-{index % 100}")
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, "brief.md")
+        if not os.path.exists(path):
+            with open(path, "w") as f:
+                f.write(BRIEF)
+        return path
+
+    async def list_tools(session: ClientSession, index: int) -> Any:
+        return await session.list_tools()
+
+    async def get_prompt(session: ClientSession, index: int) -> Any:
+        return await session.call_tool(
+            "get_concept_prompt", {"prompt_name": "concept_refinement"}
+        )
+
+    async def generate_requirements(session: ClientSession, index: int) -> Any:
+        return await session.call_tool(
+            "generate_requirements", {"brief_path": brief_path(index)}
+        )
+
+    async def assess_requirements(session: ClientSession, index: int) -> Any:
+        return await session.call_tool(
+            "assess_requirements", {"requirements_path": requirements_path}
+        )
+
+    for index in range(100):
+        brief_path(index)
+    return {
+        "list_tools": list_tools,
+        "get_prompt": get_prompt,
+        "generate_requirements": generate_requirements,
+        "assess_requirements": assess_requirements,
+    }
+
+
+async def run_case(
+    session: ClientSession, request: Request, concurrency: int, requests: int
+) -> Dict[str, float]:
+    """Run ``requests`` requests with at most ``concurrency`` in flight."""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+
+    async def one(index: int) -> None:
+        async with semaphore:
+            start = time.perf_counter()
+            result = await request(session, index)
+            latencies.append(time.perf_counter() - start)
+            if getattr(result, "isError", False):
+                raise RuntimeError(f"Request failed: {result.content[0].text}")
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(index) for index in range(requests)))
+    elapsed = time.perf_counter() - start
+    ordered = sorted(latencies)
+    return {
+        "requests": requests,
+        "p50_ms": statistics.median(ordered) * 1000,
+        "p95_ms": ordered[min(int(len(ordered) * 0.95), len(ordered) - 1)] * 1000,
+        "mean_ms": statistics.fmean(ordered) * 1000,
+        "throughput_rps": requests / elapsed,
+    }
+
+
+async def run_benchmarks(args: argparse.Namespace) -> Dict[str, Any]:
+    """Run every selected scenario at every concurrency level."""
+    fake = FakeStreamingChatModel(
+        first_token_latency=args.llm_latency,
+        tokens_per_second=args.tokens_per_second,
+        output_tokens=args.output_tokens,
+    )
+    server = WorkflowServer()
+    server.llm = with_gateway(fake)
+    results: Dict[str, Any] = {}
+
+    with tempfile.TemporaryDirectory() as workdir:
+        scenarios = build_scenarios(workdir)
+        selected = args.scenario or list(scenarios)
+        async with create_connected_server_and_client_session(server.server) as session:
+            for name in selected:
+                request = scenarios[name]
+                await run_case(session, request, 1, args.warmup)
+                for concurrency in args.concurrency:
+                    requests = max(args.requests, concurrency)
+                    case = await run_case(session, request, concurrency, requests)
+                    results[f"{name}@{concurrency}"] = {
+                        "scenario": name,
+                        "concurrency": concurrency,
+                        **{key: round(value, 3) for key, value in case.items()},
+                    }
+
+    return {
+        "python": platform.python_version(),
+        "mcp": importlib.metadata.version("mcp"),
+        "platform": platform.platform(),
+        "fake_llm": {
+            "first_token_latency": fake.first_token_latency,
+            "tokens_per_second": fake.tokens_per_second,
+            "output_tokens": fake.output_tokens,
+            "model_ms_per_call": round(fake.model_seconds * 1000, 3),
+        },
+        "results": results,
+    }
+
+
+def environment_mismatches(
+    results: Dict[str, Any], baseline: Dict[str, Any]
+) -> List[str]:
+    """Return how the environment of the results differs from the baseline's.
+
+    Only the Python minor version and the MCP SDK version are compared; results
+    from other environments are not comparable with the baseline.
+    """
+    mismatches = []
+    python = results["python"].rsplit(".", 1)[0]
+    base_python = str(baseline.get("python", "unknown")).rsplit(".", 1)[0]
+    if python != base_python:
+        mismatches.append(
+            f"baseline was recorded on Python {base_python}, not {python}"
+        )
+    if results["mcp"] != baseline.get("mcp"):
+        mismatches.append(
+            f"baseline was recorded with mcp {baseline.get('mcp', 'unknown')}, "
+            f"not {results['mcp']}"
+        )
+    return mismatches
+
+
+def compare(
+    results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float
+) -> List[str]:
+    """Return descriptions of the cases that regressed against the baseline.
+
+    A case regresses when its median latency grows, or its throughput drops, by
+    more than ``tolerance`` relative to the baseline.
+    """
+    regressions = []
+    for key, case in results["results"].items():
+        base = baseline["results"].get(key)
+        if base is None:
+            continue
+        if case["p50_ms"] > base["p50_ms"] * (1 + tolerance):
+            regressions.append(
+                f"{key}: p50 {case['p50_ms']:.2f} ms vs baseline {base['p50_ms']:.2f} ms"
+            )
+        if case["throughput_rps"] < base["throughput_rps"] * (1 - tolerance):
+            regressions.append(
+                f"{key}: {case['throughput_rps']:.1f} req/s vs baseline "
+                f"{base['throughput_rps']:.1f} req/s"
+            )
+    return regressions
+
+
+def print_table(results: Dict[str, Any], baseline: Dict[str, Any]) -> None:
+    """Print the results, with the change against the baseline if available."""
+    print(
+        f"fake LLM: {results['fake_llm']['model_ms_per_call']} ms per call "
+        f"({results['fake_llm']['output_tokens']} output tokens)"
+    )
+    print(f"{'case':<28} {'p50 ms':>9} {'p95 ms':>9} {'req/s':>10} {'p50 vs base':>12}")
+    for key, case in results["results"].items():
+        base = baseline.get("results", {}).get(key)
+        change = ""
+        if base:
+            change = f"{(case['p50_ms'] / base['p50_ms'] - 1) * 100:+.1f}%"
+        print(
+            f"{key:<28} {case['p50_ms']:9.2f} {case['p95_ms']:9.2f} "
+            f"{case['throughput_rps']:10.1f} {change:>12}"
+        )
+
+
+def main():
+    """Run the server benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--scenario",
+        action="append",
+        choices=[
+            "list_tools",
+            "get_prompt",
+            "generate_requirements",
+            "assess_requirements",
+        ],
+        help="scenario to run; repeat for several (default: all)",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        nargs="+",
+        default=list(DEFAULT_CONCURRENCY),
+        help="concurrency levels",
+    )
+    parser.add_argument("--requests", type=int, default=200, help="requests per case")
+    parser.add_argument(
+        "--warmup", type=int, default=5, help="warmup requests per scenario"
+    )
+    parser.add_argument(
+        "--llm-latency",
+        type=float,
+        default=0.01,
+        help="fake time to first token in seconds",
+    )
+    parser.add_argument(
+        "--tokens-per-second",
+        type=float,
+        default=20_000.0,
+        help="fake token throughput",
+    )
+    parser.add_argument(
+        "--output-tokens", type=int, default=200, help="fake response length"
+    )
+    parser.add_argument("--json", metavar="PATH", help="write the results as JSON")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="baseline JSON file")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=DEFAULT_TOLERANCE,
+        help="allowed relative regression before failing",
+    )
+    parser.add_argument(
+        "--update-baseline",
+        action="store_true",
+        help="store the results as the new baseline",
+    )
+    args = parser.parse_args()
+
+    results = asyncio.run(run_benchmarks(args))
+
+    baseline: Dict[str, Any] = {}
+    if os.path.exists(args.baseline) and not args.update_baseline:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+    print_table(results, baseline)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.update_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+            f.write("\n")
+        print(f"Baseline written to {args.baseline}")
+        return
+
+    if baseline:
+        regressions = compare(results, baseline, args.tolerance)
+        mismatches = environment_mismatches(results, baseline)
+        for mismatch in mismatches:
+            print(f"Warning: {mismatch}; the comparison is advisory", file=sys.stderr)
+        if regressions:
+            print("Regressions against the baseline:", file=sys.stderr)
+            for regression in regressions:
+                print(f"  {regression}", file=sys.stderr)
+            if not mismatches:
+                sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
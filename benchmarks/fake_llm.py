@@ -0,0 +1,101 @@
+"""Deterministic fake chat model for offline benchmarks.
+
+The model answers every request with the same text after a fixed time to first
+token, then streams the remaining tokens at a fixed rate, so the time spent in
+the model is known and any remaining latency is server overhead.
+"""
+
+import asyncio
+from typing import Any, AsyncIterator, List, Optional
+
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForLLMRun,
+    CallbackManagerForLLMRun,
+)
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+# Tokens emitted per streamed chunk; sleeping per token would measure the event
+# loop rather than the server
+CHUNK_TOKENS = 16
+
+
+class FakeStreamingChatModel(BaseChatModel):
+    """Chat model with configurable latency and token throughput."""
+
+    first_token_latency: float = 0.01
+    tokens_per_second: float = 20_000.0
+    output_tokens: int = 200
+    model_name: str = "fake-benchmark-model"
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-benchmark"
+
+    def response_text(self) -> str:
+        """Return the response, one word per token, ending with a score line."""
+        words = " ".join(f"word{i % 97}" for i in range(max(self.output_tokens - 4, 0)))
+        return f"{words}\nScore: 7/10"
+
+    @property
+    def model_seconds(self) -> float:
+        """Time one request spends in the model."""
+        return self.first_token_latency + self.output_tokens / self.tokens_per_second
+
+    def _usage(self, messages: List[BaseMessage]) -> dict:
+        input_tokens = sum(len(str(message.content)) // 4 for message in messages)
+        return {
+            "input_tokens": input_tokens,
+            "output_tokens": self.output_tokens,
+            "total_tokens": input_tokens + self.output_tokens,
+        }
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        message = AIMessage(
+            content=self.response_text(), usage_metadata=self._usage(messages)
+        )
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        await asyncio.sleep(self.model_seconds)
+        return self._generate(messages, stop, **kwargs)
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        # Chunks are paced against the start time so that oversleeping does not
+        # accumulate into the measured latency
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        words = self.response_text().split(" ")
+        for first in range(0, len(words), CHUNK_TOKENS):
+            due = (
+                start
+                + self.first_token_latency
+                + (first + CHUNK_TOKENS) / self.tokens_per_second
+            )
+            await asyncio.sleep(max(due - loop.time(), 0))
+            text = " ".join(words[first : first + CHUNK_TOKENS])
+            if first + CHUNK_TOKENS < len(words):
+                text += " "
+            yield ChatGenerationChunk(message=AIMessageChunk(content=text))
+        yield ChatGenerationChunk(
+            message=AIMessageChunk(content="", usage_metadata=self._usage(messages))
+        )
@@ -1,18 +1,63 @@
 """Main entry point for the insight MCP server.
 
-This module initializes and runs the MCP workflow server.
+This module initializes and runs the MCP workflow server. By default it serves a
+single client over stdio; ``--transport streamable-http`` or ``--transport sse``
+runs one long-lived process serving many clients over HTTP instead, and
+``--workers`` spreads streamable HTTP clients over several processes.
 """
 
 # !/usr/bin/env python3
+import argparse
 import asyncio
+import os
 
-from .server import WorkflowServer
+from .server import DEFAULT_HOST, DEFAULT_PORT, TRANSPORTS, WorkflowServer, run_workers
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    """Parse the command line, with defaults from the environment."""
+    parser = argparse.ArgumentParser(description="Insight MCP workflow server")
+    parser.add_argument(
+        "--transport",
+        choices=TRANSPORTS,
+        default=os.getenv("INSIGHT_TRANSPORT", "stdio"),
+        help="how clients connect (default: stdio, or INSIGHT_TRANSPORT)",
+    )
+    parser.add_argument(
+        "--host",
+        default=os.getenv("INSIGHT_HOST", DEFAULT_HOST),
+        help=f"HTTP interface to listen on (default: {DEFAULT_HOST}, or INSIGHT_HOST)",
+    )
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=int(os.getenv("INSIGHT_PORT", DEFAULT_PORT)),
+        help=f"HTTP port to listen on (default: {DEFAULT_PORT}, or INSIGHT_PORT)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=int(os.getenv("INSIGHT_WORKERS", "1")),
+        help="worker processes for the streamable-http transport (default: 1, or "
+        "INSIGHT_WORKERS)",
+    )
+    args = parser.parse_args(argv)
+    if args.workers > 1 and args.transport != "streamable-http":
+        parser.error("--workers requires --transport streamable-http")
+    return args
 
 
 def main():
     """Initialize and run the workflow server."""
+    args = parse_args()
+    if args.workers > 1:
+        run_workers(args.host, args.port, args.workers)
+        return
     server = WorkflowServer()
-    asyncio.run(server.run())
+    if args.transport == "stdio":
+        asyncio.run(server.run())
+    else:
+        asyncio.run(server.run_http(args.transport, args.host, args.port))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,117 @@
+"""Per-file assessments kept for incremental requirements assessments.
+
+An incremental assessment re-assesses only the requirements files that are new
+or changed since the last assessment of the same file. For that, the latest
+assessment of every file is stored together with the key of its input, which
+covers the file's name and content, the model and the prompt template. The
+store is separate from the response cache: it keeps exactly one assessment per
+file, is never evicted, and is used even when response caching is disabled.
+
+Configuration:
+
+- ``INSIGHT_ASSESSMENTS_DB``: Assessment database (default
+  ``~/.cache/insight/assessments.sqlite3``)
+"""
+
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+DEFAULT_ASSESSMENTS_DB = os.path.join("~", ".cache", "insight", "assessments.sqlite3")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS file_assessments (
+    path TEXT PRIMARY KEY,
+    key TEXT NOT NULL,
+    assessment TEXT NOT NULL,
+    assessed_at REAL NOT NULL
+);
+"""
+
+
+class AssessmentStore:
+    """SQLite store of the latest assessment of each requirements file."""
+
+    def __init__(self, path: str):
+        """Open (or create) the assessment database.
+
+        Args:
+            path: Path of the SQLite database file.
+        """
+        self.path = path
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+
+    def load(self, directory: str, files: List[str]) -> Dict[str, Tuple[str, str]]:
+        """Return the stored assessments of files in a directory.
+
+        Args:
+            directory: Directory of the files.
+            files: File names within the directory.
+
+        Returns:
+            Dict[str, Tuple[str, str]]: ``(key, assessment)`` by file name, for
+            the files that were assessed before.
+        """
+        stored = {}
+        with self._lock:
+            for file in files:
+                row = self._conn.execute(
+                    "SELECT key, assessment FROM file_assessments WHERE path = ?",
+                    (_path(directory, file),),
+                ).fetchone()
+                if row is not None:
+                    stored[file] = (row[0], row[1])
+        return stored
+
+    def save(self, directory: str, assessments: Dict[str, Tuple[str, str]]) -> None:
+        """Store ``(key, assessment)`` by file name, replacing earlier ones."""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO file_assessments "
+                "(path, key, assessment, assessed_at) VALUES (?, ?, ?, ?)",
+                [
+                    (_path(directory, file), key, assessment, now)
+                    for file, (key, assessment) in assessments.items()
+                ],
+            )
+
+
+def _path(directory: str, file: str) -> str:
+    return os.path.realpath(os.path.join(directory, file))
+
+
+_store: Optional[AssessmentStore] = None
+_store_lock = threading.Lock()
+
+
+def get_assessment_store() -> AssessmentStore:
+    """Return the process-wide assessment store configured from the environment.
+
+    Opening the store creates its directory and database; use
+    ``open_assessment_store`` on the event loop.
+    """
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = AssessmentStore(
+                os.path.expanduser(
+                    os.getenv("INSIGHT_ASSESSMENTS_DB", DEFAULT_ASSESSMENTS_DB)
+                )
+            )
+    return _store
+
+
+async def open_assessment_store() -> AssessmentStore:
+    """Return the process-wide assessment store, opening it in a worker thread."""
+    if _store is not None:
+        return _store
+    return await asyncio.to_thread(get_assessment_store)
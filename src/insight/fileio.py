@@ -0,0 +1,138 @@
+"""Non-blocking file access for tool handlers.
+
+Blocking filesystem calls run on a small, bounded thread pool so that slow
+storage, such as a network filesystem, never stalls the event loop that serves
+every other MCP request. The pool size is configured with ``INSIGHT_IO_THREADS``.
+"""
+
+import asyncio
+import contextlib
+import glob as globlib
+import os
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, List, Optional, Tuple, TypeVar
+
+from . import metrics
+
+DEFAULT_IO_THREADS = 8
+
+T = TypeVar("T")
+
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    """Return the shared I/O thread pool, creating it on first use."""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=int(os.getenv("INSIGHT_IO_THREADS", DEFAULT_IO_THREADS)),
+            thread_name_prefix="insight-io",
+        )
+    return _executor
+
+
+async def run_io(func: Callable[..., T], *args: Any) -> T:
+    """Run a blocking filesystem function on the I/O thread pool.
+
+    The time until the function returns counts as file I/O of the current tool
+    call.
+    """
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
+    try:
+        return await loop.run_in_executor(_get_executor(), func, *args)
+    finally:
+        metrics.record_io(time.perf_counter() - start)
+
+
+def _read(path: str) -> str:
+    with open(path, "r") as f:
+        return f.read()
+
+
+def _write(path: str, content: str) -> None:
+    # Write a temporary file next to the target and rename it over the target,
+    # so that readers never see a partly written file
+    temporary = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        with open(temporary, "w") as f:
+            f.write(content)
+        os.replace(temporary, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.unlink(temporary)
+        raise
+
+
+def _list_files(directory: str) -> List[str]:
+    with os.scandir(directory) as entries:
+        return sorted(entry.name for entry in entries if entry.is_file())
+
+
+def _glob_files(pattern: str) -> List[str]:
+    paths = globlib.glob(os.path.expanduser(pattern), recursive=True)
+    return sorted(path for path in paths if os.path.isfile(path))
+
+
+async def exists(path: str) -> bool:
+    """Return whether a path exists."""
+    return await run_io(os.path.exists, path)
+
+
+async def isdir(path: str) -> bool:
+    """Return whether a path is a directory."""
+    return await run_io(os.path.isdir, path)
+
+
+async def read_text(path: str) -> str:
+    """Read a text file."""
+    return await run_io(_read, path)
+
+
+async def write_text(path: str, content: str) -> None:
+    """Write a text file atomically, replacing any existing content.
+
+    The file either keeps its previous content or holds the new content in
+    full, even if the call fails or is cancelled.
+    """
+    await run_io(_write, path, content)
+
+
+async def list_files(directory: str) -> List[str]:
+    """Return the names of the regular files in a directory, sorted by name."""
+    return await run_io(_list_files, directory)
+
+
+async def glob_files(pattern: str) -> List[str]:
+    """Return the regular files matching a glob pattern, sorted by path.
+
+    ``**`` matches any number of nested directories.
+    """
+    return await run_io(_glob_files, pattern)
+
+
+async def read_directory(directory: str) -> List[Tuple[str, str]]:
+    """Read every regular file in a directory concurrently.
+
+    Files that cannot be read are skipped with a warning on stderr.
+
+    Returns:
+        List[Tuple[str, str]]: ``(file name, content)`` pairs sorted by file name.
+    """
+    files = await list_files(directory)
+    results = await asyncio.gather(
+        *(read_text(os.path.join(directory, file)) for file in files),
+        return_exceptions=True,
+    )
+
+    contents = []
+    for file, result in zip(files, results):
+        if isinstance(result, Exception):
+            print(f"Warning: Could not read {file}: {str(result)}", file=sys.stderr)
+            continue
+        contents.append((file, result))
+    return contents
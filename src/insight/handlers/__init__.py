@@ -6,6 +6,9 @@ Each module in this package handles tools for a specific phase of the workflow:
 - design_handlers: Phase 2 (Design Development)
 - implementation_handlers: Phase 3 (Implementation Development)
 - integration_test_handlers: Phase 4 (Integration Test Development)
+
+Each module exposes ``get_*_tools()`` returning its tool definitions and
+``get_*_handlers()`` mapping each of those tool names to a handler coroutine.
 """
 
 # Empty init to make it a package
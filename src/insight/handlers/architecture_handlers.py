@@ -4,19 +4,22 @@ This module provides tools and handlers for the architecture development phase,
 including architecture design, component design, and design review.
 """
 
-from typing import List, Optional
+from typing import TYPE_CHECKING, Dict, List, Optional
 
-from langchain.base_language import BaseLanguageModel
 from mcp.types import TextContent, Tool
 
 from ..prompts.architecture_prompts import ARCHITECTURE_PROMPTS
+from ..registry import ToolHandler
+
+if TYPE_CHECKING:
+    from langchain_core.language_models import BaseLanguageModel
 
 
 def get_architecture_tools() -> List[Tool]:
     """Return the list of architecture phase tools."""
     return [
         Tool(
-            name="get_prompt",
+            name="get_architecture_prompt",
             description="Get a prompt to help the user architect a software project.",
             inputSchema={
                 "type": "object",
@@ -38,13 +41,15 @@ def get_architecture_tools() -> List[Tool]:
     ]
 
 
-async def handle_architecture_tool(
-    name: str, arguments: dict, llm: BaseLanguageModel
-) -> Optional[List[TextContent]]:
-    """Handle architecture phase tool calls."""
-    if name != "get_prompt":
-        return None
+def get_architecture_handlers() -> Dict[str, ToolHandler]:
+    """Return the architecture phase tool handlers keyed by tool name."""
+    return {"get_architecture_prompt": handle_get_architecture_prompt}
+
 
+async def handle_get_architecture_prompt(
+    arguments: dict, llm: Optional["BaseLanguageModel"]
+) -> List[TextContent]:
+    """Handle the get_architecture_prompt tool."""
     if "prompt_name" not in arguments:
         raise ValueError("prompt_name is required")
 
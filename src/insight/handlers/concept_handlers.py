@@ -5,12 +5,15 @@ including concept generation, refinement, and assessment.
 """
 
 import json
-from typing import List, Optional
+from typing import TYPE_CHECKING, Dict, List, Optional
 
-from langchain.base_language import BaseLanguageModel
 from mcp.types import TextContent, Tool
 
 from ..prompts.concept_prompts import CONCEPT_PROMPTS
+from ..registry import ToolHandler
+
+if TYPE_CHECKING:
+    from langchain_core.language_models import BaseLanguageModel
 
 
 def get_concept_tools() -> List[Tool]:
@@ -52,13 +55,15 @@ def get_concept_tools() -> List[Tool]:
     ]
 
 
-async def handle_concept_tool(
-    name: str, arguments: dict, llm: BaseLanguageModel
-) -> Optional[List[TextContent]]:
-    """Handle concept phase tool calls."""
-    if name != "get_concept_prompt":
-        return None
+def get_concept_handlers() -> Dict[str, ToolHandler]:
+    """Return the concept phase tool handlers keyed by tool name."""
+    return {"get_concept_prompt": handle_get_concept_prompt}
+
 
+async def handle_get_concept_prompt(
+    arguments: dict, llm: Optional["BaseLanguageModel"]
+) -> List[TextContent]:
+    """Handle the get_concept_prompt tool."""
     if "prompt_name" not in arguments:
         raise ValueError("prompt_name is required")
 
@@ -4,19 +4,22 @@ This module provides tools and handlers for the implementation phase,
 including code generation, code review, and implementation guidance.
 """
 
-from typing import List, Optional
+from typing import TYPE_CHECKING, Dict, List, Optional
 
-from langchain.base_language import BaseLanguageModel
 from mcp.types import TextContent, Tool
 
 from ..prompts.implementation_prompts import IMPLEMENTATION_PROMPTS
+from ..registry import ToolHandler
+
+if TYPE_CHECKING:
+    from langchain_core.language_models import BaseLanguageModel
 
 
 def get_implementation_tools() -> List[Tool]:
     """Return the list of implementation phase tools."""
     return [
         Tool(
-            name="get_prompt",
+            name="get_implementation_prompt",
             description="Get a software implementation prompt to inject into Cline conversation",
             inputSchema={
                 "type": "object",
@@ -37,13 +40,15 @@ def get_implementation_tools() -> List[Tool]:
     ]
 
 
-async def handle_implementation_tool(
-    name: str, arguments: dict, llm: BaseLanguageModel
-) -> Optional[List[TextContent]]:
-    """Handle implementation phase tool calls."""
-    if name != "get_prompt":
-        return None
+def get_implementation_handlers() -> Dict[str, ToolHandler]:
+    """Return the implementation phase tool handlers keyed by tool name."""
+    return {"get_implementation_prompt": handle_get_implementation_prompt}
+
 
+async def handle_get_implementation_prompt(
+    arguments: dict, llm: Optional["BaseLanguageModel"]
+) -> List[TextContent]:
+    """Handle the get_implementation_prompt tool."""
     if "prompt_name" not in arguments:
         raise ValueError("prompt_name is required")
 
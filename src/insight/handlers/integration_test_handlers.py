@@ -4,19 +4,22 @@ This module provides tools and handlers for the integration test phase,
 including test case generation, test execution, and test result analysis.
 """
 
-from typing import List, Optional
+from typing import TYPE_CHECKING, Dict, List, Optional
 
-from langchain.base_language import BaseLanguageModel
 from mcp.types import TextContent, Tool
 
 from ..prompts.integration_test_prompts import INTEGRATION_TEST_PROMPTS
+from ..registry import ToolHandler
+
+if TYPE_CHECKING:
+    from langchain_core.language_models import BaseLanguageModel
 
 
 def get_integration_test_tools() -> List[Tool]:
     """Return the list of integration test phase tools."""
     return [
         Tool(
-            name="get_prompt",
+            name="get_integration_test_prompt",
             description="Get an integration test phase prompt to inject into Cline conversation",
             inputSchema={
                 "type": "object",
@@ -33,13 +36,15 @@ def get_integration_test_tools() -> List[Tool]:
     ]
 
 
-async def handle_integration_test_tool(
-    name: str, arguments: dict, llm: BaseLanguageModel
-) -> Optional[List[TextContent]]:
-    """Handle integration test phase tool calls."""
-    if name != "get_prompt":
-        return None
+def get_integration_test_handlers() -> Dict[str, ToolHandler]:
+    """Return the integration test phase tool handlers keyed by tool name."""
+    return {"get_integration_test_prompt": handle_get_integration_test_prompt}
+
 
+async def handle_get_integration_test_prompt(
+    arguments: dict, llm: Optional["BaseLanguageModel"]
+) -> List[TextContent]:
+    """Handle the get_integration_test_prompt tool."""
     if "prompt_name" not in arguments:
         raise ValueError("prompt_name is required")
 
@@ -0,0 +1,144 @@
+"""Background job handlers for the MCP workflow server.
+
+This module provides a ``start_*`` tool for each long-running LLM tool, which
+queues the call as a background job and returns its id at once, and the
+``job_status``, ``job_result`` and ``job_cancel`` tools to follow the job.
+"""
+
+import json
+from typing import TYPE_CHECKING, Dict, List, Mapping, Optional
+
+from mcp.types import TextContent, Tool
+
+from ..jobs import JobScheduler
+from ..registry import ToolHandler
+
+if TYPE_CHECKING:
+    from langchain_core.language_models import BaseLanguageModel
+
+# Tools that can run as background jobs
+JOB_TOOLS = (
+    "generate_requirements",
+    "generate_requirements_batch",
+    "assess_requirements",
+)
+
+PRIORITY_SCHEMA = {
+    "type": "integer",
+    "description": "Jobs with a higher priority run first (default 0)",
+    "default": 0,
+}
+
+JOB_ID_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "job_id": {
+            "type": "string",
+            "description": "Job id returned by a start_* tool",
+        },
+    },
+    "required": ["job_id"],
+}
+
+
+def get_job_tools(tools: Mapping[str, Tool]) -> List[Tool]:
+    """Return the job tools for the registered tools that can run as jobs.
+
+    Args:
+        tools: Registered tools keyed by name. Each ``start_*`` tool takes the
+            arguments of the tool it starts, plus a priority.
+    """
+    job_tools = []
+    for name in JOB_TOOLS:
+        tool = tools[name]
+        schema = dict(tool.inputSchema)
+        schema["properties"] = {
+            **schema.get("properties", {}),
+            "priority": PRIORITY_SCHEMA,
+        }
+        job_tools.append(
+            Tool(
+                name=f"start_{name}",
+                description=(
+                    f"Start {name} as a background job and return its job id "
+                    "immediately. Tool: " + (tool.description or "")
+                ),
+                inputSchema=schema,
+            )
+        )
+    job_tools.extend(
+        [
+            Tool(
+                name="job_status",
+                description="Get the status of a background job",
+                inputSchema=JOB_ID_SCHEMA,
+            ),
+            Tool(
+                name="job_result",
+                description="Get the result of a finished background job",
+                inputSchema=JOB_ID_SCHEMA,
+            ),
+            Tool(
+                name="job_cancel",
+                description="Cancel a queued or running background job",
+                inputSchema=JOB_ID_SCHEMA,
+            ),
+        ]
+    )
+    return job_tools
+
+
+def get_job_handlers(scheduler: JobScheduler) -> Dict[str, ToolHandler]:
+    """Return the job tool handlers keyed by tool name."""
+
+    def start(tool: str) -> ToolHandler:
+        async def handle_start(
+            arguments: dict, llm: Optional["BaseLanguageModel"]
+        ) -> List[TextContent]:
+            arguments = dict(arguments)
+            priority = arguments.pop("priority", 0)
+            record = await scheduler.submit(tool, arguments, priority)
+            return _status(record.status_dict())
+
+        return handle_start
+
+    async def handle_job_status(
+        arguments: dict, llm: Optional["BaseLanguageModel"]
+    ) -> List[TextContent]:
+        record = await scheduler.get(arguments["job_id"])
+        return _status(record.status_dict())
+
+    async def handle_job_result(
+        arguments: dict, llm: Optional["BaseLanguageModel"]
+    ) -> List[TextContent]:
+        record = await scheduler.get(arguments["job_id"])
+        if record.status == "succeeded":
+            return [TextContent(type="text", text=text) for text in record.result]
+        if record.status in ("failed", "cancelled"):
+            raise ValueError(
+                f"Job {record.id} {record.status}"
+                + (f": {record.error}" if record.error else "")
+            )
+        raise ValueError(
+            f"Job {record.id} is {record.status}; poll job_status until it finishes"
+        )
+
+    async def handle_job_cancel(
+        arguments: dict, llm: Optional["BaseLanguageModel"]
+    ) -> List[TextContent]:
+        record = await scheduler.cancel(arguments["job_id"])
+        return _status(record.status_dict())
+
+    handlers = {f"start_{tool}": start(tool) for tool in JOB_TOOLS}
+    handlers.update(
+        {
+            "job_status": handle_job_status,
+            "job_result": handle_job_result,
+            "job_cancel": handle_job_cancel,
+        }
+    )
+    return handlers
+
+
+def _status(status: Dict[str, object]) -> List[TextContent]:
+    return [TextContent(type="text", text=json.dumps(status, indent=2))]
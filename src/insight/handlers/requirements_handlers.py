@@ -4,24 +4,106 @@ This module provides tools and handlers for the requirements development phase,
 including requirements generation, assessment, and prompt management.
 """
 
+import asyncio
 import os
-import sys
-from typing import List, Optional
+import re
+import time
+from collections import Counter
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Awaitable, Callable, Dict, List, Optional, Tuple
 
-from langchain.base_language import BaseLanguageModel
-from langchain.chains import LLMChain, SequentialChain
-from langchain_core.output_parsers import StrOutputParser
-from langchain_core.prompts import PromptTemplate
 from mcp.types import TextContent, Tool
 
-from ..prompts.requirements_prompts import REQUIREMENTS_PROMPTS
+from .. import fileio, metrics
+from ..assessments import open_assessment_store
+from ..llm.cache import llm_cache_key, open_response_cache
+from ..llm.chunking import chunk_requirements, trim_sections
+from ..llm.coalescing import SingleFlight
+from ..llm.models import describe_llm
+from ..llm.pipelines import PipelineRegistry
+from ..llm.streaming import ProgressReporter, SharedProgress, stream_text
+from ..llm.tiering import step_llm
+from ..llm.tokens import (
+    OVERSIZE_POLICIES,
+    TokenBudget,
+    TokenEstimate,
+    get_oversize_policy,
+    get_token_budget,
+    load_tokenizer,
+)
+from ..llm.usage import collect_usage
+from ..prompts.requirements_prompts import (
+    REQUIREMENTS_PIPELINE_TEMPLATES,
+    REQUIREMENTS_PROMPTS,
+)
+from ..registry import ToolHandler, requires_llm
+
+if TYPE_CHECKING:
+    from langchain_core.language_models import BaseLanguageModel
+
+BYPASS_CACHE_SCHEMA = {
+    "type": "boolean",
+    "description": "Skip the response cache lookup and refresh the cached result",
+    "default": False,
+}
+
+OVERSIZE_POLICY_SCHEMA = {
+    "type": "string",
+    "enum": list(OVERSIZE_POLICIES),
+    "description": (
+        "What to do when the input exceeds the model's context window: reject the "
+        "call, trim the lowest-priority sections, or (assessments only) switch to "
+        "chunked map-reduce processing. Defaults to INSIGHT_OVERSIZE_POLICY."
+    ),
+}
+
+ASSESSMENT_MODES = ("full", "incremental", "map_reduce")
+
+DEFAULT_CHUNK_TOKENS = 8000
+DEFAULT_MAX_CONCURRENCY = 4
+
+_SCORE_PATTERN = re.compile(r"score[^\w\n]*(\d+(?:\.\d+)?)", re.IGNORECASE)
+
+# Templates are validated here, when the server imports the handlers
+PIPELINES = PipelineRegistry()
+PIPELINES.register(
+    "requirements_creation",
+    REQUIREMENTS_PIPELINE_TEMPLATES["requirements_creation"],
+    ["brief"],
+)
+PIPELINES.register(
+    "requirements_intermediate_review",
+    REQUIREMENTS_PIPELINE_TEMPLATES["requirements_intermediate_review"],
+    ["requirements"],
+)
+PIPELINES.register(
+    "requirements_assessment",
+    REQUIREMENTS_PIPELINE_TEMPLATES["requirements_assessment"],
+    ["requirements"],
+)
+PIPELINES.register(
+    "requirements_file_assessment",
+    REQUIREMENTS_PIPELINE_TEMPLATES["requirements_file_assessment"],
+    ["file_name", "requirements"],
+)
+PIPELINES.register(
+    "requirements_chunk_assessment",
+    REQUIREMENTS_PIPELINE_TEMPLATES["requirements_chunk_assessment"],
+    ["part", "parts", "requirements"],
+)
+PIPELINES.register(
+    "requirements_assessment_reduce",
+    REQUIREMENTS_PIPELINE_TEMPLATES["requirements_assessment_reduce"],
+    ["assessments"],
+)
 
 
 def get_requirements_tools() -> List[Tool]:
     """Return the list of requirements phase tools."""
     return [
         Tool(
-            name="get_prompt",
+            name="get_requirements_prompt",
             description=(
                 "Get a prompt to help the user create requirements for a software "
                 "project to inject into Cline conversation"
@@ -63,11 +145,47 @@ def get_requirements_tools() -> List[Tool]:
                     "brief_path": {
                         "type": "string",
                         "description": "Path to the product brief file",
-                    }
+                    },
+                    "bypass_cache": BYPASS_CACHE_SCHEMA,
+                    "oversize_policy": OVERSIZE_POLICY_SCHEMA,
                 },
                 "required": ["brief_path"],
             },
         ),
+        Tool(
+            name="generate_requirements_batch",
+            description=(
+                "Generate requirements documents from many product briefs "
+                "concurrently, reporting the status of each brief"
+            ),
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "brief_paths": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "Paths to the product brief files",
+                    },
+                    "brief_glob": {
+                        "type": "string",
+                        "description": (
+                            "Glob pattern matching product brief files, such as "
+                            "'products/**/brief.md'"
+                        ),
+                    },
+                    "max_concurrency": {
+                        "type": "integer",
+                        "minimum": 1,
+                        "description": (
+                            "Briefs generated at the same time. Defaults to "
+                            "INSIGHT_MAX_CONCURRENCY."
+                        ),
+                    },
+                    "bypass_cache": BYPASS_CACHE_SCHEMA,
+                    "oversize_policy": OVERSIZE_POLICY_SCHEMA,
+                },
+            },
+        ),
         Tool(
             name="assess_requirements",
             description="Assess the quality and completeness of requirements document",
@@ -77,7 +195,20 @@ def get_requirements_tools() -> List[Tool]:
                     "requirements_path": {
                         "type": "string",
                         "description": "Path to the requirements document to assess",
-                    }
+                    },
+                    "bypass_cache": BYPASS_CACHE_SCHEMA,
+                    "oversize_policy": OVERSIZE_POLICY_SCHEMA,
+                    "mode": {
+                        "type": "string",
+                        "enum": list(ASSESSMENT_MODES),
+                        "description": (
+                            "full: assess all content in one call; incremental: assess "
+                            "each file separately, re-assessing only new or changed "
+                            "files; map_reduce: assess token-bounded chunks in "
+                            "parallel and combine the findings"
+                        ),
+                        "default": "full",
+                    },
                 },
                 "required": ["requirements_path"],
             },
@@ -85,119 +216,663 @@ def get_requirements_tools() -> List[Tool]:
     ]
 
 
-async def handle_requirements_tool(
-    name: str, arguments: dict, llm: BaseLanguageModel
-) -> Optional[List[TextContent]]:
-    """Handle requirements phase tool calls."""
-    if name == "get_prompt":
-        if "prompt_name" not in arguments:
-            raise ValueError("prompt_name is required")
+def get_requirements_handlers() -> Dict[str, ToolHandler]:
+    """Return the requirements phase tool handlers keyed by tool name."""
+    return {
+        "get_requirements_prompt": handle_get_requirements_prompt,
+        "generate_requirements": handle_generate_requirements,
+        "generate_requirements_batch": handle_generate_requirements_batch,
+        "assess_requirements": handle_assess_requirements,
+    }
 
-        prompt_name = arguments["prompt_name"]
-        if prompt_name not in REQUIREMENTS_PROMPTS:
-            return None
 
-        prompt = REQUIREMENTS_PROMPTS[prompt_name]
-        return [TextContent(type="text", text=prompt)]
+# LLM work in flight, keyed by response cache key and cache bypass
+_FLIGHTS = SingleFlight()
 
-    elif name == "generate_requirements":
-        if "brief_path" not in arguments:
-            raise ValueError("brief_path is required")
+# Progress of the coalesced work running in the current task, if any
+_shared_progress: ContextVar[Optional[SharedProgress]] = ContextVar(
+    "shared_progress", default=None
+)
 
-        brief_path = arguments["brief_path"]
-        if not os.path.exists(brief_path):
-            raise ValueError(f"Brief file not found: {brief_path}")
 
-        # Read the brief
-        with open(brief_path, "r") as f:
-            brief_content = f.read()
+async def _run_cached(
+    key: str, run: "_ToolRun", produce: Callable[[], Awaitable[str]]
+) -> str:
+    """Return a cached LLM response, producing and storing it on a miss.
 
-        # Setup the chain
-        requirements_chain = LLMChain(
-            llm=llm,
-            prompt=PromptTemplate(
-                input_variables=["brief"],
-                template=REQUIREMENTS_PROMPTS["requirements_creation"],
-            ),
-            output_parser=StrOutputParser(),
-        )
+    Identical work already in flight for another call, with the same key and
+    cache bypass, is awaited instead of repeated; progress of the shared work is
+    reported to every call waiting for it, and only for as long as it waits.
+
+    Args:
+        key: Cache key from ``llm_cache_key``.
+        run: Tool run making the call; ``bypass_cache`` skips the lookup and
+            overwrites any cached response.
+        produce: Coroutine function that calls the LLM.
+    """
+    bypass = run.bypass_cache
+
+    async def lookup_or_produce() -> str:
+        cache = await open_response_cache()
+        if cache is not None and not bypass:
+            cached = await cache.aget(key)
+            metrics.record_cache(cached is not None)
+            if cached is not None:
+                return cached
+
+        result = await produce()
+        if cache is not None:
+            await cache.aput(key, result)
+        return result
+
+    flight = _FLIGHTS.get((key, bypass))
+    if flight is None:
+        progress = SharedProgress(run.reporter)
+
+        async def lead() -> str:
+            # The work runs in a task of its own, so only its calls see this
+            _shared_progress.set(progress)
+            return await lookup_or_produce()
+
+        return await _FLIGHTS.run((key, bypass), lead, progress)
+
+    metrics.record_coalesced()
+    run.estimate.coalesced += 1
+    flight.data.reporters.append(run.reporter)
+    try:
+        return await _FLIGHTS.run((key, bypass), lookup_or_produce)
+    finally:
+        flight.data.reporters.remove(run.reporter)
 
-        review_chain = LLMChain(
+
+async def handle_get_requirements_prompt(
+    arguments: dict, llm: Optional["BaseLanguageModel"]
+) -> List[TextContent]:
+    """Handle the get_requirements_prompt tool."""
+    if "prompt_name" not in arguments:
+        raise ValueError("prompt_name is required")
+
+    prompt_name = arguments["prompt_name"]
+    if prompt_name not in REQUIREMENTS_PROMPTS:
+        raise ValueError(f"Unknown prompt: {prompt_name}")
+
+    prompt = REQUIREMENTS_PROMPTS[prompt_name]
+    return [TextContent(type="text", text=prompt)]
+
+
+@dataclass
+class _Step:
+    """Model and token budget of one LLM step of a tool."""
+
+    name: str
+    llm: "BaseLanguageModel"
+    budget: TokenBudget
+
+    @property
+    def label(self) -> str:
+        """``provider/model`` of the step's model."""
+        info = describe_llm(self.llm)
+        return f"{info.provider}/{info.model}"
+
+
+@dataclass
+class _ToolRun:
+    """State shared by the LLM calls of one requirements tool call."""
+
+    tool: str
+    llm: "BaseLanguageModel"
+    bypass_cache: bool
+    reporter: ProgressReporter
+    budget: TokenBudget
+    policy: str
+    estimate: TokenEstimate
+    steps: Dict[str, _Step] = field(default_factory=dict)
+
+    @classmethod
+    async def start(
+        cls,
+        tool: str,
+        arguments: dict,
+        llm: "BaseLanguageModel",
+        reporter: Optional[ProgressReporter] = None,
+    ) -> "_ToolRun":
+        """Create the run state for a tool call.
+
+        Args:
+            tool: Tool name, which selects the configured step models.
+            arguments: Tool call arguments.
+            llm: The server's model.
+            reporter: Progress reporter shared with other runs of the same
+                request. Defaults to a new reporter for the current request.
+        """
+        await load_tokenizer(llm)
+        budget = get_token_budget(llm)
+        return cls(
+            tool=tool,
             llm=llm,
-            prompt=PromptTemplate(
-                input_variables=["requirements"],
-                template=REQUIREMENTS_PROMPTS["requirements_intermediate_review"],
-            ),
-            output_parser=StrOutputParser(),
+            bypass_cache=arguments.get("bypass_cache", False),
+            reporter=reporter or ProgressReporter.for_current_request(),
+            budget=budget,
+            policy=get_oversize_policy(arguments),
+            estimate=TokenEstimate(model=budget.model),
         )
 
-        chain = SequentialChain(
-            chains=[requirements_chain, review_chain],
-            input_variables=["brief"],
-            output_variables=["requirements"],
+    async def step(self, name: str) -> _Step:
+        """Return the model and budget of a step, as configured for the tool."""
+        if name not in self.steps:
+            llm = step_llm(self.llm, self.tool, name)
+            if llm is self.llm:
+                budget = self.budget
+            else:
+                await load_tokenizer(llm)
+                budget = get_token_budget(llm)
+            self.steps[name] = _Step(name, llm, budget)
+        return self.steps[name]
+
+    def fits(self, content: str, template: str, step: _Step) -> bool:
+        """Return whether a prompt fits the step model's input budget."""
+        return step.budget.count(template) + step.budget.count(content) <= (
+            step.budget.input_tokens
         )
 
-        # Generate requirements
-        result = await chain.ainvoke({"brief": brief_content})
-        final_requirements = result["requirements"]
-
-        # Write requirements to file
-        requirements_path = os.path.join(os.path.dirname(brief_path), "requirements.md")
-        with open(requirements_path, "w") as f:
-            f.write(final_requirements)
-
-        return [TextContent(type="text", text=requirements_path)]
-
-    elif name == "assess_requirements":
-        if "requirements_path" not in arguments:
-            raise ValueError("requirements_path is required")
-
-        requirements_path = arguments["requirements_path"]
-        if not os.path.exists(requirements_path):
-            raise ValueError(f"Requirements path not found: {requirements_path}")
-
-        # Handle directory or single file
-        requirements_content = ""
-        if os.path.isdir(requirements_path):
-            # Get all files in directory and sort them
-            files = sorted(
-                [
-                    f
-                    for f in os.listdir(requirements_path)
-                    if os.path.isfile(os.path.join(requirements_path, f))
-                ]
+    def fit_input(
+        self,
+        content: str,
+        template: str,
+        what: str,
+        step: _Step,
+        can_chunk: bool = False,
+    ) -> str:
+        """Apply the oversize policy to content that is sent with a template.
+
+        Args:
+            content: Variable content inserted into the prompt.
+            template: Prompt template the content is sent with.
+            what: Description of the content for error messages.
+            step: Step whose model receives the prompt.
+            can_chunk: Whether the caller handles the ``chunk`` policy itself.
+
+        Returns:
+            str: The content, trimmed if the policy allows and it is too large.
+
+        Raises:
+            ValueError: If the content is too large and may not be trimmed.
+        """
+        budget = step.budget
+        available = budget.input_tokens - budget.count(template)
+        tokens = budget.count(content)
+        if tokens > available:
+            if self.policy == "trim":
+                self.estimate.trimmed = True
+                content = trim_sections(content, max(available, 0), budget.count)
+                tokens = budget.count(content)
+            elif self.policy == "reject" or not can_chunk:
+                raise ValueError(
+                    f"{what} is too large for {budget.model or 'the model'}: "
+                    f"{tokens} tokens exceed the {available}-token input budget "
+                    f"(oversize_policy '{self.policy}'; use 'trim'"
+                    + (" or 'chunk')" if can_chunk else ")")
+                )
+        self.estimate.add_call(budget.count(template) + tokens, budget)
+        return content
+
+    async def call(self, step: _Step, pipeline: str, inputs: Dict[str, object]) -> str:
+        """Run one LLM call of a step, streaming progress and recording usage.
+
+        Token counts reported by the provider take precedence over local counts.
+
+        Args:
+            step: Step whose model runs the call.
+            pipeline: Name of the template in ``PIPELINES``.
+            inputs: Values of the template's input variables.
+        """
+        runnable = PIPELINES.runnable(pipeline, step.llm)
+        start = time.monotonic()
+        with collect_usage() as usage:
+            output = await stream_text(
+                runnable, inputs, _shared_progress.get() or self.reporter
             )
+        count = step.budget.count
+        self.estimate.record_step(
+            step.name,
+            step.label,
+            time.monotonic() - start,
+            usage.input_tokens
+            or count(PIPELINES.template(pipeline))
+            + sum(count(str(value)) for value in inputs.values()),
+            usage.output_tokens or count(output),
+            usage.cache_read_tokens,
+            usage.cache_write_tokens,
+        )
+        return output
+
+
+def _with_estimate(text: str, run: _ToolRun) -> List[TextContent]:
+    """Return a tool result followed by the run's token estimate and step usage."""
+    return [
+        TextContent(type="text", text=text),
+        TextContent(type="text", text=run.estimate.summary()),
+    ]
+
+
+@requires_llm
+async def handle_generate_requirements(
+    arguments: dict, llm: "BaseLanguageModel"
+) -> List[TextContent]:
+    """Handle the generate_requirements tool."""
+    if "brief_path" not in arguments:
+        raise ValueError("brief_path is required")
+
+    brief_path = arguments["brief_path"]
+    if not await fileio.exists(brief_path):
+        raise ValueError(f"Brief file not found: {brief_path}")
+
+    run = await _ToolRun.start("generate_requirements", arguments, llm)
+    requirements_path = await _generate_requirements(brief_path, run)
+    return _with_estimate(requirements_path, run)
+
+
+@requires_llm
+async def handle_generate_requirements_batch(
+    arguments: dict, llm: "BaseLanguageModel"
+) -> List[TextContent]:
+    """Handle the generate_requirements_batch tool."""
+    brief_paths = list(arguments.get("brief_paths") or [])
+    if arguments.get("brief_glob"):
+        brief_paths.extend(await fileio.glob_files(arguments["brief_glob"]))
+    if not brief_paths:
+        raise ValueError("brief_paths or brief_glob must match at least one brief")
+    brief_paths = list(dict.fromkeys(brief_paths))
+
+    max_concurrency = arguments.get("max_concurrency")
+    if max_concurrency is None:
+        max_concurrency = _max_concurrency()
+    if max_concurrency < 1:
+        raise ValueError("max_concurrency must be at least 1")
+    semaphore = asyncio.Semaphore(max_concurrency)
+    reporter = ProgressReporter.for_current_request()
+    runs = []
+    conflicts = await fileio.run_io(_output_conflicts, brief_paths)
+
+    async def generate(brief_path: str) -> Tuple[str, bool, str]:
+        if brief_path in conflicts:
+            return brief_path, False, conflicts[brief_path]
+        try:
+            async with semaphore:
+                if not await fileio.exists(brief_path):
+                    raise ValueError(f"Brief file not found: {brief_path}")
+                run = await _ToolRun.start(
+                    "generate_requirements", arguments, llm, reporter
+                )
+                runs.append(run)
+                return brief_path, True, await _generate_requirements(brief_path, run)
+        except Exception as e:
+            return brief_path, False, str(e)
+
+    results = await asyncio.gather(*(generate(path) for path in brief_paths))
 
-            # Read and concatenate all files
-            for file in files:
-                file_path = os.path.join(requirements_path, file)
-                try:
-                    with open(file_path, "r") as f:
-                        requirements_content += f"\n\n# From {file}:\n\n"
-                        requirements_content += f.read()
-                except Exception as e:
-                    print(f"Warning: Could not read {file}: {str(e)}", file=sys.stderr)
+    estimate = TokenEstimate(model=get_token_budget(llm).model)
+    for run in runs:
+        estimate.merge(run.estimate)
+    succeeded = sum(1 for _, ok, _ in results if ok)
+    lines = [f"Generated {succeeded} of {len(results)} requirements documents.", ""]
+    for brief_path, ok, detail in results:
+        if ok:
+            lines.append(f"- ok: {brief_path} -> {detail}")
         else:
-            # Single file case
-            with open(requirements_path, "r") as f:
-                requirements_content = f.read()
+            lines.append(f"- failed: {brief_path}: {detail}")
+    return [
+        TextContent(type="text", text="\n".join(lines)),
+        TextContent(type="text", text=estimate.summary()),
+    ]
 
-        if not requirements_content.strip():
-            raise ValueError("No readable requirements content found")
 
-        # Setup the assessment chain
-        assessment_chain = LLMChain(
-            llm=llm,
-            prompt=PromptTemplate(
-                input_variables=["requirements"],
-                template=REQUIREMENTS_PROMPTS["requirements_assessment"],
-            ),
-            output_parser=StrOutputParser(),
+def _output_conflicts(brief_paths: List[str]) -> Dict[str, str]:
+    """Return the briefs whose output another brief of the batch already writes.
+
+    Each brief writes requirements.md next to itself, so a directory with
+    several briefs would have them overwrite each other's output. Paths are
+    compared after resolving them, so that ``out/a.md`` and ``./out/a.md``
+    conflict.
+    """
+    outputs: Dict[str, str] = {}
+    conflicts = {}
+    for brief_path in brief_paths:
+        output = os.path.join(os.path.dirname(brief_path), "requirements.md")
+        resolved = os.path.realpath(output)
+        if resolved in outputs:
+            conflicts[brief_path] = (
+                f"{output} is already generated from {outputs[resolved]}"
+            )
+        else:
+            outputs[resolved] = brief_path
+    return conflicts
+
+
+async def _generate_requirements(brief_path: str, run: _ToolRun) -> str:
+    """Generate ``requirements.md`` next to a product brief.
+
+    Returns:
+        str: Path of the written requirements document.
+    """
+    create, review = await run.step("create"), await run.step("review")
+    creation_template = PIPELINES.template("requirements_creation")
+    review_template = PIPELINES.template("requirements_intermediate_review")
+
+    # Read the brief and check it against the model's input budget
+    brief_content = await fileio.read_text(brief_path)
+    brief_content = run.fit_input(
+        brief_content, creation_template, "Product brief", create
+    )
+    # The review step's input is the draft, bounded by the creation output budget
+    run.estimate.add_call(
+        review.budget.count(review_template) + create.budget.output_tokens,
+        review.budget,
+    )
+
+    cache_key = llm_cache_key(
+        "generate_requirements",
+        create.llm,
+        brief_content,
+        creation_template,
+        review_template,
+        later_llms=[review.llm],
+    )
+
+    async def generate() -> str:
+        # Generate requirements, streaming progress from both steps
+        draft = await run.call(
+            create, "requirements_creation", {"brief": brief_content}
+        )
+        return await run.call(
+            review, "requirements_intermediate_review", {"requirements": draft}
+        )
+
+    final_requirements = await _run_cached(cache_key, run, generate)
+
+    # Write requirements to file
+    requirements_path = os.path.join(os.path.dirname(brief_path), "requirements.md")
+    await fileio.write_text(requirements_path, final_requirements)
+
+    return requirements_path
+
+
+@requires_llm
+async def handle_assess_requirements(
+    arguments: dict, llm: "BaseLanguageModel"
+) -> List[TextContent]:
+    """Handle the assess_requirements tool."""
+    if "requirements_path" not in arguments:
+        raise ValueError("requirements_path is required")
+
+    requirements_path = arguments["requirements_path"]
+    if not await fileio.exists(requirements_path):
+        raise ValueError(f"Requirements path not found: {requirements_path}")
+    is_directory = await fileio.isdir(requirements_path)
+
+    mode = arguments.get("mode", "full")
+    if mode not in ASSESSMENT_MODES:
+        raise ValueError(f"Unknown assessment mode: {mode}")
+
+    files = await _read_requirements(requirements_path, is_directory)
+    if not any(content.strip() for _, content in files):
+        raise ValueError("No readable requirements content found")
+
+    run = await _ToolRun.start("assess_requirements", arguments, llm)
+    assess_step = await run.step("assess")
+    template = PIPELINES.template("requirements_assessment")
+
+    if is_directory:
+        requirements_content = "".join(
+            f"\n\n# From {file}:\n\n{content}" for file, content in files
+        )
+    else:
+        requirements_content = files[0][1]
+
+    if (
+        mode == "full"
+        and run.policy == "chunk"
+        and not run.fits(requirements_content, template, assess_step)
+    ):
+        mode = "map_reduce"
+
+    if mode == "incremental":
+        directory = (
+            requirements_path if is_directory else os.path.dirname(requirements_path)
+        )
+        report = await _assess_incrementally(directory, files, run)
+        return _with_estimate(report, run)
+    if mode == "map_reduce":
+        report = await _assess_map_reduce(files, run)
+        return _with_estimate(report, run)
+
+    requirements_content = run.fit_input(
+        requirements_content,
+        template,
+        "Requirements content",
+        assess_step,
+        can_chunk=True,
+    )
+    cache_key = llm_cache_key(
+        "assess_requirements", assess_step.llm, requirements_content, template
+    )
+
+    async def assess() -> str:
+        return await run.call(
+            assess_step,
+            "requirements_assessment",
+            {"requirements": requirements_content},
+        )
+
+    assessment = await _run_cached(cache_key, run, assess)
+
+    return _with_estimate(assessment, run)
+
+
+async def _read_requirements(
+    requirements_path: str, is_directory: bool
+) -> List[Tuple[str, str]]:
+    """Read a requirements file, or every file of a requirements directory.
+
+    Returns:
+        List[Tuple[str, str]]: ``(file name, content)`` pairs sorted by file name.
+    """
+    if not is_directory:
+        content = await fileio.read_text(requirements_path)
+        return [(os.path.basename(requirements_path), content)]
+
+    return await fileio.read_directory(requirements_path)
+
+
+async def _assess_incrementally(
+    directory: str, files: List[Tuple[str, str]], run: _ToolRun
+) -> str:
+    """Assess each requirements file separately and merge the results.
+
+    The latest assessment of every file is kept in the assessment store under a
+    key of the file's name and content, so only new, renamed or changed files
+    are assessed again, at most ``INSIGHT_MAX_CONCURRENCY`` at a time, whether
+    or not response caching is enabled. ``bypass_cache`` assesses every file.
+    The merge step is local: the overall score is the mean of the per-file
+    scores weighted by file size.
+
+    Args:
+        directory: Directory of the requirements files.
+        files: ``(file name, content)`` pairs.
+        run: Tool run making the calls.
+
+    Returns:
+        str: Markdown report with the overall score and every file's assessment.
+    """
+    step = await run.step("assess_file")
+    template = PIPELINES.template("requirements_file_assessment")
+    files = [
+        (file, run.fit_input(content, template, f"Requirements file {file}", step))
+        for file, content in files
+        if content.strip()
+    ]
+    store = await open_assessment_store()
+    stored = await fileio.run_io(store.load, directory, [file for file, _ in files])
+    # How each file's assessment was obtained, for the report
+    sources: Dict[str, str] = {}
+    semaphore = asyncio.Semaphore(_max_concurrency())
+
+    async def assess_file(file: str, content: str) -> str:
+        # The prompt names the file, so the name is part of the input's key
+        key = llm_cache_key(
+            "assess_requirements_file", step.llm, f"{file}\n{content}", template
+        )
+        previous_key, previous = stored.get(file, (None, None))
+        if previous_key == key and not run.bypass_cache:
+            sources[file] = "unchanged"
+            return previous
+
+        async def assess() -> str:
+            sources[file] = "assessed"
+            async with semaphore:
+                return await run.call(
+                    step,
+                    "requirements_file_assessment",
+                    {"file_name": file, "requirements": content},
+                )
+
+        sources[file] = "shared" if (key, run.bypass_cache) in _FLIGHTS else "cached"
+        assessment = await _run_cached(key, run, assess)
+        await fileio.run_io(store.save, directory, {file: (key, assessment)})
+        return assessment
+
+    assessments = await asyncio.gather(
+        *(assess_file(file, content) for file, content in files)
+    )
+    return _merge_assessments(files, assessments, Counter(sources.values()))
+
+
+async def _assess_map_reduce(files: List[Tuple[str, str]], run: _ToolRun) -> str:
+    """Assess token-bounded chunks concurrently and reduce them into one report.
+
+    The content is split along file and heading boundaries into chunks of at most
+    ``INSIGHT_CHUNK_TOKENS`` tokens, or less if the model's context window is
+    smaller. Chunks are assessed concurrently, at most ``INSIGHT_MAX_CONCURRENCY``
+    at a time, and a final reduce call merges the partial findings into one
+    assessment with an overall score.
+
+    Returns:
+        str: The combined assessment.
+    """
+    map_step = await run.step("assess_chunk")
+    reduce_step = await run.step("reduce")
+    map_template = PIPELINES.template("requirements_chunk_assessment")
+    reduce_template = PIPELINES.template("requirements_assessment_reduce")
+    max_tokens = min(
+        int(os.getenv("INSIGHT_CHUNK_TOKENS", DEFAULT_CHUNK_TOKENS)),
+        map_step.budget.input_tokens - map_step.budget.count(map_template),
+    )
+    chunks = chunk_requirements(files, max(max_tokens, 1), map_step.budget.count)
+    semaphore = asyncio.Semaphore(_max_concurrency())
+
+    async def assess_chunk(part: int, chunk: str) -> str:
+        async def assess() -> str:
+            async with semaphore:
+                return await run.call(
+                    map_step,
+                    "requirements_chunk_assessment",
+                    {"part": part, "parts": len(chunks), "requirements": chunk},
+                )
+
+        key = llm_cache_key(
+            "assess_requirements_chunk",
+            map_step.llm,
+            f"{part}/{len(chunks)}\n{chunk}",
+            map_template,
+        )
+        return await _run_cached(key, run, assess)
+
+    for chunk in chunks:
+        run.estimate.add_call(
+            map_step.budget.count(map_template) + map_step.budget.count(chunk),
+            map_step.budget,
+        )
+    partials = await asyncio.gather(
+        *(assess_chunk(part, chunk) for part, chunk in enumerate(chunks, start=1))
+    )
+    if len(partials) == 1:
+        return partials[0]
+
+    findings = "\n\n".join(
+        f"## Part {part} of {len(partials)}\n\n{partial.strip()}"
+        for part, partial in enumerate(partials, start=1)
+    )
+    # The document itself was accepted; partial findings are always trimmed to fit
+    budget = reduce_step.budget
+    reduce_budget = budget.input_tokens - budget.count(reduce_template)
+    if budget.count(findings) > reduce_budget:
+        findings = trim_sections(findings, max(reduce_budget, 0), budget.count)
+    run.estimate.add_call(
+        budget.count(reduce_template) + budget.count(findings), budget
+    )
+
+    async def reduce() -> str:
+        return await run.call(
+            reduce_step, "requirements_assessment_reduce", {"assessments": findings}
         )
 
-        # Generate assessment
-        result = await assessment_chain.ainvoke({"requirements": requirements_content})
+    key = llm_cache_key(
+        "assess_requirements_reduce", reduce_step.llm, findings, reduce_template
+    )
+    return await _run_cached(key, run, reduce)
 
-        return [TextContent(type="text", text=result)]
 
-    return None
+def _max_concurrency() -> int:
+    """Return the maximum number of concurrent LLM calls for one assessment."""
+    return max(int(os.getenv("INSIGHT_MAX_CONCURRENCY", DEFAULT_MAX_CONCURRENCY)), 1)
+
+
+def _parse_score(assessment: str) -> Optional[float]:
+    """Return the last ``Score: N/10`` value in an assessment, if any."""
+    matches = _SCORE_PATTERN.findall(assessment)
+    if not matches:
+        return None
+    return min(max(float(matches[-1]), 0.0), 10.0)
+
+
+def _merge_assessments(
+    files: List[Tuple[str, str]], assessments: List[str], sources: Counter
+) -> str:
+    """Combine per-file assessments into one report with an overall score.
+
+    ``sources`` counts the files by how their assessment was obtained:
+    ``assessed``, ``unchanged``, ``cached`` or ``shared``.
+    """
+    sections = []
+    weighted_total = 0.0
+    total_weight = 0
+    for (file, content), assessment in zip(files, assessments):
+        score = _parse_score(assessment)
+        if score is not None:
+            weighted_total += score * len(content)
+            total_weight += len(content)
+        label = f"{score:g}/10" if score is not None else "no score"
+        sections.append(f"## {file} ({label})\n\n{assessment.strip()}")
+
+    if total_weight:
+        overall = f"{weighted_total / total_weight:.1f}/10"
+    else:
+        overall = "unavailable (no file reported a score)"
+    header = (
+        f"# Requirements assessment\n\n"
+        f"Overall score: {overall}, weighted by file size across {len(files)} files.\n"
+        f"Re-assessed {sources['assessed']} of {len(files)} files"
+    )
+    reused = [
+        f"{sources[source]} {description}"
+        for source, description in (
+            ("unchanged", "unchanged since their last assessment"),
+            ("cached", "served from the response cache"),
+            ("shared", "shared with a concurrent assessment"),
+        )
+        if sources[source]
+    ]
+    if reused:
+        header += "; " + ", ".join(reused)
+    header += "."
+    return "\n\n".join([header, *sections]) + "\n"
@@ -0,0 +1,413 @@
+"""Background jobs for long-running tool calls.
+
+A job runs a tool call in the background so that the client does not hold an
+MCP request open for the minutes a requirements pipeline can take. Jobs wait in
+a bounded priority queue and are run by a fixed number of worker tasks. Every
+job's record, including the result of a finished job, is persisted in an SQLite
+database, so results survive a server restart. Jobs that were queued or running
+when their server process stopped are marked as failed. Every scheduler has its
+own instance id, stored with its jobs, so that the jobs of a stopped server are
+recognized even when a restarted server, such as the first process of a new
+container, is given the same process id.
+
+A job can only be cancelled by the process that runs it. When a server runs
+several worker processes, a cancel request that reaches another worker is
+stored in the database, and the owning worker picks it up within
+``CANCEL_POLL_INTERVAL`` seconds.
+
+Configuration:
+
+- ``INSIGHT_JOBS_DB``: Job database (default ``~/.cache/insight/jobs.sqlite3``)
+- ``INSIGHT_JOB_WORKERS``: Jobs run at the same time (default 2)
+- ``INSIGHT_JOB_QUEUE_SIZE``: Queued jobs before new ones are refused (default 100)
+- ``INSIGHT_JOB_RETENTION_DAYS``: Age after which finished jobs are deleted
+  (default 7)
+"""
+
+import asyncio
+import contextvars
+import itertools
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import asdict, dataclass, field
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from mcp.types import TextContent
+
+DEFAULT_JOBS_DB = os.path.join("~", ".cache", "insight", "jobs.sqlite3")
+DEFAULT_JOB_WORKERS = 2
+DEFAULT_QUEUE_SIZE = 100
+DEFAULT_RETENTION_DAYS = 7
+
+# Seconds between checks for cancel requests made through other processes
+CANCEL_POLL_INTERVAL = 1.0
+
+ACTIVE_STATUSES = ("queued", "running")
+FINISHED_STATUSES = ("succeeded", "failed", "cancelled")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    record TEXT NOT NULL,
+    status TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status);
+CREATE TABLE IF NOT EXISTS cancel_requests (
+    id TEXT PRIMARY KEY,
+    requested_at REAL NOT NULL
+);
+"""
+
+JobRunner = Callable[[str, dict], Awaitable[List[TextContent]]]
+
+
+@dataclass
+class JobRecord:
+    """State of one background job."""
+
+    id: str
+    tool: str
+    arguments: dict
+    priority: int = 0
+    status: str = "queued"
+    pid: int = field(default_factory=os.getpid)
+    instance: str = ""
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    result: Optional[List[str]] = None
+    error: Optional[str] = None
+    cancel_requested: bool = False
+
+    @property
+    def finished(self) -> bool:
+        """Whether the job has stopped, successfully or not."""
+        return self.status in FINISHED_STATUSES
+
+    def status_dict(self) -> Dict[str, object]:
+        """Return the record without its arguments and result."""
+        status = {
+            "job_id": self.id,
+            "tool": self.tool,
+            "status": self.status,
+            "priority": self.priority,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+        end = self.finished_at or time.time()
+        if self.started_at is not None:
+            status["run_seconds"] = round(end - self.started_at, 3)
+        if self.error is not None:
+            status["error"] = self.error
+        if self.cancel_requested and not self.finished:
+            status["cancel_requested"] = True
+        return status
+
+
+class JobStore:
+    """SQLite store of job records."""
+
+    def __init__(self, path: str):
+        """Open (or create) the job database.
+
+        Args:
+            path: Path of the SQLite database file.
+        """
+        self.path = path
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+
+    def save(self, record: JobRecord) -> None:
+        """Insert or update a job record."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO jobs (id, record, status, updated_at) "
+                "VALUES (?, ?, ?, ?)",
+                (record.id, json.dumps(asdict(record)), record.status, time.time()),
+            )
+
+    def load(self, job_id: str) -> Optional[JobRecord]:
+        """Return a job record, or None if there is none."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT record FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        return JobRecord(**json.loads(row[0])) if row is not None else None
+
+    def request_cancel(self, job_id: str) -> None:
+        """Ask the process running a job to cancel it."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO cancel_requests (id, requested_at) "
+                "VALUES (?, ?)",
+                (job_id, time.time()),
+            )
+
+    def take_cancel_requests(self, job_ids: List[str]) -> List[str]:
+        """Return and remove the cancel requests for some jobs."""
+        with self._lock, self._conn:
+            rows = self._conn.execute("SELECT id FROM cancel_requests").fetchall()
+            requested = [job_id for (job_id,) in rows if job_id in job_ids]
+            self._conn.executemany(
+                "DELETE FROM cancel_requests WHERE id = ?",
+                [(job_id,) for job_id in requested],
+            )
+        return requested
+
+    def recover(self, max_age: float, instance: str) -> int:
+        """Fail the active jobs of stopped processes and delete old finished jobs.
+
+        Args:
+            max_age: Seconds after which finished jobs are deleted.
+            instance: Instance id of the recovering scheduler. Jobs with this
+                process id but another instance id belong to a stopped server.
+
+        Returns:
+            int: Number of jobs marked as failed.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT record FROM jobs WHERE status IN (?, ?)", ACTIVE_STATUSES
+            ).fetchall()
+        interrupted = 0
+        for (data,) in rows:
+            record = JobRecord(**json.loads(data))
+            if record.pid == os.getpid():
+                if record.instance == instance:
+                    continue
+            elif _process_alive(record.pid):
+                continue
+            record.status = "failed"
+            record.error = "The server stopped before the job finished"
+            record.finished_at = time.time()
+            self.save(record)
+            interrupted += 1
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?, ?) AND updated_at < ?",
+                (*FINISHED_STATUSES, time.time() - max_age),
+            )
+            self._conn.execute(
+                "DELETE FROM cancel_requests WHERE id NOT IN "
+                "(SELECT id FROM jobs WHERE status IN (?, ?))",
+                ACTIVE_STATUSES,
+            )
+        return interrupted
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class JobScheduler:
+    """Bounded priority queue of jobs run by a fixed number of worker tasks."""
+
+    def __init__(
+        self,
+        runner: JobRunner,
+        path: str,
+        workers: int = DEFAULT_JOB_WORKERS,
+        queue_size: int = DEFAULT_QUEUE_SIZE,
+        retention: float = DEFAULT_RETENTION_DAYS * 86400,
+    ):
+        """Initialize the scheduler; the store and workers start on first use.
+
+        Args:
+            runner: Coroutine function running a tool call, given the tool name
+                and arguments.
+            path: Path of the job database.
+            workers: Number of jobs run at the same time.
+            queue_size: Maximum number of queued jobs.
+            retention: Seconds after which finished jobs are deleted.
+        """
+        self.runner = runner
+        self.path = path
+        self.workers = workers
+        self.queue_size = queue_size
+        self.retention = retention
+        self.jobs: Dict[str, JobRecord] = {}
+        # Tells this scheduler's jobs apart from those of an earlier server
+        # that had the same process id
+        self.instance = uuid.uuid4().hex
+        self._store: Optional[JobStore] = None
+        self._queue: Optional["asyncio.PriorityQueue[Tuple[int, int, str]]"] = None
+        self._order = itertools.count()
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._workers: List[asyncio.Task] = []
+        self._start_lock = asyncio.Lock()
+
+    @classmethod
+    def from_env(cls, runner: JobRunner) -> "JobScheduler":
+        """Create a scheduler configured from the environment."""
+        return cls(
+            runner,
+            path=os.path.expanduser(os.getenv("INSIGHT_JOBS_DB", DEFAULT_JOBS_DB)),
+            workers=int(os.getenv("INSIGHT_JOB_WORKERS", DEFAULT_JOB_WORKERS)),
+            queue_size=int(os.getenv("INSIGHT_JOB_QUEUE_SIZE", DEFAULT_QUEUE_SIZE)),
+            retention=float(
+                os.getenv("INSIGHT_JOB_RETENTION_DAYS", DEFAULT_RETENTION_DAYS)
+            )
+            * 86400,
+        )
+
+    async def _start(self) -> JobStore:
+        """Open the store, recover interrupted jobs and start the workers."""
+        if self._store is None:
+            async with self._start_lock:
+                if self._store is None:
+                    store = await asyncio.to_thread(JobStore, self.path)
+                    await asyncio.to_thread(
+                        store.recover, self.retention, self.instance
+                    )
+                    self._queue = asyncio.PriorityQueue(self.queue_size)
+                    # Workers must not inherit the context of the request that
+                    # started them, such as its progress token and metrics
+                    works = [self._work] * self.workers + [self._watch_cancel_requests]
+                    self._workers = [
+                        asyncio.create_task(work(), context=contextvars.Context())
+                        for work in works
+                    ]
+                    self._store = store
+        return self._store
+
+    async def _save(self, record: JobRecord) -> None:
+        await asyncio.to_thread(self._store.save, record)
+
+    async def submit(self, tool: str, arguments: dict, priority: int = 0) -> JobRecord:
+        """Queue a tool call as a job.
+
+        Jobs with a higher priority run first; jobs of equal priority run in
+        submission order.
+
+        Raises:
+            ValueError: If the queue is full.
+        """
+        await self._start()
+        if self._queue.full():
+            raise ValueError(
+                f"Job queue is full ({self.queue_size} jobs); try again later"
+            )
+        record = JobRecord(
+            uuid.uuid4().hex, tool, arguments, priority, instance=self.instance
+        )
+        self.jobs[record.id] = record
+        await self._save(record)
+        self._queue.put_nowait((-priority, next(self._order), record.id))
+        return record
+
+    async def get(self, job_id: str) -> JobRecord:
+        """Return a job's record, from this process or the job database.
+
+        Raises:
+            ValueError: If there is no such job.
+        """
+        record = self.jobs.get(job_id)
+        if record is None:
+            store = await self._start()
+            record = await asyncio.to_thread(store.load, job_id)
+        if record is None:
+            raise ValueError(f"Unknown job: {job_id}")
+        return record
+
+    async def cancel(self, job_id: str) -> JobRecord:
+        """Cancel a queued or running job; finished jobs are left as they are.
+
+        A job of another server process is cancelled by that process once it
+        sees the request; its record is returned with ``cancel_requested`` set.
+
+        Raises:
+            ValueError: If there is no such job.
+        """
+        record = await self.get(job_id)
+        if record.finished:
+            return record
+        if record.id not in self.jobs:
+            await asyncio.to_thread(self._store.request_cancel, job_id)
+            record.cancel_requested = True
+            return record
+        task = self._tasks.get(job_id)
+        if task is not None:
+            task.cancel()
+            await asyncio.wait([task])
+        # A queued job is skipped once it reaches a worker
+        if not record.finished:
+            await self._finish(record, "cancelled")
+        return record
+
+    async def _watch_cancel_requests(self) -> None:
+        while True:
+            await asyncio.sleep(CANCEL_POLL_INTERVAL)
+            if not self.jobs:
+                continue
+            requested = await asyncio.to_thread(
+                self._store.take_cancel_requests, list(self.jobs)
+            )
+            for job_id in requested:
+                if job_id in self.jobs:
+                    await self.cancel(job_id)
+
+    async def _finish(
+        self,
+        record: JobRecord,
+        status: str,
+        result: Optional[List[str]] = None,
+        error: Optional[str] = None,
+    ) -> None:
+        record.status = status
+        record.result = result
+        record.error = error
+        record.finished_at = time.time()
+        await self._save(record)
+        # Finished records are served from the database from now on
+        self.jobs.pop(record.id, None)
+
+    async def _work(self) -> None:
+        while True:
+            _, _, job_id = await self._queue.get()
+            record = self.jobs.get(job_id)
+            if record is None or record.finished:
+                continue
+            record.status = "running"
+            record.started_at = time.time()
+            await self._save(record)
+            task = asyncio.create_task(self.runner(record.tool, record.arguments))
+            self._tasks[job_id] = task
+            try:
+                contents = await asyncio.shield(task)
+            except asyncio.CancelledError:
+                if not task.cancelled():
+                    # The worker itself is being stopped
+                    task.cancel()
+                    raise
+                if not record.finished:
+                    await self._finish(record, "cancelled")
+            except Exception as e:
+                await self._finish(record, "failed", error=str(e))
+            else:
+                texts = [content.text for content in contents]
+                await self._finish(record, "succeeded", result=texts)
+            finally:
+                self._tasks.pop(job_id, None)
+
+    def snapshot(self) -> Dict[str, int]:
+        """Return the number of queued and running jobs of this process."""
+        return {
+            "queued": sum(1 for r in self.jobs.values() if r.status == "queued"),
+            "running": len(self._tasks),
+        }
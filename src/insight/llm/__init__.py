@@ -0,0 +1,5 @@
+"""LLM support layer for the insight MCP server.
+
+This package contains the pieces that sit between tool handlers and the
+language model providers, such as the persistent response cache.
+"""
@@ -0,0 +1,255 @@
+"""Persistent, content-addressed cache for LLM responses.
+
+Responses are stored zlib-compressed in an SQLite database and keyed by a hash of
+the input content, the provider and model, the sampling settings and the prompt
+templates used to produce them. Entries are evicted least-recently-used once the
+database exceeds its size budget, and unconditionally once they exceed their
+maximum age.
+"""
+
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from dataclasses import asdict, dataclass
+from typing import TYPE_CHECKING, Dict, Optional, Sequence
+
+from .models import describe_llm
+
+if TYPE_CHECKING:
+    from langchain_core.language_models import BaseLanguageModel
+
+DEFAULT_CACHE_DIR = os.path.join("~", ".cache", "insight")
+DEFAULT_MAX_MB = 256
+DEFAULT_MAX_AGE_DAYS = 30
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at);
+"""
+
+
+@dataclass
+class CacheStats:
+    """Counters describing cache activity since the process started."""
+
+    hits: int = 0
+    misses: int = 0
+    writes: int = 0
+    evictions: int = 0
+
+
+class ResponseCache:
+    """SQLite-backed LRU cache of LLM responses."""
+
+    def __init__(self, path: str, max_bytes: int, max_age: float):
+        """Open (or create) the cache database.
+
+        Args:
+            path: Path of the SQLite database file.
+            max_bytes: Maximum total size of the compressed values.
+            max_age: Maximum age of an entry in seconds.
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.stats = CacheStats()
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+
+    @staticmethod
+    def make_key(*parts: str) -> str:
+        """Return the content address for the given key parts."""
+        digest = hashlib.sha256()
+        for part in parts:
+            encoded = part.encode("utf-8")
+            digest.update(len(encoded).to_bytes(8, "big"))
+            digest.update(encoded)
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached response for a key, or None on a miss."""
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and row[1] < now - self.max_age:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self.stats.evictions += 1
+                row = None
+            if row is None:
+                self.stats.misses += 1
+                return None
+            self._conn.execute(
+                "UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key)
+            )
+            self.stats.hits += 1
+        return zlib.decompress(row[0]).decode("utf-8")
+
+    def put(self, key: str, value: str) -> None:
+        """Store a response and evict entries that exceed the cache budgets."""
+        blob = zlib.compress(value.encode("utf-8"))
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses "
+                "(key, value, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, blob, len(blob), now, now),
+            )
+            self.stats.writes += 1
+            self._evict(now)
+
+    def _evict(self, now: float) -> None:
+        """Drop expired entries, then least recently used ones over the size budget."""
+        cursor = self._conn.execute(
+            "DELETE FROM responses WHERE created_at < ?", (now - self.max_age,)
+        )
+        self.stats.evictions += cursor.rowcount
+
+        (total,) = self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()
+        if total <= self.max_bytes:
+            return
+
+        victims = []
+        for key, size in self._conn.execute(
+            "SELECT key, size FROM responses ORDER BY accessed_at"
+        ):
+            if total <= self.max_bytes:
+                break
+            victims.append((key,))
+            total -= size
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", victims)
+        self.stats.evictions += len(victims)
+
+    async def aget(self, key: str) -> Optional[str]:
+        """Asynchronously return the cached response for a key."""
+        return await asyncio.to_thread(self.get, key)
+
+    async def aput(self, key: str, value: str) -> None:
+        """Asynchronously store a response."""
+        await asyncio.to_thread(self.put, key, value)
+
+    def clear(self) -> None:
+        """Remove every cached response."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM responses")
+
+    def snapshot(self) -> Dict[str, int]:
+        """Return the hit/miss counters together with the entry count and size."""
+        with self._lock:
+            entries, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+        return {**asdict(self.stats), "entries": entries, "bytes": size}
+
+
+def llm_cache_key(
+    step: str,
+    llm: "BaseLanguageModel",
+    content: str,
+    *templates: str,
+    later_llms: Sequence["BaseLanguageModel"] = (),
+) -> str:
+    """Build the cache key for one LLM-backed step.
+
+    Args:
+        step: Name of the tool or pipeline step producing the response.
+        llm: Model the step runs on; its provider, model, temperature and output
+            limit are part of the key.
+        content: Input content sent to the model.
+        *templates: Prompt templates used by the step. Any edit to a template
+            changes its hash and therefore invalidates earlier entries.
+        later_llms: Models of later steps that transform the response, when one
+            cache entry covers a multi-step pipeline.
+
+    Returns:
+        str: Hex digest addressing the response.
+    """
+    models = []
+    for model in (llm, *later_llms):
+        info = describe_llm(model)
+        models.extend(
+            [
+                info.provider,
+                str(info.model),
+                str(info.temperature),
+                str(info.max_tokens),
+            ]
+        )
+    template_version = ResponseCache.make_key(*templates)
+    return ResponseCache.make_key(step, *models, template_version, content)
+
+
+_cache: Optional[ResponseCache] = None
+_cache_lock = threading.Lock()
+
+
+def _cache_enabled() -> bool:
+    enabled = os.getenv("INSIGHT_CACHE_ENABLED", "true").lower()
+    return enabled not in ("0", "false", "no")
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """Return the process-wide response cache configured from the environment.
+
+    The cache is configured through ``INSIGHT_CACHE_ENABLED`` (default ``true``),
+    ``INSIGHT_CACHE_DIR`` (default ``~/.cache/insight``), ``INSIGHT_CACHE_MAX_MB``
+    and ``INSIGHT_CACHE_MAX_AGE_DAYS``. Opening the cache creates its directory
+    and database; use ``open_response_cache`` on the event loop.
+
+    Returns:
+        Optional[ResponseCache]: The shared cache, or None when caching is disabled.
+    """
+    global _cache
+    if not _cache_enabled():
+        return None
+    with _cache_lock:
+        if _cache is None:
+            directory = os.path.expanduser(
+                os.getenv("INSIGHT_CACHE_DIR", DEFAULT_CACHE_DIR)
+            )
+            _cache = ResponseCache(
+                os.path.join(directory, "responses.sqlite3"),
+                max_bytes=int(
+                    float(os.getenv("INSIGHT_CACHE_MAX_MB", DEFAULT_MAX_MB)) * 2**20
+                ),
+                max_age=float(
+                    os.getenv("INSIGHT_CACHE_MAX_AGE_DAYS", DEFAULT_MAX_AGE_DAYS)
+                )
+                * 86400,
+            )
+    return _cache
+
+
+async def open_response_cache() -> Optional[ResponseCache]:
+    """Return the process-wide response cache, opening it in a worker thread."""
+    if not _cache_enabled():
+        return None
+    if _cache is not None:
+        return _cache
+    return await asyncio.to_thread(get_response_cache)
+
+
+def cache_metrics() -> Optional[Dict[str, int]]:
+    """Return the snapshot of the response cache, or None if it is not open.
+
+    The snapshot counts the cached entries in SQLite, so call it off the event
+    loop.
+    """
+    return _cache.snapshot() if _cache is not None else None
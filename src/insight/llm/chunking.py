@@ -0,0 +1,183 @@
+"""Token-bounded chunking of requirements documents.
+
+Requirements content is split along file and Markdown heading boundaries and the
+resulting sections are packed into chunks that stay within a token budget, so
+that large requirement sets can be assessed in parallel pieces.
+"""
+
+import re
+from typing import Callable, List, Tuple
+
+from .tokens import CHARS_PER_TOKEN, estimate_tokens
+
+_HEADING = re.compile(r"^(?=#{1,6}\s)", re.MULTILINE)
+
+# Headings of sections that are dropped first when content must be trimmed.
+LOW_PRIORITY_HEADINGS = (
+    "reference",
+    "glossary",
+    "appendix",
+    "terms and definitions",
+    "out of scope",
+    "verification",
+)
+
+
+def split_sections(content: str) -> List[str]:
+    """Split Markdown content into sections that each start at a heading."""
+    return [section for section in _HEADING.split(content) if section.strip()]
+
+
+def _cut(text: str, max_tokens: int, count: Callable[[str], int]) -> int:
+    """Return the length of the longest prefix of a text within the budget.
+
+    The prefix is measured with ``count`` rather than assumed from
+    ``CHARS_PER_TOKEN``, since a tokenizer may need far more tokens than the
+    estimate for dense text such as identifiers, numbers or non-Latin scripts.
+    At least one character is kept so that splitting always makes progress.
+    """
+    if len(text) <= 1 or count(text) <= max_tokens:
+        return len(text)
+    # Start from the estimate, then search between it and the text's length
+    low, high = 1, len(text) - 1
+    guess = min(max(max_tokens * CHARS_PER_TOKEN, low), high)
+    if count(text[:guess]) <= max_tokens:
+        low = guess
+    else:
+        high = guess - 1
+    while low < high:
+        middle = (low + high + 1) // 2
+        if count(text[:middle]) <= max_tokens:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+def _split_oversized(
+    section: str, max_tokens: int, count: Callable[[str], int]
+) -> List[str]:
+    """Split a section that exceeds the budget on line boundaries."""
+    pieces = []
+    current = ""
+    current_tokens = 0
+    for line in section.splitlines(keepends=True):
+        while count(line) > max_tokens:
+            # A single line longer than the budget is cut where it fills the budget
+            cut = _cut(line, max_tokens, count)
+            if current:
+                pieces.append(current)
+                current, current_tokens = "", 0
+            pieces.append(line[:cut])
+            line = line[cut:]
+        line_tokens = count(line)
+        if current and current_tokens + line_tokens > max_tokens:
+            pieces.append(current)
+            current, current_tokens = "", 0
+        current += line
+        current_tokens += line_tokens
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def chunk_requirements(
+    files: List[Tuple[str, str]],
+    max_tokens: int,
+    count: Callable[[str], int] = estimate_tokens,
+) -> List[str]:
+    """Pack requirements files into chunks of at most ``max_tokens`` tokens.
+
+    Content from each file is introduced by a ``# From <file>:`` marker, repeated
+    at the top of every chunk the file continues into. Sections are packed whole;
+    a section larger than the budget is split on lines.
+
+    Args:
+        files: ``(file name, content)`` pairs in document order.
+        max_tokens: Token budget for one chunk.
+        count: Function counting the tokens of a text for the target model.
+
+    Returns:
+        List[str]: The chunks in document order.
+    """
+    chunks = []
+    current = ""
+    current_tokens = 0
+    current_file = None
+    for file, content in files:
+        marker = f"# From {file}:\n\n"
+        marker_tokens = count(marker)
+        # Pieces are followed by a blank line, which counts towards the budget
+        budget = max(max_tokens - marker_tokens - count("\n\n"), 1)
+        for section in split_sections(content):
+            for piece in _split_oversized(section, budget, count):
+                text = f"{piece.rstrip()}\n\n"
+                text_tokens = count(text)
+                continues = current and current_file == file
+                block_tokens = text_tokens + (0 if continues else marker_tokens)
+                if current and current_tokens + block_tokens > max_tokens:
+                    chunks.append(current)
+                    current, current_tokens, continues = "", 0, False
+                    block_tokens = text_tokens + marker_tokens
+                current += text if continues else marker + text
+                current_tokens += block_tokens
+                current_file = file
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def trim_sections(
+    content: str, max_tokens: int, count: Callable[[str], int] = estimate_tokens
+) -> str:
+    """Drop the lowest-priority sections of Markdown content until it fits.
+
+    Sections under low-priority headings such as references or the glossary go
+    first, then the remaining sections from the end of the document backwards.
+    The first section is always kept and, if it alone is too large, truncated.
+
+    Args:
+        content: Markdown content to trim.
+        max_tokens: Token budget the result must fit.
+        count: Function counting the tokens of a text for the target model.
+
+    Returns:
+        str: The trimmed content, with sections in their original order.
+    """
+    sections = split_sections(content)
+    if not sections:
+        return content
+    sizes = [count(section) for section in sections]
+    total = sum(sizes)
+
+    def priority(index: int) -> Tuple[int, int]:
+        heading = sections[index].split("\n", 1)[0].lower()
+        low = any(keyword in heading for keyword in LOW_PRIORITY_HEADINGS)
+        return (0 if low else 1, -index)
+
+    kept = set(range(len(sections)))
+    for index in sorted(range(1, len(sections)), key=priority):
+        if total <= max_tokens:
+            break
+        kept.remove(index)
+        total -= sizes[index]
+
+    trimmed = "".join(sections[index] for index in sorted(kept))
+    if total > max_tokens:
+        trimmed = _truncate(trimmed, max_tokens, count)
+    return trimmed
+
+
+def _truncate(text: str, max_tokens: int, count: Callable[[str], int]) -> str:
+    """Keep whole lines of a text up to the budget, then cut the next line short."""
+    kept = []
+    remaining = max_tokens
+    for line in text.splitlines(keepends=True):
+        line_tokens = count(line)
+        if line_tokens > remaining:
+            if remaining > 0:
+                kept.append(line[: _cut(line, remaining, count)])
+            break
+        kept.append(line)
+        remaining -= line_tokens
+    return "".join(kept)
@@ -0,0 +1,94 @@
+"""Single-flight coalescing of identical in-flight LLM work.
+
+When a request arrives while identical work is already running, for example two
+clients assessing the same document or an editor retrying a slow call, it waits
+for the running work instead of starting its own, and every caller gets the same
+result or exception. The work runs in a task of its own and is only cancelled
+once every caller waiting for it has been cancelled.
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Generic, Hashable, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class Flight(Generic[T]):
+    """Work shared by the callers of one key."""
+
+    def __init__(self, task: "asyncio.Task[T]", data: Any = None):
+        """Initialize a flight with its first caller.
+
+        Args:
+            task: Task running the work.
+            data: Value supplied by the first caller, such as its progress
+                reporter, for later callers to use.
+        """
+        self.task = task
+        self.data = data
+        self.waiters = 1
+
+
+class SingleFlight:
+    """Registry of in-flight work keyed by what it computes."""
+
+    def __init__(self):
+        """Initialize an empty registry."""
+        self._flights: Dict[Hashable, Flight] = {}
+
+    def __contains__(self, key: Hashable) -> bool:
+        """Return whether work for a key is in flight."""
+        return key in self._flights
+
+    def __len__(self) -> int:
+        """Return the number of keys with work in flight."""
+        return len(self._flights)
+
+    def get(self, key: Hashable) -> Optional[Flight]:
+        """Return the work in flight for a key, if any."""
+        return self._flights.get(key)
+
+    async def run(
+        self, key: Hashable, produce: Callable[[], Awaitable[T]], data: Any = None
+    ) -> T:
+        """Return the result of ``produce``, sharing it with concurrent callers.
+
+        Args:
+            key: Identity of the work; callers with equal keys share one run.
+            produce: Coroutine function doing the work, only called when no work
+                for the key is in flight.
+            data: Value stored with the flight if this call starts it.
+
+        Raises:
+            asyncio.CancelledError: If this caller is cancelled. The work itself
+                is cancelled only when no other caller is waiting for it.
+        """
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = Flight(asyncio.create_task(produce()), data)
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda _: self._finish(key, flight))
+        else:
+            flight.waiters += 1
+
+        try:
+            return await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            if not flight.task.done():
+                flight.waiters -= 1
+                if flight.waiters == 0:
+                    # Later callers must start afresh rather than join work
+                    # that is being cancelled
+                    self._forget(key, flight)
+                    flight.task.cancel()
+            raise
+
+    def _forget(self, key: Hashable, flight: Flight) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    def _finish(self, key: Hashable, flight: Flight) -> None:
+        self._forget(key, flight)
+        # Every caller may have been cancelled before the work failed
+        if not flight.task.cancelled():
+            flight.task.exception()
@@ -0,0 +1,64 @@
+"""Classification of errors raised by LLM provider SDKs.
+
+The OpenAI and Anthropic SDKs raise their own exception hierarchies; these helpers
+recognize the relevant cases without importing either SDK.
+"""
+
+import time
+from email.utils import parsedate_to_datetime
+
+
+def status_code(error: BaseException) -> "int | None":
+    """Return the HTTP status code carried by a provider error, if any."""
+    code = getattr(error, "status_code", None)
+    if code is None:
+        response = getattr(error, "response", None)
+        code = getattr(response, "status_code", None)
+    return code if isinstance(code, int) else None
+
+
+def is_rate_limit_error(error: BaseException) -> bool:
+    """Return whether an error means the provider is throttling requests."""
+    return status_code(error) == 429 or type(error).__name__ == "RateLimitError"
+
+
+# Statuses of transient failures: timeouts, conflicts, throttling, server errors
+# and Anthropic's 529 for an overloaded API
+RETRYABLE_STATUS_CODES = frozenset({408, 409, 429, 500, 502, 503, 504, 529})
+
+# Errors raised without a status when a request never got a response: connection
+# errors and timeouts of the OpenAI and Anthropic SDKs, and httpx transport errors
+RETRYABLE_ERROR_NAMES = frozenset({"APIConnectionError", "TransportError"})
+
+
+def is_retryable_error(error: BaseException) -> bool:
+    """Return whether a failed request may succeed when sent again."""
+    code = status_code(error)
+    if code is not None:
+        return code in RETRYABLE_STATUS_CODES
+    return any(cls.__name__ in RETRYABLE_ERROR_NAMES for cls in type(error).__mro__)
+
+
+def retry_after(error: BaseException) -> "float | None":
+    """Return the seconds a provider asked to wait before retrying, if any.
+
+    Reads the ``retry-after-ms`` and ``retry-after`` response headers; the latter
+    may hold seconds or an HTTP date.
+    """
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if not headers:
+        return None
+    try:
+        milliseconds = headers.get("retry-after-ms")
+        if milliseconds:
+            return max(float(milliseconds) / 1000, 0.0)
+        value = headers.get("retry-after")
+        if not value:
+            return None
+        try:
+            return max(float(value), 0.0)
+        except ValueError:
+            date = parsedate_to_datetime(value)
+            return max(date.timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
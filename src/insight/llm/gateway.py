@@ -0,0 +1,425 @@
+"""Rate-limited, adaptively concurrent gateway in front of the LLM providers.
+
+Every call to a provider model passes through the gateway for its provider and
+model. The gateway enforces requests-per-minute and tokens-per-minute token
+buckets and caps the number of concurrent requests with an AIMD limiter: the
+limit grows by one request per window of successful calls and is halved when the
+provider answers with a 429, or cut back gently when calls exceed the latency
+target.
+
+Limits are configured per provider through ``INSIGHT_<PROVIDER>_RPM``,
+``INSIGHT_<PROVIDER>_TPM`` and ``INSIGHT_<PROVIDER>_MAX_CONCURRENCY``, falling
+back to ``INSIGHT_LLM_RPM``, ``INSIGHT_LLM_TPM`` and
+``INSIGHT_LLM_MAX_CONCURRENCY``. ``INSIGHT_LLM_LATENCY_TARGET`` sets the latency
+target in seconds; without it only 429s reduce the limit. Each gateway serves
+one process, so a server running several workers splits the limits between
+them.
+
+Calls that fail with a transient error are retried as described in ``retry``;
+every attempt takes its own slot.
+"""
+
+import asyncio
+import itertools
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForLLMRun,
+    CallbackManagerForLLMRun,
+)
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from .. import metrics
+from .errors import is_rate_limit_error
+from .models import ModelInfo, describe_llm
+from .prompt_cache import message_text, strip_cache_control
+from .retry import RetryBudget, RetryPolicy, retry_budget
+from .tokens import estimate_tokens
+from .usage import UsageRecord, report_usage
+
+DEFAULT_RPM = 500
+DEFAULT_TPM = 200_000
+DEFAULT_MAX_CONCURRENCY = 16
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at a per-minute rate.
+
+    Usage that is only known after a call, such as output tokens, is charged
+    with ``debit`` and may take the bucket into debt, delaying later callers.
+    """
+
+    def __init__(self, per_minute: float):
+        """Initialize a full bucket holding one minute of capacity."""
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.available = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.available = min(
+            self.capacity, self.available + (now - self._updated) * self.rate
+        )
+        self._updated = now
+
+    async def acquire(self, amount: float = 1.0) -> None:
+        """Wait until ``amount`` tokens are available and take them.
+
+        Requests larger than the bucket's capacity wait for a full bucket.
+        Callers are served in arrival order.
+        """
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            self._refill()
+            while self.available < amount:
+                await asyncio.sleep((amount - self.available) / self.rate)
+                self._refill()
+            self.available -= amount
+
+    def debit(self, amount: float) -> None:
+        """Charge tokens without waiting, possibly taking the bucket into debt."""
+        self._refill()
+        self.available -= amount
+
+
+class AIMDLimiter:
+    """Concurrency limit with additive increase and multiplicative decrease."""
+
+    def __init__(
+        self,
+        maximum: int,
+        minimum: int = 1,
+        latency_target: Optional[float] = None,
+    ):
+        """Initialize the limiter at its maximum.
+
+        Args:
+            maximum: Upper bound of the concurrency limit.
+            minimum: Lower bound of the concurrency limit.
+            latency_target: Seconds above which a call counts as slow.
+        """
+        self.maximum = maximum
+        self.minimum = minimum
+        self.latency_target = latency_target
+        self.limit = float(maximum)
+        self.in_flight = 0
+        self.waiting = 0
+        self.throttled = 0
+        self._condition = asyncio.Condition()
+
+    async def acquire(self) -> None:
+        """Wait for a free slot under the current limit."""
+        async with self._condition:
+            self.waiting += 1
+            try:
+                await self._condition.wait_for(
+                    lambda: self.in_flight < max(int(self.limit), self.minimum)
+                )
+            finally:
+                self.waiting -= 1
+            self.in_flight += 1
+
+    async def release(self, latency: float, throttled: bool = False) -> None:
+        """Free a slot and adjust the limit from the call's outcome.
+
+        Args:
+            latency: Duration of the call in seconds.
+            throttled: Whether the provider rejected the call with a 429.
+        """
+        async with self._condition:
+            self.in_flight -= 1
+            if throttled:
+                self.throttled += 1
+                self.limit = max(self.limit / 2, self.minimum)
+            elif self.latency_target is not None and latency > self.latency_target:
+                self.limit = max(self.limit * 0.9, self.minimum)
+            else:
+                self.limit = min(self.limit + 1 / self.limit, self.maximum)
+            self._condition.notify_all()
+
+
+def _limit_from_env(provider: str, name: str, default: float) -> float:
+    variable = f"INSIGHT_{provider.upper()}_{name}"
+    if not os.getenv(variable):
+        variable = f"INSIGHT_LLM_{name}"
+    value = os.getenv(variable)
+    if not value:
+        return default
+    limit = float(value)
+    # A limit of 0 would never refill the buckets or admit a request
+    if limit < 1:
+        raise ValueError(f"{variable} must be at least 1: {value!r}")
+    return limit
+
+
+class LLMGateway:
+    """Rate limits and concurrency control for one provider model."""
+
+    def __init__(
+        self,
+        rpm: float,
+        tpm: float,
+        max_concurrency: int,
+        latency_target: Optional[float] = None,
+        retry: Optional[RetryPolicy] = None,
+        budget: Optional[RetryBudget] = None,
+    ):
+        """Initialize the gateway's buckets, limiter and retry policy.
+
+        Without a retry policy or budget, failed calls are not retried.
+        """
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.limiter = AIMDLimiter(max_concurrency, latency_target=latency_target)
+        self.usage = UsageRecord()
+        self.retry = retry
+        self.budget = budget
+        self.retries = 0
+
+    @classmethod
+    def from_env(cls, provider: str) -> "LLMGateway":
+        """Create a gateway configured from the environment for a provider.
+
+        When the server runs ``INSIGHT_WORKERS`` worker processes, each worker's
+        gateway gets an equal share of the limits.
+        """
+        latency_target = os.getenv("INSIGHT_LLM_LATENCY_TARGET")
+        workers = max(int(os.getenv("INSIGHT_WORKERS", "1")), 1)
+        return cls(
+            rpm=_limit_from_env(provider, "RPM", DEFAULT_RPM) / workers,
+            tpm=_limit_from_env(provider, "TPM", DEFAULT_TPM) / workers,
+            max_concurrency=max(
+                int(
+                    _limit_from_env(
+                        provider, "MAX_CONCURRENCY", DEFAULT_MAX_CONCURRENCY
+                    )
+                )
+                // workers,
+                1,
+            ),
+            latency_target=float(latency_target) if latency_target else None,
+            retry=RetryPolicy.from_env(),
+            budget=retry_budget(),
+        )
+
+    @asynccontextmanager
+    async def slot(self, input_tokens: int) -> AsyncIterator["LLMGateway"]:
+        """Hold a rate-limited concurrency slot for one provider call.
+
+        Args:
+            input_tokens: Estimated prompt size, charged to the token bucket up
+                front. Output tokens are charged afterwards with ``complete``.
+        """
+        await self.limiter.acquire()
+        start = time.monotonic()
+        throttled = False
+        try:
+            await self.requests.acquire()
+            await self.tokens.acquire(input_tokens)
+            start = time.monotonic()
+            yield self
+        except Exception as e:
+            throttled = is_rate_limit_error(e)
+            raise
+        finally:
+            # A cancelled call must still give its permit back, even if the
+            # cancellation is delivered again while the release waits
+            await asyncio.shield(
+                self.limiter.release(time.monotonic() - start, throttled)
+            )
+
+    def record_call(self) -> None:
+        """Count a call's first attempt towards the retry budget."""
+        if self.budget is not None:
+            self.budget.record_call()
+
+    async def backoff(self, error: Exception, retry: int, elapsed: float) -> bool:
+        """Wait before retrying a failed attempt, if it is to be retried.
+
+        Args:
+            error: The error the attempt failed with.
+            retry: Number of the retry, starting at 0 for the first.
+            elapsed: Duration of the failed attempt in seconds.
+
+        Returns:
+            bool: Whether to retry the call.
+        """
+        if self.retry is None or self.budget is None:
+            return False
+        delay = self.retry.delay(error, retry)
+        if delay is None or not self.budget.spend():
+            return False
+        self.retries += 1
+        await asyncio.sleep(delay)
+        metrics.record_retry(elapsed + delay)
+        return True
+
+    def complete(
+        self, message: BaseMessage, prompt_tokens: int, seconds: float
+    ) -> None:
+        """Account for a response: charge its output tokens and record its usage.
+
+        Args:
+            message: The complete response.
+            prompt_tokens: Estimated prompt size, used if the provider reports
+                no usage.
+            seconds: Time from the request entering the gateway to the response.
+        """
+        output_tokens = _output_tokens(message)
+        self.tokens.debit(output_tokens)
+        self.usage.add_message(message)
+        report_usage(message)
+        usage = getattr(message, "usage_metadata", None) or {}
+        metrics.record_llm(
+            seconds, usage.get("input_tokens") or prompt_tokens, output_tokens
+        )
+
+    def snapshot(self) -> Dict[str, float]:
+        """Return the gateway's queue depth, limit, bucket levels and usage."""
+        return {
+            **self.usage.to_dict(),
+            "queue_depth": self.limiter.waiting,
+            "in_flight": self.limiter.in_flight,
+            "concurrency_limit": round(self.limiter.limit, 2),
+            "throttled": self.limiter.throttled,
+            "retries": self.retries,
+            "requests_available": round(self.requests.available, 2),
+            "tokens_available": round(self.tokens.available, 2),
+        }
+
+
+_gateways: Dict[Tuple[str, Optional[str]], LLMGateway] = {}
+
+
+def get_gateway(info: ModelInfo) -> LLMGateway:
+    """Return the process-wide gateway for a provider model."""
+    key = (info.provider, info.model)
+    if key not in _gateways:
+        _gateways[key] = LLMGateway.from_env(info.provider)
+    return _gateways[key]
+
+
+def gateway_metrics() -> Dict[str, Dict[str, float]]:
+    """Return a snapshot of every gateway, keyed by ``provider/model``."""
+    return {
+        f"{provider}/{model}": gateway.snapshot()
+        for (provider, model), gateway in _gateways.items()
+    }
+
+
+def _prompt_tokens(messages: List[BaseMessage]) -> int:
+    return sum(estimate_tokens(message_text(message)) for message in messages)
+
+
+def _output_tokens(message: BaseMessage) -> int:
+    usage = getattr(message, "usage_metadata", None)
+    if usage:
+        return usage.get("output_tokens", 0)
+    return estimate_tokens(message_text(message))
+
+
+class GatewayChatModel(BaseChatModel):
+    """Chat model that routes every call to its inner model through a gateway."""
+
+    inner: BaseChatModel
+    gateway: Any = None
+
+    @property
+    def _llm_type(self) -> str:
+        return self.inner._llm_type
+
+    def _prepare(self, messages: List[BaseMessage]) -> List[BaseMessage]:
+        # Only Anthropic understands cache_control markers; the replay model
+        # passes them on to the provider it records
+        if describe_llm(self.inner).provider in ("anthropic", "replay"):
+            return messages
+        return strip_cache_control(messages)
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        # Synchronous calls are not used by the server and bypass the gateway.
+        message = self.inner.invoke(self._prepare(messages), stop=stop, **kwargs)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        messages = self._prepare(messages)
+        prompt_tokens = _prompt_tokens(messages)
+        self.gateway.record_call()
+        for retry in itertools.count():
+            start = time.monotonic()
+            try:
+                async with self.gateway.slot(prompt_tokens):
+                    message = await self.inner.ainvoke(messages, stop=stop, **kwargs)
+                break
+            except Exception as e:
+                if not await self.gateway.backoff(e, retry, time.monotonic() - start):
+                    raise
+        self.gateway.complete(message, prompt_tokens, time.monotonic() - start)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        messages = self._prepare(messages)
+        prompt_tokens = _prompt_tokens(messages)
+        output = None
+        self.gateway.record_call()
+        for retry in itertools.count():
+            start = time.monotonic()
+            try:
+                async with self.gateway.slot(prompt_tokens):
+                    async for chunk in self.inner.astream(
+                        messages, stop=stop, **kwargs
+                    ):
+                        output = chunk if output is None else output + chunk
+                        if run_manager is not None:
+                            await run_manager.on_llm_new_token(
+                                message_text(chunk), chunk=chunk
+                            )
+                        yield ChatGenerationChunk(message=chunk)
+                break
+            except BaseException as e:
+                # A stream is only retried before its first chunk, since the
+                # caller has already received the output
+                if (
+                    isinstance(e, Exception)
+                    and output is None
+                    and await self.gateway.backoff(e, retry, time.monotonic() - start)
+                ):
+                    continue
+                # Output streamed before a failure or cancellation was still paid for
+                if output is not None:
+                    self.gateway.complete(
+                        output, prompt_tokens, time.monotonic() - start
+                    )
+                raise
+        self.gateway.complete(
+            output or AIMessage(content=""), prompt_tokens, time.monotonic() - start
+        )
+
+
+def with_gateway(llm: BaseChatModel) -> GatewayChatModel:
+    """Wrap a provider model so its calls go through the shared gateway."""
+    return GatewayChatModel(inner=llm, gateway=get_gateway(describe_llm(llm)))
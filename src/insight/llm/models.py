@@ -0,0 +1,51 @@
+"""Identification of the language model behind a LangChain model instance."""
+
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    from langchain_core.language_models import BaseLanguageModel
+
+
+@dataclass(frozen=True)
+class ModelInfo:
+    """Provider, model and sampling settings of a language model."""
+
+    provider: str
+    model: Optional[str]
+    temperature: Optional[float]
+    max_tokens: Optional[int]
+
+
+def unwrap_llm(llm: "BaseLanguageModel") -> "BaseLanguageModel":
+    """Return the provider model underneath any insight wrapper models.
+
+    Wrappers, such as the rate-limiting gateway, keep the model they wrap in an
+    ``inner`` attribute.
+    """
+    while getattr(llm, "inner", None) is not None:
+        llm = llm.inner
+    return llm
+
+
+def describe_llm(llm: "BaseLanguageModel") -> ModelInfo:
+    """Return the provider, model and sampling settings of a language model.
+
+    The provider is ``openai`` or ``anthropic`` for the built-in chat models and
+    the LangChain ``_llm_type`` of any other model. Wrapper models are described
+    by the model they wrap.
+    """
+    llm = unwrap_llm(llm)
+    llm_type = str(getattr(llm, "_llm_type", type(llm).__name__))
+    if "anthropic" in llm_type:
+        provider = "anthropic"
+    elif "openai" in llm_type:
+        provider = "openai"
+    else:
+        provider = llm_type
+    return ModelInfo(
+        provider=provider,
+        model=getattr(llm, "model_name", None) or getattr(llm, "model", None),
+        temperature=getattr(llm, "temperature", None),
+        max_tokens=getattr(llm, "max_tokens", None),
+    )
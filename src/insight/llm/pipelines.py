@@ -0,0 +1,139 @@
+"""Registry of prompt templates and the runnable pipelines built from them.
+
+Templates are validated when they are registered, normally while the handler
+modules are imported at server startup. A template whose placeholders do not
+match its declared input variables fails the registration instead of a later
+tool call. Each template is compiled into a LangChain chat prompt once, on first
+use. Each ``prompt | llm | StrOutputParser()`` pipeline is built once per model
+and reused by every later call.
+
+A compiled prompt has two messages. The static paragraphs of the template, up to
+the paragraph holding its first placeholder, become a system message marked as a
+cacheable prefix (see ``insight.llm.prompt_cache``). The rest becomes the user
+message.
+"""
+
+import string
+from typing import TYPE_CHECKING, Dict, List, Sequence, Tuple
+
+if TYPE_CHECKING:
+    from langchain_core.language_models import BaseLanguageModel
+    from langchain_core.prompts import ChatPromptTemplate
+    from langchain_core.runnables import Runnable
+
+
+def split_prefix(template: str) -> Tuple[str, str]:
+    """Split a template into its static prefix and the templated remainder.
+
+    The prefix is made of the leading paragraphs without placeholders. Doubled
+    braces in the prefix are unescaped.
+
+    Returns:
+        Tuple[str, str]: The literal prefix, empty if the first paragraph has a
+        placeholder, and the remainder, still an f-string template.
+    """
+    paragraphs = template.split("\n\n")
+    static = 0
+    while static < len(paragraphs) and not template_variables(paragraphs[static]):
+        static += 1
+    prefix = "\n\n".join(paragraphs[:static])
+    return prefix.format(), "\n\n".join(paragraphs[static:])
+
+
+def template_variables(template: str) -> List[str]:
+    """Return the placeholder names of an f-string template in order.
+
+    Raises:
+        ValueError: If the template has unbalanced braces.
+    """
+    names = []
+    for _, name, _, _ in string.Formatter().parse(template):
+        if name is not None and name not in names:
+            names.append(name)
+    return names
+
+
+class PipelineRegistry:
+    """Validated prompt templates with compiled prompts and pipelines."""
+
+    def __init__(self):
+        """Initialize an empty registry."""
+        self._templates: Dict[str, Tuple[str, Tuple[str, ...]]] = {}
+        self._prompts: Dict[str, "ChatPromptTemplate"] = {}
+        self._runnables: Dict[
+            Tuple[str, int], Tuple["BaseLanguageModel", "Runnable"]
+        ] = {}
+
+    def register(
+        self, name: str, template: str, input_variables: Sequence[str]
+    ) -> None:
+        """Register a template after checking its placeholders.
+
+        Args:
+            name: Name the template is looked up by.
+            template: f-string template; literal braces must be doubled.
+            input_variables: Variables the template must use, each at least once.
+
+        Raises:
+            ValueError: If the name is taken, or the template's placeholders
+                differ from ``input_variables``.
+        """
+        if name in self._templates:
+            raise ValueError(f"Prompt template already registered: {name}")
+        try:
+            found = template_variables(template)
+        except ValueError as e:
+            raise ValueError(f"Invalid prompt template {name}: {str(e)}") from e
+        if set(found) != set(input_variables):
+            raise ValueError(
+                f"Prompt template {name} uses placeholders {sorted(found)} but "
+                f"declares {sorted(input_variables)}"
+            )
+        self._templates[name] = (template, tuple(input_variables))
+
+    def template(self, name: str) -> str:
+        """Return the text of a registered template.
+
+        Raises:
+            ValueError: If no template has that name.
+        """
+        if name not in self._templates:
+            raise ValueError(f"Unknown prompt template: {name}")
+        return self._templates[name][0]
+
+    def prompt(self, name: str) -> "ChatPromptTemplate":
+        """Return the compiled prompt of a template, compiling it on first use."""
+        if name not in self._prompts:
+            from langchain_core.prompts import (
+                ChatPromptTemplate,
+                HumanMessagePromptTemplate,
+            )
+
+            from .prompt_cache import cacheable_system_message
+
+            prefix, remainder = split_prefix(self.template(name))
+            messages = []
+            if prefix:
+                messages.append(cacheable_system_message(prefix))
+            if remainder:
+                messages.append(HumanMessagePromptTemplate.from_template(remainder))
+            self._prompts[name] = ChatPromptTemplate.from_messages(messages)
+        return self._prompts[name]
+
+    def runnable(self, name: str, llm: "BaseLanguageModel") -> "Runnable":
+        """Return the ``prompt | llm | StrOutputParser()`` pipeline of a template.
+
+        Pipelines are built once per template and model instance.
+        """
+        key = (name, id(llm))
+        cached = self._runnables.get(key)
+        if cached is None or cached[0] is not llm:
+            from langchain_core.output_parsers import StrOutputParser
+
+            cached = (llm, self.prompt(name) | llm | StrOutputParser())
+            self._runnables[key] = cached
+        return cached[1]
+
+    def __contains__(self, name: str) -> bool:
+        """Return whether a template is registered under the name."""
+        return name in self._templates
@@ -0,0 +1,380 @@
+"""Hedged and failover requests across a pool of LLM backends.
+
+A pool holds an ordered list of backends, each a provider model with its own
+circuit breaker and latency history. Every request goes to the first backend
+whose circuit is closed. If it has not answered within that backend's p95
+latency, the same request is hedged to the next backend and whichever answers
+first wins; the other request is cancelled. A backend that fails hands the
+request over to the next one, and a backend that keeps failing is skipped until
+its circuit breaker lets a trial request through again.
+
+Streaming requests are hedged and failed over on their first chunk: once a
+backend has produced output, the stream stays with that backend.
+"""
+
+import asyncio
+import os
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Deque,
+    Dict,
+    List,
+    Optional,
+    TypeVar,
+)
+
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForLLMRun,
+    CallbackManagerForLLMRun,
+)
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from .models import describe_llm
+
+T = TypeVar("T")
+
+DEFAULT_HEDGE_AFTER = 5.0
+DEFAULT_BREAKER_FAILURES = 5
+DEFAULT_BREAKER_RESET = 30.0
+LATENCY_WINDOW = 200
+MIN_LATENCY_SAMPLES = 20
+
+
+@dataclass(eq=False)
+class Permit:
+    """Permission from a circuit breaker to send one request.
+
+    ``trial`` marks the single request let through a half-open circuit.
+    """
+
+    trial: bool = False
+
+
+class CircuitBreaker:
+    """Circuit breaker that stops traffic to a backend after repeated failures.
+
+    After ``failure_threshold`` consecutive failures the circuit opens and the
+    backend is skipped. Once ``reset_timeout`` seconds have passed, one trial
+    request is let through: success closes the circuit, failure opens it again.
+    Only the request holding the trial permit frees the trial slot, so that
+    other requests still running against the backend, such as a hedge that lost
+    its race, cannot let a second trial through.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = DEFAULT_BREAKER_FAILURES,
+        reset_timeout: float = DEFAULT_BREAKER_RESET,
+    ):
+        """Initialize a closed circuit."""
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial: Optional[Permit] = None
+
+    @property
+    def state(self) -> str:
+        """``closed``, ``open`` or ``half_open``."""
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> Optional[Permit]:
+        """Return a permit to send a request, or None if the circuit refuses it.
+
+        In the half-open state the permit reserves the trial slot.
+        """
+        state = self.state
+        if state == "closed":
+            return Permit()
+        if state == "half_open" and self._trial is None:
+            self._trial = Permit(trial=True)
+            return self._trial
+        return None
+
+    def record_success(self, permit: Permit) -> None:
+        """Close the circuit after a successful request."""
+        self.failures = 0
+        self.opened_at = None
+        self._trial = None
+
+    def record_failure(self, permit: Permit) -> None:
+        """Count a failed request, opening the circuit at the threshold."""
+        self.failures += 1
+        if permit is self._trial or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+            self._trial = None
+
+    def release(self, permit: Permit) -> None:
+        """Give back a permit whose request was cancelled."""
+        if permit is self._trial:
+            self._trial = None
+
+
+class LatencyTracker:
+    """Sliding window of request latencies."""
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        """Initialize an empty window holding up to ``window`` samples."""
+        self.samples: Deque[float] = deque(maxlen=window)
+
+    def record(self, seconds: float) -> None:
+        """Add a latency sample."""
+        self.samples.append(seconds)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Return the ``q``-th percentile, or None with too few samples."""
+        if len(self.samples) < MIN_LATENCY_SAMPLES:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(int(len(ordered) * q / 100), len(ordered) - 1)]
+
+
+@dataclass
+class Backend:
+    """One provider model of a pool, with its breaker and latency history."""
+
+    llm: BaseChatModel
+    breaker: CircuitBreaker = field(default_factory=CircuitBreaker)
+    latencies: Dict[str, LatencyTracker] = field(default_factory=dict)
+
+    @property
+    def name(self) -> str:
+        """``provider/model`` of the backend."""
+        info = describe_llm(self.llm)
+        return f"{info.provider}/{info.model}"
+
+    def tracker(self, kind: str) -> LatencyTracker:
+        """Return the latency history of one kind of request."""
+        return self.latencies.setdefault(kind, LatencyTracker())
+
+
+def _float_from_env(name: str, default: float) -> float:
+    value = os.getenv(name)
+    return float(value) if value else default
+
+
+class PooledChatModel(BaseChatModel):
+    """Chat model that hedges and fails over requests across several backends."""
+
+    backends: List[Any]
+    hedge: bool = True
+    hedge_after: float = DEFAULT_HEDGE_AFTER
+
+    @classmethod
+    def from_models(cls, models: List[BaseChatModel]) -> "PooledChatModel":
+        """Create a pool from models in order of preference.
+
+        Hedging is configured with ``INSIGHT_HEDGE`` (default on) and
+        ``INSIGHT_HEDGE_AFTER``, the delay in seconds used until a backend has
+        enough latency samples for its p95. Circuit breakers are configured with
+        ``INSIGHT_BREAKER_FAILURES`` and ``INSIGHT_BREAKER_RESET``.
+        """
+        failures = int(_float_from_env("INSIGHT_BREAKER_FAILURES", 5))
+        reset = _float_from_env("INSIGHT_BREAKER_RESET", DEFAULT_BREAKER_RESET)
+        return cls(
+            backends=[
+                Backend(llm, breaker=CircuitBreaker(failures, reset)) for llm in models
+            ],
+            hedge=os.getenv("INSIGHT_HEDGE", "true").lower() in ("1", "true", "yes"),
+            hedge_after=_float_from_env("INSIGHT_HEDGE_AFTER", DEFAULT_HEDGE_AFTER),
+        )
+
+    @property
+    def inner(self) -> BaseChatModel:
+        """Primary backend, which identifies the pool for caching and budgets."""
+        return self.backends[0].llm
+
+    @property
+    def _llm_type(self) -> str:
+        return self.inner._llm_type
+
+    def _hedge_delay(self, backend: Backend, kind: str) -> float:
+        return backend.tracker(kind).percentile(95) or self.hedge_after
+
+    async def _attempt(
+        self,
+        backend: Backend,
+        permit: Permit,
+        kind: str,
+        call: Callable[[BaseChatModel], Awaitable[T]],
+    ) -> T:
+        start = time.monotonic()
+        try:
+            result = await call(backend.llm)
+        except asyncio.CancelledError:
+            backend.breaker.release(permit)
+            raise
+        except Exception:
+            backend.breaker.record_failure(permit)
+            raise
+        backend.tracker(kind).record(time.monotonic() - start)
+        backend.breaker.record_success(permit)
+        return result
+
+    async def _race(
+        self,
+        kind: str,
+        call: Callable[[BaseChatModel], Awaitable[T]],
+        discard: Optional[Callable[[T], Awaitable[None]]] = None,
+    ) -> T:
+        """Run ``call`` against the backends, hedging and failing over.
+
+        Args:
+            kind: Kind of request, used to keep latency histories apart.
+            call: Sends the request to one backend's model.
+            discard: Releases a result that lost the race, such as an open
+                stream.
+
+        Returns:
+            The result of the first backend that succeeds.
+        """
+        candidates = iter(self.backends)
+        pending: Dict["asyncio.Task[T]", Backend] = {}
+        errors: List[BaseException] = []
+
+        def launch() -> Optional[Backend]:
+            for backend in candidates:
+                permit = backend.breaker.allow()
+                if permit is not None:
+                    task = asyncio.create_task(
+                        self._attempt(backend, permit, kind, call)
+                    )
+                    pending[task] = backend
+                    return backend
+            return None
+
+        latest = launch()
+        if latest is None:
+            names = ", ".join(backend.name for backend in self.backends)
+            raise ValueError(f"No LLM backend available, all circuits open: {names}")
+        can_hedge = self.hedge
+        try:
+            while pending:
+                timeout = None
+                if can_hedge and len(pending) == 1:
+                    timeout = self._hedge_delay(latest, kind)
+                done, _ = await asyncio.wait(
+                    pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    # The request is slow: hedge it to the next backend
+                    hedged = launch()
+                    can_hedge = hedged is not None
+                    latest = hedged or latest
+                    continue
+
+                winner = None
+                for task in done:
+                    pending.pop(task)
+                    if task.exception() is not None:
+                        errors.append(task.exception())
+                    elif winner is None:
+                        winner = task
+                    elif discard is not None:
+                        await discard(task.result())
+                if winner is not None:
+                    return winner.result()
+                if not pending:
+                    # Every request so far failed: fail over to the next backend
+                    latest = launch() or latest
+            raise errors[-1]
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                # A loser may have finished before its cancellation, even while
+                # the winner was being picked, and its result must be released
+                await asyncio.wait(pending)
+                for task in pending:
+                    if task.cancelled() or task.exception() is not None:
+                        continue
+                    if discard is not None:
+                        await discard(task.result())
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        # Synchronous calls are not used by the server and only fail over.
+        for index, backend in enumerate(self.backends):
+            try:
+                message = backend.llm.invoke(messages, stop=stop, **kwargs)
+            except Exception:
+                if index == len(self.backends) - 1:
+                    raise
+                continue
+            return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        message = await self._race(
+            "invoke", lambda llm: llm.ainvoke(messages, stop=stop, **kwargs)
+        )
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        async def first_chunk(llm: BaseChatModel):
+            stream = llm.astream(messages, stop=stop, **kwargs).__aiter__()
+            try:
+                return stream, await stream.__anext__()
+            except StopAsyncIteration:
+                return stream, None
+            except BaseException:
+                await stream.aclose()
+                raise
+
+        async def close(started) -> None:
+            await started[0].aclose()
+
+        stream, chunk = await self._race("first_chunk", first_chunk, close)
+        try:
+            while chunk is not None:
+                if run_manager is not None:
+                    await run_manager.on_llm_new_token(str(chunk.content), chunk=chunk)
+                yield ChatGenerationChunk(message=chunk)
+                chunk = await stream.__anext__()
+        except StopAsyncIteration:
+            pass
+        finally:
+            await stream.aclose()
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        """Return the circuit state and p95 latencies of every backend."""
+        return [
+            {
+                "backend": backend.name,
+                "circuit": backend.breaker.state,
+                "failures": backend.breaker.failures,
+                "p95_seconds": {
+                    kind: tracker.percentile(95)
+                    for kind, tracker in backend.latencies.items()
+                },
+            }
+            for backend in self.backends
+        ]
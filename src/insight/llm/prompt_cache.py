@@ -0,0 +1,60 @@
+"""Provider prompt-prefix caching for the static part of prompt templates.
+
+Pipeline prompts send a template's static instructions as a system message of
+their own, ahead of the variable content. Anthropic only caches a prefix that is
+marked with a ``cache_control`` breakpoint, so the system message carries one.
+OpenAI caches long identical prefixes automatically, and the gateway removes the
+Anthropic-specific marker before calling any other provider.
+"""
+
+from typing import List
+
+from langchain_core.messages import BaseMessage, SystemMessage
+
+EPHEMERAL = {"type": "ephemeral"}
+
+
+def cacheable_system_message(text: str) -> SystemMessage:
+    """Return a system message whose content is marked as a cacheable prefix."""
+    return SystemMessage(
+        content=[{"type": "text", "text": text, "cache_control": EPHEMERAL}]
+    )
+
+
+def strip_cache_control(messages: List[BaseMessage]) -> List[BaseMessage]:
+    """Return the messages without ``cache_control`` markers.
+
+    Content made only of text blocks is joined back into a plain string, which
+    every provider accepts.
+    """
+    stripped = []
+    for message in messages:
+        content = message.content
+        if isinstance(content, list) and any(
+            isinstance(block, dict) and "cache_control" in block for block in content
+        ):
+            blocks = [
+                (
+                    {k: v for k, v in block.items() if k != "cache_control"}
+                    if isinstance(block, dict)
+                    else block
+                )
+                for block in content
+            ]
+            if all(isinstance(b, dict) and b.get("type") == "text" for b in blocks):
+                content = "".join(block["text"] for block in blocks)
+            else:
+                content = blocks
+            message = message.model_copy(update={"content": content})
+        stripped.append(message)
+    return stripped
+
+
+def message_text(message: BaseMessage) -> str:
+    """Return the text of a message whose content may be a list of blocks."""
+    if isinstance(message.content, str):
+        return message.content
+    return "".join(
+        block.get("text", "") if isinstance(block, dict) else str(block)
+        for block in message.content
+    )
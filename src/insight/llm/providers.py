@@ -0,0 +1,71 @@
+"""Construction of the provider chat models.
+
+Only the SDK of the requested provider is imported, so a server never pays the
+import cost of providers it does not use. The ``replay`` provider records or
+replays the responses of one of the other providers, see ``replay``.
+"""
+
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    from langchain_core.language_models import BaseChatModel
+
+PROVIDERS = ("openai", "anthropic", "replay")
+
+DEFAULT_MODELS = {
+    "openai": "gpt-4o",
+    "anthropic": "claude-3-5-sonnet",
+}
+
+# Default temperature, handlers will adjust as needed
+DEFAULT_TEMPERATURE = 0.5
+
+
+def create_chat_model(
+    provider: str,
+    model: Optional[str] = None,
+    temperature: Optional[float] = None,
+    max_tokens: Optional[int] = None,
+) -> "BaseChatModel":
+    """Create a chat model for a provider.
+
+    Args:
+        provider: ``openai``, ``anthropic`` or ``replay``.
+        model: Model name, the provider's default model if not given.
+        temperature: Sampling temperature, 0.5 if not given.
+        max_tokens: Output token limit, the provider's default if not given.
+
+    Returns:
+        BaseChatModel: The provider's chat model.
+
+    Raises:
+        ValueError: If the provider is not supported.
+    """
+    provider = provider.lower()
+    if provider not in PROVIDERS:
+        raise ValueError(f"Unsupported LLM provider: {provider}")
+
+    if provider == "replay":
+        from .replay import ReplayChatModel
+
+        return ReplayChatModel.from_env(model, temperature, max_tokens)
+
+    settings = {
+        "model": model or DEFAULT_MODELS[provider],
+        "temperature": DEFAULT_TEMPERATURE if temperature is None else temperature,
+    }
+    if max_tokens is not None:
+        settings["max_tokens"] = max_tokens
+    # Failed calls are retried by the gateway, under its retry budget, rather
+    # than by the SDK
+    settings["max_retries"] = 0
+
+    if provider == "openai":
+        from langchain_openai import ChatOpenAI
+
+        # Streamed responses only report token usage when asked to
+        return ChatOpenAI(stream_usage=True, **settings)
+
+    from langchain_anthropic import ChatAnthropic
+
+    return ChatAnthropic(**settings)
@@ -0,0 +1,306 @@
+"""Record and replay of LLM responses for reproducible offline runs.
+
+With ``LLM_PROVIDER=replay`` the server talks to a ``ReplayChatModel``. In
+``record`` mode it forwards every request to a real provider model and stores the
+response, its token usage and its measured latencies, keyed by the recorded
+model and the normalized prompt. In ``replay`` mode it answers from the store
+without any network access, streaming the response back with the recorded
+latencies, optionally scaled.
+
+The store is an SQLite database of zlib-compressed JSON records. Configuration:
+
+- ``INSIGHT_REPLAY_MODE``: ``replay`` (default) or ``record``
+- ``INSIGHT_REPLAY_PROVIDER``: Provider that is recorded (default ``openai``);
+  the model is given by ``LLM_MODEL`` as usual
+- ``INSIGHT_REPLAY_PATH``: Store path (default
+  ``~/.cache/insight/replay.sqlite3``)
+- ``INSIGHT_REPLAY_LATENCY_SCALE``: Factor applied to the recorded latencies,
+  ``0`` to answer immediately (default ``1``)
+"""
+
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForLLMRun,
+    CallbackManagerForLLMRun,
+)
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from .cache import DEFAULT_CACHE_DIR, ResponseCache
+from .prompt_cache import message_text, strip_cache_control
+
+REPLAY_MODES = ("record", "replay")
+DEFAULT_REPLAY_PATH = os.path.join(DEFAULT_CACHE_DIR, "replay.sqlite3")
+
+# Words per streamed chunk when replaying a response
+REPLAY_CHUNK_WORDS = 8
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS recordings (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    recorded_at REAL NOT NULL
+);
+"""
+
+
+def normalize_prompt(messages: List[BaseMessage]) -> str:
+    """Return a canonical text of a prompt for keying recordings.
+
+    Message roles and text are kept; line endings, trailing whitespace and
+    provider-specific markers such as ``cache_control`` are not.
+    """
+    parts = []
+    for message in messages:
+        lines = message_text(message).replace("\r\n", "\n").split("\n")
+        text = "\n".join(line.rstrip() for line in lines).strip()
+        parts.append(f"{message.type}:\n{text}")
+    return "\n\n".join(parts)
+
+
+class ReplayStore:
+    """SQLite store of recorded LLM responses."""
+
+    def __init__(self, path: str):
+        """Open (or create) the store database.
+
+        Args:
+            path: Path of the SQLite database file.
+        """
+        self.path = path
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the recording for a key, or None if there is none."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM recordings WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        return json.loads(zlib.decompress(row[0]))
+
+    def put(self, key: str, record: Dict[str, Any]) -> None:
+        """Store a recording, replacing any earlier one for the key."""
+        blob = zlib.compress(json.dumps(record, separators=(",", ":")).encode("utf-8"))
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO recordings (key, value, recorded_at) "
+                "VALUES (?, ?, ?)",
+                (key, blob, time.time()),
+            )
+
+    def __len__(self) -> int:
+        """Return the number of recordings."""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM recordings").fetchone()[0]
+
+
+class ReplayChatModel(BaseChatModel):
+    """Chat model that records a provider model's responses or replays them.
+
+    The model describes itself as provider ``replay`` with the recorded model's
+    name, so response cache entries and step models configured for the same
+    provider stay apart from the real provider's.
+    """
+
+    recorded_provider: str
+    model_name: str
+    temperature: Optional[float] = None
+    max_tokens: Optional[int] = None
+    mode: str = "replay"
+    latency_scale: float = 1.0
+    store: Any = None
+    upstream: Optional[BaseChatModel] = None
+
+    @classmethod
+    def from_env(
+        cls,
+        model: Optional[str] = None,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+    ) -> "ReplayChatModel":
+        """Create a replay model configured from the environment.
+
+        Raises:
+            ValueError: If the mode or the recorded provider is not supported.
+        """
+        from .providers import DEFAULT_MODELS, DEFAULT_TEMPERATURE, create_chat_model
+
+        mode = os.getenv("INSIGHT_REPLAY_MODE", "replay").lower()
+        if mode not in REPLAY_MODES:
+            raise ValueError(f"Unknown replay mode: {mode}")
+        provider = os.getenv("INSIGHT_REPLAY_PROVIDER", "openai").lower()
+        if provider not in DEFAULT_MODELS:
+            raise ValueError(f"Unsupported provider to record: {provider}")
+        model = model or DEFAULT_MODELS[provider]
+        temperature = DEFAULT_TEMPERATURE if temperature is None else temperature
+
+        upstream = None
+        if mode == "record":
+            upstream = create_chat_model(provider, model, temperature, max_tokens)
+        path = os.path.expanduser(os.getenv("INSIGHT_REPLAY_PATH", DEFAULT_REPLAY_PATH))
+        return cls(
+            recorded_provider=provider,
+            model_name=model,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            mode=mode,
+            latency_scale=float(os.getenv("INSIGHT_REPLAY_LATENCY_SCALE", "1")),
+            store=ReplayStore(path),
+            upstream=upstream,
+        )
+
+    @property
+    def _llm_type(self) -> str:
+        return "replay"
+
+    def _key(self, messages: List[BaseMessage]) -> str:
+        return ResponseCache.make_key(
+            self.recorded_provider, self.model_name, normalize_prompt(messages)
+        )
+
+    def _upstream_messages(self, messages: List[BaseMessage]) -> List[BaseMessage]:
+        # The gateway leaves cache_control markers for the replay model to pass
+        # on, since only Anthropic accepts them
+        if self.recorded_provider == "anthropic":
+            return messages
+        return strip_cache_control(messages)
+
+    def _recording(self, record: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        if record is None:
+            raise ValueError(
+                f"No recorded response from {self.recorded_provider}/{self.model_name} "
+                "for this prompt; record one with INSIGHT_REPLAY_MODE=record"
+            )
+        return record
+
+    def _message(self, record: Dict[str, Any]) -> AIMessage:
+        return AIMessage(
+            content=record["content"], usage_metadata=record.get("usage_metadata")
+        )
+
+    async def _record(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]],
+        **kwargs: Any,
+    ) -> AsyncIterator[AIMessageChunk]:
+        """Stream the upstream response and store it once complete."""
+        start = time.monotonic()
+        first_token = None
+        output = None
+        async for chunk in self.upstream.astream(
+            self._upstream_messages(messages), stop=stop, **kwargs
+        ):
+            if first_token is None:
+                first_token = time.monotonic() - start
+            output = chunk if output is None else output + chunk
+            yield chunk
+        seconds = time.monotonic() - start
+        record = {
+            "content": message_text(output) if output is not None else "",
+            "usage_metadata": getattr(output, "usage_metadata", None),
+            "first_token_seconds": first_token if first_token is not None else seconds,
+            "seconds": seconds,
+        }
+        await asyncio.to_thread(self.store.put, self._key(messages), record)
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        # Synchronous calls are not used by the server and are neither recorded
+        # nor delayed.
+        if self.mode == "record":
+            message = self.upstream.invoke(
+                self._upstream_messages(messages), stop=stop, **kwargs
+            )
+        else:
+            message = self._message(
+                self._recording(self.store.get(self._key(messages)))
+            )
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        if self.mode == "record":
+            output = None
+            async for chunk in self._record(messages, stop, **kwargs):
+                output = chunk if output is None else output + chunk
+            message = AIMessage(
+                content=message_text(output) if output is not None else "",
+                usage_metadata=getattr(output, "usage_metadata", None),
+            )
+        else:
+            record = self._recording(
+                await asyncio.to_thread(self.store.get, self._key(messages))
+            )
+            await asyncio.sleep(record["seconds"] * self.latency_scale)
+            message = self._message(record)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        if self.mode == "record":
+            async for chunk in self._record(messages, stop, **kwargs):
+                if run_manager is not None:
+                    await run_manager.on_llm_new_token(message_text(chunk), chunk=chunk)
+                yield ChatGenerationChunk(message=chunk)
+            return
+
+        record = self._recording(
+            await asyncio.to_thread(self.store.get, self._key(messages))
+        )
+        words = record["content"].split(" ")
+        pieces = [
+            " ".join(words[i : i + REPLAY_CHUNK_WORDS])
+            + (" " if i + REPLAY_CHUNK_WORDS < len(words) else "")
+            for i in range(0, len(words), REPLAY_CHUNK_WORDS)
+        ]
+        first_token = record["first_token_seconds"] * self.latency_scale
+        rest = max(record["seconds"] * self.latency_scale - first_token, 0.0)
+        # Chunks are paced against the start time so that oversleeping does not
+        # accumulate into the replayed latency
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        for index, piece in enumerate(pieces):
+            due = start + first_token + rest * index / len(pieces)
+            await asyncio.sleep(max(due - loop.time(), 0))
+            chunk = AIMessageChunk(content=piece)
+            if run_manager is not None:
+                await run_manager.on_llm_new_token(piece, chunk=chunk)
+            yield ChatGenerationChunk(message=chunk)
+        await asyncio.sleep(max(start + first_token + rest - loop.time(), 0))
+        yield ChatGenerationChunk(
+            message=AIMessageChunk(
+                content="", usage_metadata=record.get("usage_metadata")
+            )
+        )
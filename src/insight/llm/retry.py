@@ -0,0 +1,167 @@
+"""Retries of failed LLM calls with backoff, jitter and a retry budget.
+
+The gateway retries a provider call that failed with a transient error, such as a
+429, a 5xx or a dropped connection, waiting between attempts for an exponential
+backoff with full jitter, or for as long as the provider's ``Retry-After`` header
+asks. Streamed calls are only retried before their first chunk.
+
+Every retry also needs credit from a process-wide retry budget, so that during
+an outage retries cannot multiply the load on a provider: within a sliding
+window, retries may make up at most a fixed share of the calls, plus a small
+allowance for quiet periods.
+
+Configuration:
+
+- ``INSIGHT_RETRY_ATTEMPTS``: Attempts per call, including the first (default 3);
+  ``1`` disables retries
+- ``INSIGHT_RETRY_BASE_DELAY``: Backoff ceiling of the first retry in seconds,
+  doubled for each further retry (default 0.5)
+- ``INSIGHT_RETRY_MAX_DELAY``: Longest wait before a retry in seconds; calls
+  asked to wait longer by ``Retry-After`` fail instead (default 30)
+- ``INSIGHT_RETRY_BUDGET``: Share of calls that may be retries (default 0.2)
+- ``INSIGHT_RETRY_MIN``: Retries allowed in any window regardless of the share
+  (default 10)
+"""
+
+import os
+import random
+import time
+from collections import deque
+from typing import Deque, Dict, Optional
+
+from .errors import is_retryable_error, retry_after
+
+DEFAULT_ATTEMPTS = 3
+DEFAULT_BASE_DELAY = 0.5
+DEFAULT_MAX_DELAY = 30.0
+DEFAULT_BUDGET_RATIO = 0.2
+DEFAULT_BUDGET_MIN = 10
+
+# Seconds over which the retry budget counts calls and retries
+BUDGET_WINDOW = 10.0
+
+
+class RetryPolicy:
+    """Which failed calls are retried, and how long to wait before each retry."""
+
+    def __init__(
+        self,
+        attempts: int = DEFAULT_ATTEMPTS,
+        base_delay: float = DEFAULT_BASE_DELAY,
+        max_delay: float = DEFAULT_MAX_DELAY,
+    ):
+        """Initialize the policy.
+
+        Args:
+            attempts: Attempts per call, including the first.
+            base_delay: Backoff ceiling of the first retry in seconds.
+            max_delay: Longest wait before a retry in seconds.
+        """
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    @classmethod
+    def from_env(cls) -> "RetryPolicy":
+        """Create a policy configured from the environment."""
+        return cls(
+            attempts=max(int(os.getenv("INSIGHT_RETRY_ATTEMPTS", DEFAULT_ATTEMPTS)), 1),
+            base_delay=float(os.getenv("INSIGHT_RETRY_BASE_DELAY", DEFAULT_BASE_DELAY)),
+            max_delay=float(os.getenv("INSIGHT_RETRY_MAX_DELAY", DEFAULT_MAX_DELAY)),
+        )
+
+    def delay(self, error: BaseException, retry: int) -> Optional[float]:
+        """Return the seconds to wait before retrying a failed call.
+
+        Args:
+            error: The error the call failed with.
+            retry: Number of the retry, starting at 0 for the first.
+
+        Returns:
+            Optional[float]: The wait, or None if the call must not be retried
+            because the error is not transient, the call is out of attempts, or
+            the provider asks for a longer wait than ``max_delay``.
+        """
+        if retry + 1 >= self.attempts or not is_retryable_error(error):
+            return None
+        # Full jitter spreads out the retries of calls that failed together
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2**retry))
+        requested = retry_after(error)
+        if requested is not None:
+            if requested > self.max_delay:
+                return None
+            delay = max(delay, requested)
+        return delay
+
+
+class RetryBudget:
+    """Sliding-window cap on retries as a share of all calls."""
+
+    def __init__(
+        self,
+        ratio: float = DEFAULT_BUDGET_RATIO,
+        minimum: int = DEFAULT_BUDGET_MIN,
+        window: float = BUDGET_WINDOW,
+    ):
+        """Initialize an empty budget.
+
+        Args:
+            ratio: Share of calls that may be retries.
+            minimum: Retries allowed in any window regardless of the share.
+            window: Seconds over which calls and retries are counted.
+        """
+        self.ratio = ratio
+        self.minimum = minimum
+        self.window = window
+        self.denied = 0
+        self._calls: Deque[float] = deque()
+        self._retries: Deque[float] = deque()
+
+    @classmethod
+    def from_env(cls) -> "RetryBudget":
+        """Create a budget configured from the environment."""
+        return cls(
+            ratio=float(os.getenv("INSIGHT_RETRY_BUDGET", DEFAULT_BUDGET_RATIO)),
+            minimum=int(os.getenv("INSIGHT_RETRY_MIN", DEFAULT_BUDGET_MIN)),
+        )
+
+    def _expire(self, now: float) -> None:
+        for events in (self._calls, self._retries):
+            while events and events[0] <= now - self.window:
+                events.popleft()
+
+    def record_call(self) -> None:
+        """Count a call's first attempt."""
+        now = time.monotonic()
+        self._expire(now)
+        self._calls.append(now)
+
+    def spend(self) -> bool:
+        """Take credit for one retry; return False if the budget is exhausted."""
+        now = time.monotonic()
+        self._expire(now)
+        if len(self._retries) >= self.minimum + self.ratio * len(self._calls):
+            self.denied += 1
+            return False
+        self._retries.append(now)
+        return True
+
+    def snapshot(self) -> Dict[str, float]:
+        """Return the calls and retries in the current window."""
+        self._expire(time.monotonic())
+        return {
+            "window_calls": len(self._calls),
+            "window_retries": len(self._retries),
+            "denied": self.denied,
+        }
+
+
+_budget: Optional[RetryBudget] = None
+
+
+def retry_budget() -> RetryBudget:
+    """Return the process-wide retry budget shared by every gateway."""
+    global _budget
+    if _budget is None:
+        _budget = RetryBudget.from_env()
+    return _budget
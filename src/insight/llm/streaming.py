@@ -0,0 +1,148 @@
+"""Token streaming with MCP progress notifications.
+
+Long-running LLM tools stream their output from the model and report the number
+of tokens produced so far to the client as MCP progress notifications. Tokens are
+batched so that a notification is sent at most every ``batch_size`` tokens or
+``interval`` seconds, with the first token always reported immediately.
+Progress is best effort: a reporter whose client has gone away stops sending
+instead of failing the work.
+"""
+
+import sys
+import time
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Union
+
+from mcp.server.lowlevel.server import request_ctx
+from mcp.server.session import ServerSession
+
+if TYPE_CHECKING:
+    from langchain_core.runnables import Runnable
+
+DEFAULT_INTERVAL = 0.25
+DEFAULT_BATCH_SIZE = 32
+
+
+class ProgressReporter:
+    """Batches token progress into MCP progress notifications for one request."""
+
+    def __init__(
+        self,
+        session: Optional[ServerSession] = None,
+        progress_token: Optional[Union[str, int]] = None,
+        interval: float = DEFAULT_INTERVAL,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+    ):
+        """Initialize the reporter.
+
+        Args:
+            session: Session of the request being served.
+            progress_token: Token the client supplied in the request's ``_meta``.
+                Without one, the reporter only counts tokens.
+            interval: Maximum number of seconds between notifications.
+            batch_size: Maximum number of tokens between notifications.
+        """
+        self.session = session
+        self.progress_token = progress_token
+        self.interval = interval
+        self.batch_size = batch_size
+        self.progress = 0
+        self._pending = 0
+        self._last_flush: Optional[float] = None
+
+    @classmethod
+    def for_current_request(cls, **kwargs: Any) -> "ProgressReporter":
+        """Create a reporter for the MCP request currently being handled.
+
+        Outside of a request, or when the client did not ask for progress, the
+        returned reporter sends nothing.
+        """
+        try:
+            ctx = request_ctx.get()
+        except LookupError:
+            return cls(**kwargs)
+        token = ctx.meta.progressToken if ctx.meta is not None else None
+        return cls(ctx.session, token, **kwargs)
+
+    @property
+    def enabled(self) -> bool:
+        """Whether notifications are sent to a client."""
+        return self.session is not None and self.progress_token is not None
+
+    async def advance(self, tokens: int = 1) -> None:
+        """Record produced tokens and notify the client if a batch is due."""
+        self.progress += tokens
+        self._pending += tokens
+        if (
+            self._last_flush is None
+            or self._pending >= self.batch_size
+            or time.monotonic() - self._last_flush >= self.interval
+        ):
+            await self.flush()
+
+    async def flush(self) -> None:
+        """Send any progress that has not been reported yet."""
+        if self._pending == 0:
+            return
+        self._pending = 0
+        self._last_flush = time.monotonic()
+        if self.enabled:
+            try:
+                await self.session.send_progress_notification(
+                    self.progress_token, self.progress
+                )
+            except Exception as e:
+                print(
+                    f"Warning: Progress notifications stopped: {str(e)}",
+                    file=sys.stderr,
+                )
+                self.session = None
+
+
+class SharedProgress:
+    """Progress of work shared by several requests, such as a coalesced call.
+
+    The work's progress goes to the reporter of every request waiting for it. A
+    reporter waiting more than once, for several runs of one batch, counts the
+    progress once.
+    """
+
+    def __init__(self, reporter: ProgressReporter):
+        """Initialize the shared progress with the reporter that started the work."""
+        self.reporters: List[ProgressReporter] = [reporter]
+
+    def _unique(self) -> List[ProgressReporter]:
+        return list(dict.fromkeys(self.reporters))
+
+    async def advance(self, tokens: int = 1) -> None:
+        """Record produced tokens with every waiting reporter."""
+        for reporter in self._unique():
+            await reporter.advance(tokens)
+
+    async def flush(self) -> None:
+        """Send the progress every waiting reporter has not reported yet."""
+        for reporter in self._unique():
+            await reporter.flush()
+
+
+async def stream_text(
+    runnable: "Runnable",
+    inputs: Dict[str, Any],
+    reporter: Union[ProgressReporter, SharedProgress],
+) -> str:
+    """Run a text-producing runnable with ``astream`` and report its progress.
+
+    Args:
+        runnable: Runnable whose stream yields string chunks, such as
+            ``prompt | llm | StrOutputParser()``.
+        inputs: Input variables for the runnable.
+        reporter: Reporter that receives one unit of progress per chunk.
+
+    Returns:
+        str: The concatenated output.
+    """
+    parts = []
+    async for chunk in runnable.astream(inputs):
+        parts.append(chunk)
+        await reporter.advance()
+    await reporter.flush()
+    return "".join(parts)
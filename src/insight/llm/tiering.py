@@ -0,0 +1,132 @@
+"""Per-tool and per-step model selection.
+
+Each LLM step of a tool can run on its own model, temperature and output limit,
+for example a small, fast model for an intermediate review. Steps are configured
+with a JSON object mapping ``tool.step`` or ``tool`` keys to model settings,
+given inline in ``INSIGHT_STEP_MODELS`` or as a file path in
+``INSIGHT_STEP_CONFIG``::
+
+    {
+        "generate_requirements.review": {"model": "gpt-4o-mini", "max_tokens": 2048},
+        "assess_requirements": {
+            "provider": "anthropic",
+            "model": "claude-3-5-haiku-latest",
+            "temperature": 0.2
+        }
+    }
+
+A ``tool.step`` entry takes precedence over a ``tool`` entry. Steps without an
+entry use the server's model. Settings left out of an entry are inherited from
+the server's model; when only the provider changes, the provider's default
+model and output limit are used.
+
+With a pool of backends (``LLM_PROVIDERS``), an entry that only sets the
+temperature or output limit applies them to every backend, and the step keeps
+the pool's hedging and failover. An entry that names a provider or model runs
+the step on that model alone, inheriting settings from the primary backend.
+"""
+
+import functools
+import json
+import os
+from dataclasses import dataclass, fields
+from typing import TYPE_CHECKING, Dict, Optional, Tuple
+
+from .models import describe_llm, unwrap_llm
+
+if TYPE_CHECKING:
+    from langchain_core.language_models import BaseChatModel
+
+
+@dataclass(frozen=True)
+class StepModelSpec:
+    """Model settings of one tool or step; unset settings are inherited."""
+
+    provider: Optional[str] = None
+    model: Optional[str] = None
+    temperature: Optional[float] = None
+    max_tokens: Optional[int] = None
+
+
+@functools.lru_cache(maxsize=None)
+def load_step_config() -> Dict[str, StepModelSpec]:
+    """Return the step model configuration from the environment.
+
+    Raises:
+        ValueError: If the configuration is not a JSON object of model settings.
+    """
+    text = os.getenv("INSIGHT_STEP_MODELS")
+    path = os.getenv("INSIGHT_STEP_CONFIG")
+    if not text and path:
+        with open(os.path.expanduser(path), "r") as f:
+            text = f.read()
+    if not text:
+        return {}
+
+    allowed = {field.name for field in fields(StepModelSpec)}
+    config = json.loads(text)
+    if not isinstance(config, dict):
+        raise ValueError("Step model configuration must be a JSON object")
+    specs = {}
+    for key, settings in config.items():
+        unknown = set(settings) - allowed
+        if unknown:
+            raise ValueError(
+                f"Unknown step model settings for {key}: {', '.join(sorted(unknown))}"
+            )
+        specs[key] = StepModelSpec(**settings)
+    return specs
+
+
+_step_models: Dict[Tuple[int, StepModelSpec], "BaseChatModel"] = {}
+
+
+def _build_step_model(llm: "BaseChatModel", spec: StepModelSpec) -> "BaseChatModel":
+    from .gateway import with_gateway
+    from .pool import PooledChatModel
+    from .providers import create_chat_model
+
+    if isinstance(llm, PooledChatModel) and spec.provider is None and not spec.model:
+        return PooledChatModel.from_models(
+            [_build_step_model(backend.llm, spec) for backend in llm.backends]
+        )
+
+    base = unwrap_llm(llm)
+    info = describe_llm(base)
+    provider = spec.provider or info.provider
+    model = spec.model or (info.model if provider == info.provider else None)
+    temperature = info.temperature if spec.temperature is None else spec.temperature
+    max_tokens = spec.max_tokens
+    if max_tokens is None and provider == info.provider:
+        max_tokens = info.max_tokens
+
+    if provider != info.provider or model != info.model:
+        step_model = create_chat_model(provider, model, temperature, max_tokens)
+    else:
+        update = {"temperature": temperature, "max_tokens": max_tokens}
+        step_model = base.model_copy(
+            update={key: value for key, value in update.items() if value is not None}
+        )
+    return with_gateway(step_model)
+
+
+def step_llm(llm: "BaseChatModel", tool: str, step: str) -> "BaseChatModel":
+    """Return the model configured for a step of a tool.
+
+    Args:
+        llm: The server's model, used for unconfigured steps and settings.
+        tool: Tool name, such as ``generate_requirements``.
+        step: Step name within the tool, such as ``review``.
+
+    Returns:
+        BaseChatModel: The step's model behind the provider gateway, or ``llm``
+        itself if the step is not configured.
+    """
+    config = load_step_config()
+    spec = config.get(f"{tool}.{step}") or config.get(tool)
+    if spec is None:
+        return llm
+    key = (id(llm), spec)
+    if key not in _step_models:
+        _step_models[key] = _build_step_model(llm, spec)
+    return _step_models[key]
@@ -0,0 +1,296 @@
+"""Token counting and input budgets for LLM calls.
+
+Token counts are computed offline so that oversized inputs are caught before a
+request is sent. OpenAI models are counted with their ``tiktoken`` encoding when
+its BPE file is in tiktoken's local cache (``TIKTOKEN_CACHE_DIR``); encodings are
+never downloaded. Other models, and OpenAI models whose encoding is not cached
+or takes longer than ``ENCODING_LOAD_TIMEOUT`` seconds to load, fall back to a
+character-based estimate.
+"""
+
+import asyncio
+import hashlib
+import os
+import sys
+import tempfile
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Callable, Dict, Optional
+
+from .models import describe_llm
+
+if TYPE_CHECKING:
+    from langchain_core.language_models import BaseLanguageModel
+
+
+CHARS_PER_TOKEN = 4
+
+DEFAULT_CONTEXT_TOKENS = 128_000
+DEFAULT_OUTPUT_TOKENS = 4096
+
+OVERSIZE_POLICIES = ("reject", "trim", "chunk")
+
+# Seconds to wait for a cached encoding to load before using the estimate
+ENCODING_LOAD_TIMEOUT = 5.0
+
+# tiktoken encodings of OpenAI chat models, and where tiktoken gets their BPE files
+ENCODINGS = ("o200k_base", "cl100k_base")
+BPE_FILE_URL = "https://openaipublic.blob.core.windows.net/encodings/{}.tiktoken"
+
+# Context windows by model name prefix; the longest matching prefix wins.
+CONTEXT_WINDOWS = {
+    "gpt-4o": 128_000,
+    "gpt-4-turbo": 128_000,
+    "gpt-4.1": 1_047_576,
+    "gpt-4": 8192,
+    "gpt-3.5-turbo": 16_385,
+    "o1": 200_000,
+    "o3": 200_000,
+    "o4": 200_000,
+    "claude-": 200_000,
+}
+
+
+def estimate_tokens(text: str) -> int:
+    """Return an approximate token count for a piece of text.
+
+    Uses the common heuristic of roughly four characters per token for English
+    prose, rounded up.
+    """
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+# Encodings by model name, or None for models counted with the estimate
+_encodings: Dict[str, Any] = {}
+
+
+def _is_cached(encoding: str) -> bool:
+    """Return whether tiktoken can load an encoding without downloading it."""
+    if encoding not in ENCODINGS:
+        return False
+    url = BPE_FILE_URL.format(encoding)
+    # tiktoken's own cache location and file naming
+    cache_dir = os.getenv("TIKTOKEN_CACHE_DIR") or os.getenv("DATA_GYM_CACHE_DIR")
+    if cache_dir is None:
+        cache_dir = os.path.join(tempfile.gettempdir(), "data-gym-cache")
+    if not cache_dir:
+        return False
+    digest = hashlib.sha1(url.encode(), usedforsecurity=False).hexdigest()
+    path = os.path.join(cache_dir, digest)
+    return os.path.exists(path)
+
+
+def _load_encoding(model: str):
+    """Return the tiktoken encoding for an OpenAI model, or None if not cached."""
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        name = tiktoken.encoding_name_for_model(model)
+    except KeyError:
+        name = "o200k_base"
+    if not _is_cached(name):
+        print(
+            f"Warning: No cached tokenizer for {model}, estimating its tokens",
+            file=sys.stderr,
+        )
+        return None
+    try:
+        return tiktoken.get_encoding(name)
+    except Exception as e:
+        print(f"Warning: No tokenizer for {model}: {str(e)}", file=sys.stderr)
+        return None
+
+
+async def load_tokenizer(llm: "BaseLanguageModel") -> None:
+    """Load the tokenizer of a model, if it has one, for ``get_token_counter``.
+
+    The encoding is loaded once per model in a worker thread, so that reading
+    and parsing its BPE file never blocks the event loop; a load that does not
+    finish within ``ENCODING_LOAD_TIMEOUT`` seconds leaves the model on the
+    estimate.
+    """
+    info = describe_llm(llm)
+    if info.provider != "openai" or not info.model or info.model in _encodings:
+        return
+    try:
+        encoding = await asyncio.wait_for(
+            asyncio.to_thread(_load_encoding, info.model), ENCODING_LOAD_TIMEOUT
+        )
+    except asyncio.TimeoutError:
+        print(
+            f"Warning: Tokenizer for {info.model} did not load within "
+            f"{ENCODING_LOAD_TIMEOUT:g} seconds, estimating its tokens",
+            file=sys.stderr,
+        )
+        encoding = None
+    _encodings.setdefault(info.model, encoding)
+
+
+def get_token_counter(llm: "BaseLanguageModel") -> Callable[[str], int]:
+    """Return a function counting tokens of a text for the given model.
+
+    Models whose tokenizer was not loaded with ``load_tokenizer`` are counted
+    with the estimate.
+    """
+    info = describe_llm(llm)
+    if info.provider == "openai" and info.model:
+        encoding = _encodings.get(info.model)
+        if encoding is not None:
+            return lambda text: len(encoding.encode(text, disallowed_special=()))
+    return estimate_tokens
+
+
+def context_window(model: Optional[str]) -> int:
+    """Return the context window of a model in tokens.
+
+    ``INSIGHT_CONTEXT_TOKENS`` overrides the built-in table.
+    """
+    override = os.getenv("INSIGHT_CONTEXT_TOKENS")
+    if override:
+        return int(override)
+    if model:
+        matches = [prefix for prefix in CONTEXT_WINDOWS if model.startswith(prefix)]
+        if matches:
+            return CONTEXT_WINDOWS[max(matches, key=len)]
+    return DEFAULT_CONTEXT_TOKENS
+
+
+@dataclass(frozen=True)
+class TokenBudget:
+    """Token limits and counting for one model."""
+
+    model: Optional[str]
+    context_tokens: int
+    output_tokens: int
+    count: Callable[[str], int]
+
+    @property
+    def input_tokens(self) -> int:
+        """Tokens available for the prompt once the output is reserved."""
+        return max(self.context_tokens - self.output_tokens, 0)
+
+
+def get_token_budget(llm: "BaseLanguageModel") -> TokenBudget:
+    """Return the token budget of a model."""
+    info = describe_llm(llm)
+    return TokenBudget(
+        model=info.model,
+        context_tokens=context_window(info.model),
+        output_tokens=info.max_tokens or DEFAULT_OUTPUT_TOKENS,
+        count=get_token_counter(llm),
+    )
+
+
+def get_oversize_policy(arguments: dict) -> str:
+    """Return the oversize policy for a tool call.
+
+    The ``oversize_policy`` argument takes precedence over the
+    ``INSIGHT_OVERSIZE_POLICY`` environment variable, which defaults to ``reject``.
+    """
+    policy = arguments.get("oversize_policy") or os.getenv(
+        "INSIGHT_OVERSIZE_POLICY", "reject"
+    )
+    if policy not in OVERSIZE_POLICIES:
+        raise ValueError(f"Unknown oversize policy: {policy}")
+    return policy
+
+
+@dataclass
+class StepUsage:
+    """Measured latency and token usage of one step of a tool call."""
+
+    model: str
+    calls: int = 0
+    seconds: float = 0.0
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cache_read_tokens: int = 0
+    cache_write_tokens: int = 0
+
+    def summary(self, step: str) -> str:
+        """Return a one-line description of the step."""
+        calls = "1 call" if self.calls == 1 else f"{self.calls} calls"
+        text = (
+            f"Step {step} ({self.model}): {calls}, {self.seconds:.2f} s, "
+            f"{self.input_tokens} input / {self.output_tokens} output tokens"
+        )
+        if self.cache_read_tokens or self.cache_write_tokens:
+            text += (
+                f" ({self.cache_read_tokens} input tokens read from and "
+                f"{self.cache_write_tokens} written to the prompt cache)"
+            )
+        return text
+
+
+@dataclass
+class TokenEstimate:
+    """Estimated token usage of a tool call, and measured usage of its steps."""
+
+    model: Optional[str]
+    input_tokens: int = 0
+    output_tokens: int = 0
+    trimmed: bool = False
+    coalesced: int = 0
+    steps: Dict[str, StepUsage] = field(default_factory=dict)
+
+    def add_call(self, input_tokens: int, budget: TokenBudget) -> None:
+        """Account for one LLM call with the given prompt size."""
+        self.input_tokens += input_tokens
+        self.output_tokens += budget.output_tokens
+
+    def record_step(
+        self,
+        step: str,
+        model: str,
+        seconds: float,
+        input_tokens: int,
+        output_tokens: int,
+        cache_read_tokens: int = 0,
+        cache_write_tokens: int = 0,
+    ) -> None:
+        """Record the measured latency and tokens of one LLM call of a step."""
+        usage = self.steps.setdefault(step, StepUsage(model))
+        usage.calls += 1
+        usage.seconds += seconds
+        usage.input_tokens += input_tokens
+        usage.output_tokens += output_tokens
+        usage.cache_read_tokens += cache_read_tokens
+        usage.cache_write_tokens += cache_write_tokens
+
+    def merge(self, other: "TokenEstimate") -> None:
+        """Add the estimate and step usage of another tool call to this one."""
+        self.input_tokens += other.input_tokens
+        self.output_tokens += other.output_tokens
+        self.trimmed = self.trimmed or other.trimmed
+        self.coalesced += other.coalesced
+        for step, usage in other.steps.items():
+            total = self.steps.setdefault(step, StepUsage(usage.model))
+            total.calls += usage.calls
+            total.seconds += usage.seconds
+            total.input_tokens += usage.input_tokens
+            total.output_tokens += usage.output_tokens
+            total.cache_read_tokens += usage.cache_read_tokens
+            total.cache_write_tokens += usage.cache_write_tokens
+
+    def summary(self) -> str:
+        """Return a description for the tool result.
+
+        The first line holds the estimate; each step that called the LLM adds a
+        line. Steps served from the response cache, or shared with an identical
+        call already in flight, are not listed.
+        """
+        text = (
+            f"Estimated tokens ({self.model or 'unknown model'}): "
+            f"{self.input_tokens} input, up to {self.output_tokens} output"
+        )
+        if self.trimmed:
+            text += "; input was trimmed to fit the context window"
+        if self.coalesced:
+            text += (
+                f"; {self.coalesced} LLM result(s) shared with identical calls "
+                "already in flight"
+            )
+        lines = [text]
+        lines.extend(usage.summary(step) for step, usage in self.steps.items())
+        return "\n".join(lines)
@@ -0,0 +1,65 @@
+"""Token usage reported by the providers, including prompt cache reads and writes.
+
+Provider responses carry LangChain ``usage_metadata``. The gateway adds the usage
+of every response to its own totals and to the collector of the current context,
+so a tool can measure the usage of its own calls with ``collect_usage``.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Iterator, Optional
+
+
+@dataclass
+class UsageRecord:
+    """Token usage summed over provider responses."""
+
+    calls: int = 0
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cache_read_tokens: int = 0
+    cache_write_tokens: int = 0
+
+    def add_message(self, message: Any) -> None:
+        """Add the usage of a response message, if it reports any."""
+        usage = getattr(message, "usage_metadata", None)
+        if not usage:
+            return
+        details = usage.get("input_token_details") or {}
+        self.calls += 1
+        self.input_tokens += usage.get("input_tokens") or 0
+        self.output_tokens += usage.get("output_tokens") or 0
+        self.cache_read_tokens += details.get("cache_read") or 0
+        self.cache_write_tokens += details.get("cache_creation") or 0
+
+    def to_dict(self) -> Dict[str, int]:
+        """Return the usage as a dictionary."""
+        return asdict(self)
+
+
+_collector: ContextVar[Optional[UsageRecord]] = ContextVar(
+    "insight_usage_collector", default=None
+)
+
+
+@contextmanager
+def collect_usage() -> Iterator[UsageRecord]:
+    """Collect the usage of the provider calls made within the block.
+
+    Tasks started within the block, such as hedged requests, report to the same
+    collector.
+    """
+    record = UsageRecord()
+    token = _collector.set(record)
+    try:
+        yield record
+    finally:
+        _collector.reset(token)
+
+
+def report_usage(message: Any) -> None:
+    """Add a response's usage to the collector of the current context."""
+    record = _collector.get()
+    if record is not None:
+        record.add_message(message)
@@ -0,0 +1,597 @@
+"""Per-tool instrumentation for the MCP workflow server.
+
+Every tool call is timed while it runs. File access and LLM requests made on its
+behalf add their time, tokens and cache outcomes to the call through a context
+variable, so the layers that do the work need no reference to the call.
+Finished calls are folded into per-tool counters and latency histograms.
+
+The server serves a JSON snapshot as the ``insight://metrics`` MCP resource and,
+when ``INSIGHT_METRICS_TEXTFILE`` is set, periodically writes the metrics in the
+Prometheus text format for the node exporter's textfile collector. Set
+``INSIGHT_METRICS=false`` to disable the instrumentation.
+
+When the server runs several worker processes, each worker publishes its metrics
+as JSON to the shared ``INSIGHT_WORKER_DIR``, and the snapshot and text file of
+every worker cover all of them.
+"""
+
+import asyncio
+import bisect
+import glob
+import json
+import os
+import sys
+import time
+from contextvars import ContextVar
+from typing import Any, Coroutine, Dict, List, Optional, Set
+
+METRICS_URI = "insight://metrics"
+
+# Latency histogram bucket upper bounds in seconds
+LATENCY_BUCKETS = (
+    0.001,
+    0.005,
+    0.01,
+    0.05,
+    0.1,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+    120.0,
+    300.0,
+)
+
+# Phases of a tool call with their own latency histogram. ``retry`` is the time
+# spent on failed LLM attempts and the backoff before retrying them, and
+# ``dispatch`` the time not spent waiting for file access or the LLM.
+PHASES = ("total", "dispatch", "io", "llm", "retry")
+
+DEFAULT_TEXTFILE_INTERVAL = 15.0
+
+# Seconds between publications of a worker's metrics to the other workers
+PUBLISH_INTERVAL = 1.0
+
+
+class Histogram:
+    """Cumulative histogram with fixed bucket bounds."""
+
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self):
+        """Initialize an empty histogram."""
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        """Add one observation."""
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the histogram with cumulative bucket counts keyed by bound."""
+        buckets = {}
+        total = 0
+        for bound, count in zip((*LATENCY_BUCKETS, "+Inf"), self.counts):
+            total += count
+            buckets[str(bound)] = total
+        return {"count": self.count, "sum": round(self.sum, 6), "buckets": buckets}
+
+    def merge_dict(self, data: Dict[str, Any]) -> None:
+        """Add the observations of a histogram given as ``to_dict`` returns it."""
+        previous = 0
+        for index, total in enumerate(data["buckets"].values()):
+            self.counts[index] += total - previous
+            previous = total
+        self.sum += data["sum"]
+        self.count += data["count"]
+
+
+class CallMetrics:
+    """Measurements of one tool call in progress."""
+
+    __slots__ = (
+        "io_seconds",
+        "llm_seconds",
+        "llm_calls",
+        "input_tokens",
+        "output_tokens",
+        "cache_hits",
+        "cache_misses",
+        "coalesced",
+        "retries",
+        "retry_seconds",
+    )
+
+    def __init__(self):
+        """Initialize empty measurements."""
+        self.io_seconds = 0.0
+        self.llm_seconds = 0.0
+        self.llm_calls = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.coalesced = 0
+        self.retries = 0
+        self.retry_seconds = 0.0
+
+
+class ToolMetrics:
+    """Counters and latency histograms of one tool."""
+
+    def __init__(self):
+        """Initialize empty counters."""
+        self.calls = 0
+        self.errors: Dict[str, int] = {}
+        self.latency = {phase: Histogram() for phase in PHASES}
+        self.llm_calls = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.coalesced = 0
+        self.retries = 0
+
+    def add(self, call: CallMetrics, seconds: float, error: Optional[str]) -> None:
+        """Fold a finished call into the counters."""
+        self.calls += 1
+        if error is not None:
+            self.errors[error] = self.errors.get(error, 0) + 1
+        self.latency["total"].observe(seconds)
+        self.latency["io"].observe(call.io_seconds)
+        self.latency["llm"].observe(call.llm_seconds)
+        self.latency["retry"].observe(call.retry_seconds)
+        # File and LLM waits of concurrent steps can overlap
+        self.latency["dispatch"].observe(
+            max(seconds - call.io_seconds - call.llm_seconds - call.retry_seconds, 0.0)
+        )
+        self.llm_calls += call.llm_calls
+        self.input_tokens += call.input_tokens
+        self.output_tokens += call.output_tokens
+        self.cache_hits += call.cache_hits
+        self.cache_misses += call.cache_misses
+        self.coalesced += call.coalesced
+        self.retries += call.retries
+
+    def merge_dict(self, data: Dict[str, Any]) -> None:
+        """Add the counters of a tool given as ``to_dict`` returns them."""
+        self.calls += data["calls"]
+        for error, count in data["errors_by_type"].items():
+            self.errors[error] = self.errors.get(error, 0) + count
+        for phase, histogram in data["latency_seconds"].items():
+            self.latency[phase].merge_dict(histogram)
+        self.llm_calls += data["llm_calls"]
+        self.input_tokens += data["input_tokens"]
+        self.output_tokens += data["output_tokens"]
+        self.cache_hits += data["cache_hits"]
+        self.cache_misses += data["cache_misses"]
+        self.coalesced += data.get("coalesced", 0)
+        self.retries += data.get("retries", 0)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the metrics as a JSON-serializable dictionary."""
+        return {
+            "calls": self.calls,
+            "errors": sum(self.errors.values()),
+            "errors_by_type": dict(self.errors),
+            "llm_calls": self.llm_calls,
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+            "cache_hits": self.cache_hits,
+            "cache_misses": self.cache_misses,
+            "coalesced": self.coalesced,
+            "retries": self.retries,
+            "latency_seconds": {
+                phase: histogram.to_dict() for phase, histogram in self.latency.items()
+            },
+        }
+
+
+_current: ContextVar[Optional[CallMetrics]] = ContextVar(
+    "insight_call_metrics", default=None
+)
+
+
+def record_io(seconds: float) -> None:
+    """Add file access time to the current tool call."""
+    call = _current.get()
+    if call is not None:
+        call.io_seconds += seconds
+
+
+def record_llm(seconds: float, input_tokens: int, output_tokens: int) -> None:
+    """Add one LLM request to the current tool call."""
+    call = _current.get()
+    if call is not None:
+        call.llm_seconds += seconds
+        call.llm_calls += 1
+        call.input_tokens += input_tokens
+        call.output_tokens += output_tokens
+
+
+def record_cache(hit: bool) -> None:
+    """Add a response cache lookup to the current tool call."""
+    call = _current.get()
+    if call is not None:
+        if hit:
+            call.cache_hits += 1
+        else:
+            call.cache_misses += 1
+
+
+def record_coalesced() -> None:
+    """Count LLM work of the current tool call shared with an identical call."""
+    call = _current.get()
+    if call is not None:
+        call.coalesced += 1
+
+
+def record_retry(seconds: float) -> None:
+    """Add a retried LLM request to the current tool call.
+
+    Args:
+        seconds: Time of the failed attempt plus the backoff before the retry.
+    """
+    call = _current.get()
+    if call is not None:
+        call.retries += 1
+        call.retry_seconds += seconds
+
+
+class _CallTracker:
+    """Context manager measuring one tool call.
+
+    A plain class rather than ``contextlib.contextmanager``, which costs several
+    microseconds per call on the hot path.
+    """
+
+    __slots__ = ("registry", "tool", "call", "token", "start")
+
+    def __init__(self, registry: "MetricsRegistry", tool: str):
+        self.registry = registry
+        self.tool = tool
+        self.call: Optional[CallMetrics] = None
+
+    def __enter__(self) -> Optional[CallMetrics]:
+        if self.registry.enabled:
+            self.call = CallMetrics()
+            self.token = _current.set(self.call)
+            self.start = time.perf_counter()
+        return self.call
+
+    def __exit__(self, exc_type, exc, traceback) -> None:
+        if self.call is None:
+            return
+        seconds = time.perf_counter() - self.start
+        _current.reset(self.token)
+        error = exc_type.__name__ if exc_type is not None else None
+        self.registry._finish(self.tool, self.call, seconds, error)
+
+
+class MetricsRegistry:
+    """Per-tool metrics of a server."""
+
+    def __init__(
+        self,
+        enabled: bool = True,
+        textfile: Optional[str] = None,
+        textfile_interval: float = DEFAULT_TEXTFILE_INTERVAL,
+        worker_dir: Optional[str] = None,
+    ):
+        """Initialize the registry.
+
+        Args:
+            enabled: Whether tool calls are measured.
+            textfile: Path of the Prometheus text file to maintain, if any.
+            textfile_interval: Minimum seconds between text file writes.
+            worker_dir: Directory where the worker processes of a server share
+                their metrics, if there are several.
+        """
+        self.enabled = enabled
+        self.textfile = textfile
+        self.textfile_interval = textfile_interval
+        self.worker_dir = worker_dir
+        self.started = time.time()
+        self.tools: Dict[str, ToolMetrics] = {}
+        self._last_write = 0.0
+        self._writing = False
+        self._publishing = False
+        # The event loop keeps only weak references to tasks; hold on to the
+        # background publications and writes until they finish
+        self._tasks: Set[asyncio.Task] = set()
+
+    @classmethod
+    def from_env(cls) -> "MetricsRegistry":
+        """Create a registry configured from the environment."""
+        enabled = os.getenv("INSIGHT_METRICS", "true").lower() in ("1", "true", "yes")
+        return cls(
+            enabled=enabled,
+            textfile=os.getenv("INSIGHT_METRICS_TEXTFILE") or None,
+            textfile_interval=float(
+                os.getenv("INSIGHT_METRICS_INTERVAL", DEFAULT_TEXTFILE_INTERVAL)
+            ),
+            worker_dir=os.getenv("INSIGHT_WORKER_DIR") or None,
+        )
+
+    def track(self, tool: str) -> "_CallTracker":
+        """Return a context manager measuring a tool call made within its block.
+
+        Exceptions are counted as errors of the tool by exception type and
+        re-raised.
+        """
+        return _CallTracker(self, tool)
+
+    def _finish(self, tool: str, call: CallMetrics, seconds: float, error) -> None:
+        metrics = self.tools.get(tool)
+        if metrics is None:
+            metrics = self.tools[tool] = ToolMetrics()
+        metrics.add(call, seconds, error)
+        if self.worker_dir is not None:
+            self._schedule_publish()
+        if self.textfile is not None:
+            self._maybe_write_textfile()
+
+    def _own_metrics(self) -> Dict[str, Dict[str, Any]]:
+        return {tool: m.to_dict() for tool, m in self.tools.items()}
+
+    def _schedule_publish(self) -> None:
+        """Publish this worker's metrics once the publication interval has passed.
+
+        Calls finishing in the meantime are included in the same publication.
+        """
+        if self._publishing:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.publish(self._own_metrics())
+            return
+        self._publishing = True
+
+        def start() -> None:
+            self._start_task(loop, self._publish_async())
+
+        loop.call_later(PUBLISH_INTERVAL, start)
+
+    async def _publish_async(self) -> None:
+        from . import fileio
+
+        try:
+            await fileio.run_io(self.publish, self._own_metrics())
+        finally:
+            self._publishing = False
+
+    def _worker_path(self, pid: int) -> str:
+        return os.path.join(self.worker_dir, f"metrics-{pid}.json")
+
+    def publish(self, tools: Dict[str, Dict[str, Any]]) -> None:
+        """Write this worker's metrics for the other workers atomically."""
+        path = self._worker_path(os.getpid())
+        temporary = f"{path}.tmp"
+        try:
+            with open(temporary, "w") as f:
+                json.dump({"tools": tools}, f)
+            os.replace(temporary, path)
+        except OSError as e:
+            print(
+                f"Warning: Could not publish metrics to {path}: {str(e)}",
+                file=sys.stderr,
+            )
+
+    def read_workers(self) -> List[Dict[str, Dict[str, Any]]]:
+        """Return the metrics published by the other workers, including exited ones.
+
+        Exited workers keep their file, so restarting a worker loses no counts.
+        """
+        if self.worker_dir is None:
+            return []
+        own = self._worker_path(os.getpid())
+        workers = []
+        for path in sorted(glob.glob(os.path.join(self.worker_dir, "metrics-*.json"))):
+            if path == own:
+                continue
+            try:
+                with open(path, "r") as f:
+                    workers.append(json.load(f)["tools"])
+            except (OSError, ValueError, KeyError):
+                continue
+        return workers
+
+    def combined(
+        self,
+        own: Dict[str, Dict[str, Any]],
+        workers: List[Dict[str, Dict[str, Any]]],
+    ) -> Dict[str, ToolMetrics]:
+        """Return per-tool metrics summed over this and the other workers."""
+        tools: Dict[str, ToolMetrics] = {}
+        for metrics in (own, *workers):
+            for tool, data in metrics.items():
+                tools.setdefault(tool, ToolMetrics()).merge_dict(data)
+        return tools
+
+    async def snapshot_async(self) -> Dict[str, Any]:
+        """Return the snapshot, covering every worker if there are several.
+
+        The snapshot also holds the counters, entry count and size of the
+        response cache once it has been opened.
+        """
+        from . import fileio
+
+        workers = None
+        if self.worker_dir is not None:
+            workers = await fileio.run_io(self.read_workers)
+        result = self.snapshot(workers)
+        cache = sys.modules.get("insight.llm.cache")
+        if cache is not None:
+            stats = await fileio.run_io(cache.cache_metrics)
+            if stats is not None:
+                result["response_cache"] = stats
+        return result
+
+    def snapshot(
+        self, workers: Optional[List[Dict[str, Dict[str, Any]]]] = None
+    ) -> Dict[str, Any]:
+        """Return every tool's metrics, and the LLM gateways' state if loaded.
+
+        Args:
+            workers: Metrics published by the other workers, as returned by
+                ``read_workers``, to include in the tool metrics. The uptime and
+                gateway state are those of this worker.
+        """
+        tools = self.tools
+        if workers:
+            tools = self.combined(self._own_metrics(), workers)
+        result: Dict[str, Any] = {
+            "uptime_seconds": round(time.time() - self.started, 3),
+            "tools": {tool: m.to_dict() for tool, m in sorted(tools.items())},
+        }
+        if self.worker_dir is not None:
+            result["worker_pid"] = os.getpid()
+            result["workers_reporting"] = len(workers or ()) + 1
+        # Reading gateway state must not import LangChain into a server that
+        # has not used the LLM yet
+        gateway = sys.modules.get("insight.llm.gateway")
+        if gateway is not None:
+            result["gateways"] = gateway.gateway_metrics()
+        return result
+
+    def to_prometheus(self, tools: Optional[Dict[str, ToolMetrics]] = None) -> str:
+        """Return the metrics in the Prometheus text exposition format.
+
+        Args:
+            tools: Per-tool metrics to render instead of this registry's own.
+        """
+        lines: List[str] = []
+
+        def family(name: str, kind: str, help_text: str) -> None:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        tools = sorted((self.tools if tools is None else tools).items())
+        family("insight_tool_calls_total", "counter", "Tool calls.")
+        for tool, m in tools:
+            lines.append(f'insight_tool_calls_total{{tool="{tool}"}} {m.calls}')
+        family("insight_tool_errors_total", "counter", "Failed tool calls.")
+        for tool, m in tools:
+            for error, count in sorted(m.errors.items()):
+                lines.append(
+                    f'insight_tool_errors_total{{tool="{tool}",error="{error}"}} {count}'
+                )
+        family(
+            "insight_tool_latency_seconds",
+            "histogram",
+            "Tool call latency by phase.",
+        )
+        for tool, m in tools:
+            for phase, histogram in m.latency.items():
+                labels = f'tool="{tool}",phase="{phase}"'
+                for bound, total in histogram.to_dict()["buckets"].items():
+                    lines.append(
+                        f'insight_tool_latency_seconds_bucket{{{labels},le="{bound}"}} '
+                        f"{total}"
+                    )
+                lines.append(
+                    f"insight_tool_latency_seconds_sum{{{labels}}} {histogram.sum:.6f}"
+                )
+                lines.append(
+                    f"insight_tool_latency_seconds_count{{{labels}}} {histogram.count}"
+                )
+        family("insight_tool_llm_calls_total", "counter", "LLM requests of tool calls.")
+        for tool, m in tools:
+            lines.append(f'insight_tool_llm_calls_total{{tool="{tool}"}} {m.llm_calls}')
+        family("insight_tool_tokens_total", "counter", "LLM tokens of tool calls.")
+        for tool, m in tools:
+            for direction, count in (
+                ("input", m.input_tokens),
+                ("output", m.output_tokens),
+            ):
+                lines.append(
+                    f'insight_tool_tokens_total{{tool="{tool}",direction="{direction}"}} '
+                    f"{count}"
+                )
+        family(
+            "insight_tool_cache_lookups_total",
+            "counter",
+            "Response cache lookups of tool calls.",
+        )
+        for tool, m in tools:
+            for result, count in (("hit", m.cache_hits), ("miss", m.cache_misses)):
+                lines.append(
+                    f'insight_tool_cache_lookups_total{{tool="{tool}",result="{result}"}} '
+                    f"{count}"
+                )
+        family(
+            "insight_tool_coalesced_total",
+            "counter",
+            "LLM work of tool calls shared with identical calls in flight.",
+        )
+        for tool, m in tools:
+            lines.append(f'insight_tool_coalesced_total{{tool="{tool}"}} {m.coalesced}')
+        family("insight_tool_llm_retries_total", "counter", "Retried LLM requests.")
+        for tool, m in tools:
+            lines.append(f'insight_tool_llm_retries_total{{tool="{tool}"}} {m.retries}')
+        return "\n".join(lines) + "\n"
+
+    def _maybe_write_textfile(self) -> None:
+        """Schedule a text file write if one is due."""
+        if self.textfile is None or self._writing:
+            return
+        now = time.monotonic()
+        if now - self._last_write < self.textfile_interval:
+            return
+        self._last_write = now
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.write_textfile()
+            return
+        self._writing = True
+        self._start_task(loop, self._write_textfile_async())
+
+    def _start_task(
+        self, loop: asyncio.AbstractEventLoop, coro: Coroutine[Any, Any, None]
+    ) -> None:
+        task = loop.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _write_textfile_async(self) -> None:
+        from . import fileio
+
+        # Copy this worker's metrics on the event loop, where they are updated,
+        # so that the I/O thread never reads the live counters
+        own = self._own_metrics()
+        try:
+            await fileio.run_io(self.write_textfile, own)
+        finally:
+            self._writing = False
+
+    def write_textfile(self, own: Optional[Dict[str, Dict[str, Any]]] = None) -> None:
+        """Write the Prometheus text file atomically.
+
+        Args:
+            own: Copy of this worker's metrics as ``to_dict`` returns them,
+                taken now if not given. With several workers, the file holds the
+                sum over all of them.
+        """
+        if self.textfile is None:
+            return
+        own = self._own_metrics() if own is None else own
+        tools = self.combined(own, self.read_workers())
+        content = self.to_prometheus(tools)
+        temporary = f"{self.textfile}.{os.getpid()}.tmp"
+        try:
+            with open(temporary, "w") as f:
+                f.write(content)
+            os.replace(temporary, self.textfile)
+        except OSError as e:
+            print(
+                f"Warning: Could not write metrics to {self.textfile}: {str(e)}",
+                file=sys.stderr,
+            )
@@ -1,7 +1,9 @@
 """Requirements phase prompt templates.
 
 This module contains prompt templates used in the requirements development phase
-for requirements generation, review, and assessment.
+for requirements generation, review, and assessment. ``REQUIREMENTS_PROMPTS`` are
+served to the client as is; ``REQUIREMENTS_PIPELINE_TEMPLATES`` are the templates
+the requirements tools send to the LLM.
 """
 
 from typing import Dict, Literal, Optional, TypedDict
@@ -89,6 +91,60 @@ STOP after writing the requirements to a file and wait for the user to provide f
     "requirements_assessment": """As a world-class software architect, on a scale of 0 to 10, how ready are these requirements to support implementation? Pay particular attention to completeness given the concept, consistency, orthogonality, and elegance. Everything in the requirements must be numbered. Requirements must be appropriate to the scope of the concept.
 
 STOP after the assessment and wait for the user to provide feedback.""",
+    # When reviewing a generated draft before it is finalized
+    "requirements_intermediate_review": """As a world-class technical product manager, review the draft requirements document and return an improved, complete version of it.
+
+Check every requirement and fix any issues directly:
+- Every requirement has a unique, hierarchical number (e.g., 3.1.2.3) and the structure follows the requirements document template
+- Each requirement is atomic, specific, unambiguous and verifiable
+- MUST, SHOULD, MAY and MUST NOT are used consistently
+- Terminology is consistent and every term is defined
+- Requirements are scoped to the concept; remove enterprise requirements from a small proof of concept, timelines, and business requirements that are not technically relevant
+- There are no duplicates, contradictions or gaps
+
+Do not include any comments or meta-commentary, just the revised requirements.""",
+}
+
+
+# Templates for the LLM pipelines of the requirements tools. The first three embed
+# the prompts above and add the input the pipeline fills in.
+REQUIREMENTS_PIPELINE_TEMPLATES: Dict[str, str] = {
+    "requirements_creation": REQUIREMENTS_PROMPTS["requirements_creation"]
+    + "\n\nProduct brief:\n\n{brief}",
+    "requirements_intermediate_review": REQUIREMENTS_PROMPTS[
+        "requirements_intermediate_review"
+    ]
+    + "\n\nDraft requirements document:\n\n{requirements}",
+    "requirements_assessment": REQUIREMENTS_PROMPTS["requirements_assessment"]
+    + "\n\nRequirements:\n\n{requirements}",
+    # When assessing one file of a requirements directory incrementally
+    "requirements_file_assessment": """As a world-class software architect, on a scale of 0 to 10, how ready is this part of a requirements document to support implementation? It is one file of a larger requirements set, so judge it on its own content: completeness for its scope, consistency, orthogonality, and elegance. Everything in the requirements must be numbered.
+
+Requirements file {file_name}:
+
+{requirements}
+
+Keep the assessment brief and end it with a final line of the form "Score: N/10".""",
+    # When assessing one chunk of a large requirements set (map step)
+    "requirements_chunk_assessment": """As a world-class software architect, review an excerpt from a larger requirements document. The document is split into several parts, so do not penalize the excerpt for topics that other parts may cover.
+
+List concrete findings on consistency, orthogonality, numbering, ambiguity and scope, citing requirement numbers. Then rate how ready this excerpt is to support implementation on a scale of 0 to 10.
+
+Excerpt (part {part} of {parts}):
+
+{requirements}
+
+Keep the findings concise and end with a final line of the form "Score: N/10".""",
+    # When combining chunk assessments into one report (reduce step)
+    "requirements_assessment_reduce": """As a world-class software architect, combine the following partial assessments of one requirements document into a single assessment. Each partial assessment covers one excerpt of the document.
+
+Merge duplicate findings, call out gaps that only become visible across excerpts, and judge completeness, consistency, orthogonality, and elegance for the document as a whole. Requirements must be appropriate to the scope of the concept.
+
+Partial assessments:
+
+{assessments}
+
+End with a final line of the form "Score: N/10" giving the overall readiness of the requirements to support implementation.""",
 }
 
 
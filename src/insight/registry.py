@@ -0,0 +1,219 @@
+"""Tool registry for the MCP workflow server.
+
+This module maps every tool name to exactly one handler coroutine so that tool
+calls are dispatched with a single dictionary lookup instead of probing each
+workflow phase in turn. The tool listing is built once and reused until the
+registry changes.
+
+A tool call can be given a deadline, after which it is cancelled together with
+the LLM calls it is waiting for. Deadlines are configured with:
+
+- ``INSIGHT_TOOL_TIMEOUT``: Default deadline of every tool call in seconds
+  (unset by default, meaning none)
+- ``INSIGHT_TOOL_TIMEOUTS``: JSON object of deadlines by tool name, overriding
+  the default
+"""
+
+import asyncio
+import json
+import os
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    List,
+    Mapping,
+    Optional,
+    Tuple,
+)
+
+from mcp.types import TextContent, Tool
+
+if TYPE_CHECKING:
+    from langchain_core.language_models import BaseLanguageModel
+
+
+ToolHandler = Callable[
+    [dict, Optional["BaseLanguageModel"]], Awaitable[List[TextContent]]
+]
+LLMProvider = Callable[[], Awaitable["BaseLanguageModel"]]
+
+
+def requires_llm(handler: ToolHandler) -> ToolHandler:
+    """Mark a tool handler as needing the language model.
+
+    The registry only asks for the language model when dispatching to marked
+    handlers; every other handler receives ``None``.
+    """
+    handler.requires_llm = True
+    return handler
+
+
+def load_tool_timeouts() -> Tuple[Optional[float], Dict[str, float]]:
+    """Return the default tool deadline and the deadlines by tool name.
+
+    Raises:
+        ValueError: If a deadline is not a positive number of seconds.
+    """
+    default = os.getenv("INSIGHT_TOOL_TIMEOUT")
+    default = _seconds("INSIGHT_TOOL_TIMEOUT", default) if default else None
+    text = os.getenv("INSIGHT_TOOL_TIMEOUTS")
+    config = json.loads(text) if text else {}
+    if not isinstance(config, dict):
+        raise ValueError("INSIGHT_TOOL_TIMEOUTS must be a JSON object")
+    return default, {name: _seconds(name, value) for name, value in config.items()}
+
+
+def _seconds(name: str, value: Any) -> float:
+    try:
+        seconds = float(value)
+    except (TypeError, ValueError):
+        seconds = 0.0
+    if seconds <= 0:
+        raise ValueError(f"Deadline of {name} must be a positive number: {value!r}")
+    return seconds
+
+
+class ToolRegistry:
+    """Registry of MCP tools and the coroutines that handle them."""
+
+    def __init__(self):
+        """Initialize an empty registry."""
+        self._tools: Dict[str, Tool] = {}
+        self._handlers: Dict[str, ToolHandler] = {}
+        self._listing: Optional[List[Tool]] = None
+
+    def register(self, tool: Tool, handler: ToolHandler) -> None:
+        """Register a single tool and its handler.
+
+        Args:
+            tool: Tool definition advertised to clients.
+            handler: Coroutine function called with the tool arguments and the LLM.
+
+        Raises:
+            ValueError: If a tool with the same name is already registered.
+        """
+        if tool.name in self._handlers:
+            raise ValueError(f"Tool already registered: {tool.name}")
+        self._tools[tool.name] = tool
+        self._handlers[tool.name] = handler
+        self.invalidate()
+
+    def unregister(self, name: str) -> None:
+        """Remove a tool and its handler.
+
+        Raises:
+            ValueError: If no tool with that name is registered.
+        """
+        if name not in self._handlers:
+            raise ValueError(f"Unknown tool: {name}")
+        del self._tools[name]
+        del self._handlers[name]
+        self.invalidate()
+
+    def invalidate(self) -> None:
+        """Discard the cached tool listing so the next request rebuilds it.
+
+        Called automatically whenever tools are registered or removed; call it
+        directly after mutating a registered ``Tool`` in place.
+        """
+        self._listing = None
+
+    def register_phase(
+        self, tools: List[Tool], handlers: Mapping[str, ToolHandler]
+    ) -> None:
+        """Register all tools of a workflow phase.
+
+        Args:
+            tools: Tool definitions returned by the phase's ``get_*_tools`` function.
+            handlers: Mapping of tool name to handler returned by ``get_*_handlers``.
+
+        Raises:
+            ValueError: If a tool has no handler, a handler has no tool, or a tool
+                name collides with one that is already registered.
+        """
+        names = {tool.name for tool in tools}
+        missing = names - handlers.keys()
+        if missing:
+            raise ValueError(f"No handler for tools: {', '.join(sorted(missing))}")
+        orphaned = handlers.keys() - names
+        if orphaned:
+            raise ValueError(
+                f"No tool definition for handlers: {', '.join(sorted(orphaned))}"
+            )
+
+        for tool in tools:
+            self.register(tool, handlers[tool.name])
+
+    def list_tools(self) -> List[Tool]:
+        """Return all registered tools in registration order.
+
+        The returned list is cached and shared between callers; do not mutate it.
+        """
+        if self._listing is None:
+            self._listing = list(self._tools.values())
+        return self._listing
+
+    def get_handler(self, name: str) -> ToolHandler:
+        """Return the handler registered for a tool.
+
+        Raises:
+            ValueError: If no tool with that name is registered.
+        """
+        try:
+            return self._handlers[name]
+        except KeyError:
+            raise ValueError(f"Unknown tool: {name}") from None
+
+    async def dispatch(
+        self,
+        name: str,
+        arguments: dict,
+        get_llm: LLMProvider,
+        timeout: Optional[float] = None,
+    ) -> List[TextContent]:
+        """Call the handler registered for a tool.
+
+        Args:
+            name: Name of the tool to call.
+            arguments: Tool arguments sent by the client.
+            get_llm: Coroutine function returning the language model. It is only
+                awaited for handlers marked with ``requires_llm``.
+            timeout: Seconds after which the call is cancelled, or None for no
+                deadline.
+
+        Returns:
+            List[TextContent]: The handler's result.
+
+        Raises:
+            ValueError: If no tool with that name is registered, or the call
+                missed its deadline.
+        """
+        handler = self.get_handler(name)
+        if timeout is None:
+            return await self._call(handler, arguments, get_llm)
+        try:
+            async with asyncio.timeout(timeout) as deadline:
+                return await self._call(handler, arguments, get_llm)
+        except TimeoutError:
+            if not deadline.expired():
+                raise
+            raise ValueError(
+                f"{name} did not finish within its deadline of {timeout:g} seconds"
+            ) from None
+
+    async def _call(
+        self, handler: ToolHandler, arguments: dict, get_llm: LLMProvider
+    ) -> List[TextContent]:
+        llm = await get_llm() if getattr(handler, "requires_llm", False) else None
+        return await handler(arguments, llm)
+
+    def __contains__(self, name: object) -> bool:
+        """Return whether a tool with the given name is registered."""
+        return name in self._handlers
+
+    def __len__(self) -> int:
+        """Return the number of registered tools."""
+        return len(self._handlers)
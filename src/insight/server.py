@@ -5,28 +5,95 @@ This module provides the main server implementation that handles tool registrati
 LLM initialization, and request routing for the insight workflow system.
 """
 import asyncio
+import json
 import os
 import os.path
-from typing import Union
+import sys
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, List, Optional, Tuple
 
 import mcp.server.stdio
 import mcp.types as types
 from dotenv import load_dotenv
-from langchain_anthropic import ChatAnthropic
-from langchain_openai import ChatOpenAI
 from mcp.server.lowlevel import Server
+from mcp.server.lowlevel.helper_types import ReadResourceContents
+from pydantic import AnyUrl
 
 from .handlers import (
     architecture_handlers,
     concept_handlers,
     implementation_handlers,
     integration_test_handlers,
+    job_handlers,
     requirements_handlers,
 )
+from .jobs import JobScheduler
+from .metrics import METRICS_URI, MetricsRegistry
+from .registry import ToolRegistry, load_tool_timeouts
+
+if TYPE_CHECKING:
+    from langchain_core.language_models import BaseChatModel
+    from mcp.server.transport_security import TransportSecuritySettings
+    from starlette.applications import Starlette
 
 # Load environment variables from .env file
 load_dotenv()
 
+TRANSPORTS = ("stdio", "sse", "streamable-http")
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8000
+
+# Names a client on the same machine may use for a server on a loopback or
+# wildcard address
+LOCAL_HOSTS = ("127.0.0.1", "localhost", "[::1]")
+
+
+def transport_security(
+    host: str = DEFAULT_HOST, port: int = DEFAULT_PORT
+) -> "TransportSecuritySettings":
+    """Return the DNS rebinding protection of the HTTP transports.
+
+    Requests are only accepted with a ``Host`` header naming the address the
+    server listens on, and from browsers only with an ``Origin`` on that
+    address, so that a web page cannot reach the server through a DNS name
+    rebound to it. A server on a loopback or wildcard address also accepts the
+    local host names. Further ``host:port`` names, such as those of a reverse
+    proxy, are given by ``INSIGHT_ALLOWED_HOSTS``, separated by commas.
+
+    Args:
+        host: Interface the server listens on.
+        port: Port the server listens on.
+    """
+    from mcp.server.transport_security import TransportSecuritySettings
+
+    names = [f"[{host}]" if ":" in host else host]
+    if host in ("127.0.0.1", "localhost", "::1", "0.0.0.0", "::"):  # nosec B104
+        names.extend(LOCAL_HOSTS)
+    hosts = [f"{name}:{port}" for name in dict.fromkeys(names)]
+    extra = os.getenv("INSIGHT_ALLOWED_HOSTS", "")
+    hosts.extend(name.strip() for name in extra.split(",") if name.strip())
+    return TransportSecuritySettings(
+        enable_dns_rebinding_protection=True,
+        allowed_hosts=hosts,
+        allowed_origins=[
+            f"{scheme}://{name}" for name in hosts for scheme in ("http", "https")
+        ],
+    )
+
+
+class _ASGIEndpoint:
+    """Route endpoint that hands the raw ASGI connection to a handler.
+
+    Starlette treats plain functions as request/response endpoints, while the MCP
+    HTTP transports write their responses themselves.
+    """
+
+    def __init__(self, handler: Callable[[Any, Any, Any], Awaitable[None]]):
+        self.handler = handler
+
+    async def __call__(self, scope, receive, send) -> None:
+        await self.handler(scope, receive, send)
+
 
 class WorkflowServer:
     """Main workflow server that handles MCP tool requests and LLM interactions."""
@@ -34,98 +101,209 @@ class WorkflowServer:
     def __init__(self):
         """Initialize the workflow server with tool handlers and LLM configuration."""
         self.server = Server("workflow-server")
+        self.jobs = JobScheduler.from_env(self._run_job)
+        self.registry = self._build_registry()
+        self.default_timeout, self.tool_timeouts = load_tool_timeouts()
+        self.metrics = MetricsRegistry.from_env()
         self.setup_tool_handlers()
+        self.setup_resource_handlers()
 
-        # Initialize LLM based on environment
-        self.llm = self._initialize_llm()
+        # The LLM is built by the first tool call that needs it
+        self.llm: Optional["BaseChatModel"] = None
+        self._llm_lock = asyncio.Lock()
 
         # Error handling
         self.server.onerror = lambda error: print("[MCP Error]", error)
 
-    def _initialize_llm(self) -> Union[ChatOpenAI, ChatAnthropic]:
+    async def get_llm(self) -> "BaseChatModel":
+        """Return the LLM, initializing it on first use.
+
+        Concurrent first calls share a single initialization. Construction runs
+        in a worker thread because importing the provider SDK is slow, and a
+        failure, such as a missing API key, only fails the tool call that needed
+        the LLM; the next call tries again. The model is wrapped in the provider
+        gateway, which rate-limits its calls and adapts their concurrency.
+
+        Returns:
+            BaseChatModel: The configured LLM instance.
+        """
+        if self.llm is None:
+            async with self._llm_lock:
+                if self.llm is None:
+                    self.llm = await asyncio.to_thread(self._build_llm)
+        return self.llm
+
+    def _build_llm(self) -> "BaseChatModel":
+        """Initialize the configured LLMs behind the provider gateway.
+
+        With more than one backend in ``LLM_PROVIDERS``, the backends are pooled
+        so that requests are hedged and failed over between them.
+        """
+        from .llm.gateway import with_gateway
+
+        models = [
+            with_gateway(self._initialize_llm(provider, model))
+            for provider, model in self._provider_specs()
+        ]
+        if len(models) == 1:
+            return models[0]
+
+        from .llm.pool import PooledChatModel
+
+        return PooledChatModel.from_models(models)
+
+    def _provider_specs(self) -> List[Tuple[str, Optional[str]]]:
+        """Return the configured ``(provider, model)`` backends in order of preference.
+
+        ``LLM_PROVIDERS`` lists backends as comma-separated ``provider[:model]``
+        entries, such as ``openai:gpt-4o,anthropic:claude-3-5-sonnet``. Without it,
+        the single backend is given by ``LLM_PROVIDER`` and ``LLM_MODEL``.
+        """
+        providers = os.getenv("LLM_PROVIDERS")
+        if not providers:
+            return [(os.getenv("LLM_PROVIDER", "openai"), os.getenv("LLM_MODEL"))]
+        specs = []
+        for entry in providers.split(","):
+            provider, _, model = entry.strip().partition(":")
+            specs.append((provider, model or None))
+        return specs
+
+    def _initialize_llm(
+        self, provider: Optional[str] = None, model: Optional[str] = None
+    ) -> "BaseChatModel":
         """Initialize LLM based on environment configuration.
 
+        Args:
+            provider: Provider name. Defaults to ``LLM_PROVIDER`` and
+                ``LLM_MODEL``.
+            model: Model name. Defaults to the provider's default model.
+
         Returns:
-            Union[ChatOpenAI, ChatAnthropic]: Configured LLM instance based on environment settings.
+            BaseChatModel: Configured LLM instance based on environment settings.
         """
-        provider = os.getenv("LLM_PROVIDER", "openai").lower()
-        model = os.getenv("LLM_MODEL")
-
-        if provider == "openai":
-            if not model:
-                model = "gpt-4o"
-            return ChatOpenAI(
-                model=model,
-                temperature=0.5,  # Default temperature, handlers will adjust as needed
-            )
-        elif provider == "anthropic":
-            if not model:
-                model = "claude-3-5-sonnet"
-            return ChatAnthropic(
-                model=model,
-                temperature=0.5,  # Default temperature, handlers will adjust as needed
-            )
-        else:
-            raise ValueError(f"Unsupported LLM provider: {provider}")
+        from .llm.providers import create_chat_model
+
+        if provider is None:
+            provider = os.getenv("LLM_PROVIDER", "openai")
+            model = model or os.getenv("LLM_MODEL")
+        return create_chat_model(provider, model)
+
+    def _build_registry(self) -> ToolRegistry:
+        """Build the tool registry from every workflow phase.
+
+        Returns:
+            ToolRegistry: Registry mapping each tool name to its handler.
+
+        Raises:
+            ValueError: If two phases register a tool with the same name.
+        """
+        registry = ToolRegistry()
+        registry.register_phase(
+            concept_handlers.get_concept_tools(),
+            concept_handlers.get_concept_handlers(),
+        )
+        registry.register_phase(
+            architecture_handlers.get_architecture_tools(),
+            architecture_handlers.get_architecture_handlers(),
+        )
+        registry.register_phase(
+            requirements_handlers.get_requirements_tools(),
+            requirements_handlers.get_requirements_handlers(),
+        )
+        registry.register_phase(
+            implementation_handlers.get_implementation_tools(),
+            implementation_handlers.get_implementation_handlers(),
+        )
+        registry.register_phase(
+            integration_test_handlers.get_integration_test_tools(),
+            integration_test_handlers.get_integration_test_handlers(),
+        )
+        registry.register_phase(
+            job_handlers.get_job_tools(
+                {tool.name: tool for tool in registry.list_tools()}
+            ),
+            job_handlers.get_job_handlers(self.jobs),
+        )
+        return registry
+
+    def tool_timeout(self, *names: str) -> Optional[float]:
+        """Return the deadline of the first configured tool name, or the default."""
+        for name in names:
+            if name in self.tool_timeouts:
+                return self.tool_timeouts[name]
+        return self.default_timeout
+
+    async def _run_job(self, name: str, arguments: dict) -> List[types.TextContent]:
+        """Run the tool call of a background job.
+
+        A job has the deadline configured for its ``start_*`` tool, falling back
+        to that of the tool it runs.
+        """
+        timeout = self.tool_timeout(f"start_{name}", name)
+        with self.metrics.track(name):
+            return await self.registry.dispatch(name, arguments, self.get_llm, timeout)
 
     def setup_tool_handlers(self):
         """Set up handlers for tool listing and execution.
 
-        This method configures the server to handle tool listing requests and tool execution
-        by registering appropriate handlers for each workflow phase.
+        This method configures the server to list the tools in the registry and to
+        dispatch each tool call directly to the handler registered for its name.
         """
 
         @self.server.list_tools()
         async def handle_list_tools() -> list[types.Tool]:
-            # Combine tools from both phases
-            return [
-                *concept_handlers.get_concept_tools(),
-                *architecture_handlers.get_architecture_tools(),
-                *requirements_handlers.get_requirements_tools(),
-                *implementation_handlers.get_implementation_tools(),
-                *integration_test_handlers.get_integration_test_tools(),
-            ]
+            return self.registry.list_tools()
 
         @self.server.call_tool()
         async def handle_call_tool(
             name: str, arguments: dict
         ) -> list[types.TextContent]:
-            # Try concept phase handlers first
-            result = await concept_handlers.handle_concept_tool(
-                name, arguments, self.llm
-            )
-            if result is not None:
-                return result
-
-            # Try architecture phase handlers next
-            result = await architecture_handlers.handle_architecture_tool(
-                name, arguments, self.llm
-            )
-            if result is not None:
-                return result
+            if name not in self.registry:
+                return await self.registry.dispatch(name, arguments, self.get_llm)
+            # A call cancelled by the client, or past its deadline, cancels the
+            # LLM calls it is waiting for
+            with self.metrics.track(name):
+                return await self.registry.dispatch(
+                    name, arguments, self.get_llm, self.tool_timeout(name)
+                )
 
-            # Try requirements phase handlers next
-            result = await requirements_handlers.handle_requirements_tool(
-                name, arguments, self.llm
-            )
-            if result is not None:
-                return result
+    def setup_resource_handlers(self):
+        """Set up the resources the server exposes.
 
-            # Try implementation phase handlers next
-            result = await implementation_handlers.handle_implementation_tool(
-                name, arguments, self.llm
-            )
-            if result is not None:
-                return result
+        The ``insight://metrics`` resource holds a JSON snapshot of the per-tool
+        metrics and the background jobs of this process, and of the circuit
+        state and latencies of the backends of a pooled LLM.
+        """
 
-            # Try integration test phase handlers next
-            result = await integration_test_handlers.handle_integration_test_tool(
-                name, arguments, self.llm
-            )
-            if result is not None:
-                return result
+        @self.server.list_resources()
+        async def handle_list_resources() -> list[types.Resource]:
+            return [
+                types.Resource(
+                    uri=METRICS_URI,
+                    name="metrics",
+                    description=(
+                        "Per-tool call counts, latency histograms, tokens, cache "
+                        "hits and errors"
+                    ),
+                    mimeType="application/json",
+                )
+            ]
 
-            raise ValueError(f"Unknown tool: {name}")
+        @self.server.read_resource()
+        async def handle_read_resource(uri: AnyUrl) -> List[ReadResourceContents]:
+            if str(uri) != METRICS_URI:
+                raise ValueError(f"Unknown resource: {uri}")
+            snapshot = await self.metrics.snapshot_async()
+            snapshot["jobs"] = self.jobs.snapshot()
+            pool = sys.modules.get("insight.llm.pool")
+            if pool is not None and isinstance(self.llm, pool.PooledChatModel):
+                snapshot["backends"] = self.llm.snapshot()
+            return [
+                ReadResourceContents(
+                    content=json.dumps(snapshot, indent=2),
+                    mime_type="application/json",
+                )
+            ]
 
     async def run(self):
         """Run the workflow server using stdio for communication.
@@ -138,6 +316,162 @@ class WorkflowServer:
                 read_stream, write_stream, self.server.create_initialization_options()
             )
 
+    def http_app(
+        self,
+        transport: str = "streamable-http",
+        stateless: bool = False,
+        host: str = DEFAULT_HOST,
+        port: int = DEFAULT_PORT,
+    ) -> "Starlette":
+        """Return an ASGI app serving any number of MCP sessions over HTTP.
+
+        Every client gets its own MCP session, while the LLM, its gateways and
+        the response cache are shared by all of them. The ``streamable-http``
+        transport is served at ``/mcp``; the ``sse`` transport opens event
+        streams at ``/sse`` and receives messages at ``/messages/``. Both answer
+        health checks at ``/healthz``.
+
+        Args:
+            transport: ``streamable-http`` or ``sse``.
+            stateless: Serve every streamable HTTP request on its own, without a
+                session spanning requests, so that any worker process can
+                answer it.
+            host: Interface the server listens on, for DNS rebinding protection.
+            port: Port the server listens on, for DNS rebinding protection.
+
+        Returns:
+            Starlette: The ASGI application.
+
+        Raises:
+            ValueError: If the transport is not an HTTP transport.
+        """
+        from contextlib import asynccontextmanager
+
+        from starlette.applications import Starlette
+        from starlette.responses import JSONResponse
+        from starlette.routing import Mount, Route
+
+        security = transport_security(host, port)
+
+        async def health(request) -> JSONResponse:
+            return JSONResponse({"status": "ok", "pid": os.getpid()})
+
+        if transport == "sse":
+            from mcp.server.sse import SseServerTransport
+
+            sse = SseServerTransport("/messages/", security_settings=security)
+
+            async def handle_sse(scope, receive, send) -> None:
+                async with sse.connect_sse(scope, receive, send) as (
+                    read_stream,
+                    write_stream,
+                ):
+                    await self.server.run(
+                        read_stream,
+                        write_stream,
+                        self.server.create_initialization_options(),
+                    )
+
+            return Starlette(
+                routes=[
+                    Route("/healthz", endpoint=health),
+                    Route("/sse", endpoint=_ASGIEndpoint(handle_sse), methods=["GET"]),
+                    Mount("/messages/", app=sse.handle_post_message),
+                ]
+            )
+
+        if transport != "streamable-http":
+            raise ValueError(f"Unsupported HTTP transport: {transport}")
+        from mcp.server.streamable_http_manager import StreamableHTTPSessionManager
+
+        session_manager = StreamableHTTPSessionManager(
+            app=self.server, stateless=stateless, security_settings=security
+        )
+
+        @asynccontextmanager
+        async def lifespan(app: Starlette):
+            async with session_manager.run():
+                yield
+
+        return Starlette(
+            routes=[
+                Route("/healthz", endpoint=health),
+                Route("/mcp", endpoint=_ASGIEndpoint(session_manager.handle_request)),
+            ],
+            lifespan=lifespan,
+        )
+
+    async def run_http(
+        self,
+        transport: str = "streamable-http",
+        host: str = DEFAULT_HOST,
+        port: int = DEFAULT_PORT,
+    ):
+        """Run the workflow server as a long-lived HTTP service.
+
+        Args:
+            transport: ``streamable-http`` or ``sse``.
+            host: Interface to listen on.
+            port: Port to listen on.
+        """
+        import uvicorn
+
+        config = uvicorn.Config(
+            self.http_app(transport, host=host, port=port), host=host, port=port
+        )
+        await uvicorn.Server(config).serve()
+
+
+def create_http_app() -> "Starlette":
+    """Create the HTTP app of one worker process started by ``run_workers``."""
+    return WorkflowServer().http_app(
+        "streamable-http",
+        stateless=True,
+        host=os.getenv("INSIGHT_HOST", DEFAULT_HOST),
+        port=int(os.getenv("INSIGHT_PORT", DEFAULT_PORT)),
+    )
+
+
+def run_workers(host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, workers: int = 2):
+    """Serve streamable HTTP clients from several worker processes sharing one socket.
+
+    A supervisor process binds the socket, starts the workers, checks that they
+    respond and replaces any worker that exits or hangs. Each worker runs its
+    own ``WorkflowServer`` and event loop. Requests are served statelessly,
+    since consecutive requests of a client may reach different workers. The
+    response cache is an SQLite database shared by all workers; tool metrics are
+    published to a shared directory so that every worker reports the totals;
+    and each worker's LLM gateway gets an equal share of the rate limits.
+
+    Args:
+        host: Interface to listen on.
+        port: Port to listen on.
+        workers: Number of worker processes.
+
+    Raises:
+        ValueError: If the server configuration is invalid.
+    """
+    import tempfile
+
+    import uvicorn
+
+    with tempfile.TemporaryDirectory(prefix="insight-workers-") as worker_dir:
+        # Workers are started as fresh interpreters and inherit the environment
+        os.environ["INSIGHT_WORKERS"] = str(workers)
+        os.environ["INSIGHT_WORKER_DIR"] = worker_dir
+        os.environ["INSIGHT_HOST"] = host
+        os.environ["INSIGHT_PORT"] = str(port)
+        # A worker that cannot build its app would only be restarted over and
+        # over by the supervisor, so configuration errors are raised here once
+        create_http_app()
+        uvicorn.run(
+            "insight.server:create_http_app",
+            factory=True,
+            host=host,
+            port=port,
+            workers=workers,
+        )
+
 
 if __name__ == "__main__":
     server = WorkflowServer()
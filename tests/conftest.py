@@ -0,0 +1,66 @@
+"""Shared fixtures: an isolated environment and an in-memory server session."""
+
+import pytest
+from fakes import FakeChatModel
+from mcp.shared.memory import create_connected_server_and_client_session
+
+from insight import assessments, fileio
+from insight.handlers import requirements_handlers
+from insight.llm import cache, gateway, retry, tiering, tokens
+from insight.llm.coalescing import SingleFlight
+from insight.llm.gateway import with_gateway
+from insight.server import WorkflowServer
+
+
+@pytest.fixture
+def anyio_backend():
+    """Run the async tests on asyncio, which the server uses."""
+    return "asyncio"
+
+
+@pytest.fixture(autouse=True)
+def isolated(tmp_path, monkeypatch):
+    """Keep every test away from the user's cache, jobs and metrics files."""
+    for name in ("INSIGHT_TOOL_TIMEOUT", "INSIGHT_TOOL_TIMEOUTS", "LLM_PROVIDERS"):
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setenv("INSIGHT_CACHE_ENABLED", "false")
+    monkeypatch.setenv("INSIGHT_METRICS_TEXTFILE", "")
+    monkeypatch.setenv("INSIGHT_JOBS_DB", str(tmp_path / "jobs.db"))
+    monkeypatch.setenv("INSIGHT_ASSESSMENTS_DB", str(tmp_path / "assessments.db"))
+    monkeypatch.setenv("INSIGHT_STEP_MODELS", "")
+    monkeypatch.setenv("INSIGHT_STEP_CONFIG", "")
+
+    # Process-wide state is created on first use; start each test without it
+    monkeypatch.setattr(gateway, "_gateways", {})
+    monkeypatch.setattr(retry, "_budget", None)
+    monkeypatch.setattr(cache, "_cache", None)
+    monkeypatch.setattr(assessments, "_store", None)
+    monkeypatch.setattr(tiering, "_step_models", {})
+    monkeypatch.setattr(tokens, "_encodings", {})
+    monkeypatch.setattr(requirements_handlers, "_FLIGHTS", SingleFlight())
+    tiering.load_step_config.cache_clear()
+    yield
+    if fileio._executor is not None:
+        fileio._executor.shutdown(wait=False, cancel_futures=True)
+        fileio._executor = None
+
+
+@pytest.fixture
+def model():
+    """A fake chat model that answers quickly."""
+    return FakeChatModel()
+
+
+@pytest.fixture
+def server(model):
+    """A workflow server whose LLM is the fake model behind the gateway."""
+    server = WorkflowServer()
+    server.llm = with_gateway(model)
+    return server
+
+
+@pytest.fixture
+async def session(server):
+    """A client session connected to the server in memory."""
+    async with create_connected_server_and_client_session(server.server) as session:
+        yield session
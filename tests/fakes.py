@@ -0,0 +1,111 @@
+"""Fake chat models for the tests."""
+
+import asyncio
+from types import SimpleNamespace
+from typing import Any, AsyncIterator, List, Optional
+
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForLLMRun,
+    CallbackManagerForLLMRun,
+)
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+RESPONSE = "The requirements are complete and testable.\nScore: 7/10"
+
+
+class FakeChatModel(BaseChatModel):
+    """Chat model with a fixed response, configurable latency and failures.
+
+    The response is streamed one word per chunk. Each call first raises the
+    next error in ``errors``, if any, and a stream raises ``stream_error`` after
+    its first chunk; ``calls``, ``prompts``, ``open_streams``, ``peak_streams``
+    and ``closed`` record what the model was asked to do.
+    """
+
+    response: str = RESPONSE
+    first_token_latency: float = 0.0
+    chunk_delay: float = 0.0
+    model_name: str = "fake-model"
+    temperature: Optional[float] = None
+    max_tokens: Optional[int] = None
+    llm_type: str = "fake"
+    errors: List[Exception] = []
+    stream_error: Optional[Exception] = None
+    calls: int = 0
+    prompts: List[str] = []
+    open_streams: int = 0
+    peak_streams: int = 0
+    closed: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return self.llm_type
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        message = AIMessage(content=self.response)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        output = None
+        async for chunk in self._astream(messages, stop, **kwargs):
+            output = chunk.message if output is None else output + chunk.message
+        message = AIMessage(content=output.content if output else "")
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        self.calls += 1
+        self.prompts.append("\n".join(str(message.content) for message in messages))
+        self.open_streams += 1
+        self.peak_streams = max(self.peak_streams, self.open_streams)
+        try:
+            await asyncio.sleep(self.first_token_latency)
+            if self.errors:
+                raise self.errors.pop(0)
+            words = self.response.split(" ")
+            for index, word in enumerate(words):
+                if index:
+                    if self.stream_error is not None:
+                        raise self.stream_error
+                    await asyncio.sleep(self.chunk_delay)
+                text = word if index == len(words) - 1 else word + " "
+                yield ChatGenerationChunk(message=AIMessageChunk(content=text))
+        finally:
+            self.open_streams -= 1
+            self.closed += 1
+
+
+class StatusError(Exception):
+    """Provider error carrying an HTTP status, like the SDKs' status errors."""
+
+    def __init__(self, status_code: int, headers: Optional[dict] = None):
+        """Initialize the error with a status and optional response headers."""
+        super().__init__(status_code, headers)
+        self.status_code = status_code
+        self.response = SimpleNamespace(headers=headers or {})
+
+    def __str__(self) -> str:
+        """Describe the error by its status, like the SDKs do."""
+        return f"HTTP {self.status_code}"
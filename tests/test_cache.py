@@ -0,0 +1,79 @@
+"""Tests of the response cache as seen through the server."""
+
+import json
+import threading
+
+import pytest
+
+from insight.llm import cache
+from insight.metrics import METRICS_URI
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    """Enable the response cache in a temporary directory."""
+    directory = tmp_path / "cache"
+    monkeypatch.setenv("INSIGHT_CACHE_ENABLED", "true")
+    monkeypatch.setenv("INSIGHT_CACHE_DIR", str(directory))
+    return directory
+
+
+@pytest.fixture
+def requirements(tmp_path):
+    """A requirements document to assess."""
+    path = tmp_path / "requirements.md"
+    path.write_text("# Requirements\n1.1 The tool MUST track tasks.\n")
+    return path
+
+
+async def _metrics(session) -> dict:
+    result = await session.read_resource(METRICS_URI)
+    return json.loads(result.contents[0].text)
+
+
+async def test_cache_is_opened_off_the_event_loop(
+    cache_dir, session, requirements, monkeypatch
+):
+    """The cache directory and database are created in a worker thread."""
+    threads = []
+    init = cache.ResponseCache.__init__
+
+    def record_thread(self, *args, **kwargs):
+        threads.append(threading.current_thread())
+        init(self, *args, **kwargs)
+
+    monkeypatch.setattr(cache.ResponseCache, "__init__", record_thread)
+
+    await session.call_tool(
+        "assess_requirements", {"requirements_path": str(requirements)}
+    )
+
+    assert len(threads) == 1
+    assert threads[0] is not threading.main_thread()
+    assert (cache_dir / "responses.sqlite3").exists()
+
+
+async def test_cache_stats_are_reported_in_metrics(
+    cache_dir, session, model, requirements
+):
+    """The metrics resource shows the cache counters once the cache is open."""
+    assert "response_cache" not in await _metrics(session)
+
+    arguments = {"requirements_path": str(requirements)}
+    first = await session.call_tool("assess_requirements", arguments)
+    second = await session.call_tool("assess_requirements", arguments)
+
+    assert first.content[0].text.split("\n\n")[0] == (
+        second.content[0].text.split("\n\n")[0]
+    )
+    assert model.calls == 1
+    stats = (await _metrics(session))["response_cache"]
+    assert {name: stats[name] for name in ("hits", "misses", "writes", "entries")} == {
+        "hits": 1,
+        "misses": 1,
+        "writes": 1,
+        "entries": 1,
+    }
+    assert stats["bytes"] > 0
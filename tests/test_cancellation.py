@@ -0,0 +1,104 @@
+"""Tests of tool deadlines and client cancellation."""
+
+import anyio
+import mcp.types as types
+import pytest
+from fakes import FakeChatModel
+from mcp.shared.exceptions import McpError
+
+from insight.llm.gateway import gateway_metrics
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def model():
+    """A fake chat model that takes seconds to answer."""
+    return FakeChatModel(first_token_latency=0.2, chunk_delay=1)
+
+
+@pytest.fixture
+def brief(tmp_path):
+    """A product brief in an otherwise empty directory."""
+    path = tmp_path / "brief.md"
+    path.write_text("# Brief\nA tool for tracking tasks.\n")
+    return path
+
+
+async def _wait_until(predicate, timeout: float = 2) -> None:
+    with anyio.fail_after(timeout):
+        while not predicate():
+            await anyio.sleep(0.01)
+
+
+def _in_flight() -> float:
+    return sum(gateway["in_flight"] for gateway in gateway_metrics().values())
+
+
+def _leftovers(directory) -> list:
+    return sorted(
+        path.name
+        for path in directory.iterdir()
+        if path.name == "requirements.md" or path.suffix == ".tmp"
+    )
+
+
+@pytest.fixture
+def deadline(monkeypatch):
+    """Give generate_requirements a deadline shorter than the model's answer."""
+    monkeypatch.setenv("INSIGHT_TOOL_TIMEOUTS", '{"generate_requirements": 0.5}')
+
+
+async def test_missed_deadline_fails_and_cancels_llm_calls(
+    deadline, session, model, brief
+):
+    """A call past its deadline fails, closes its streams and writes nothing."""
+    with anyio.fail_after(3):
+        result = await session.call_tool(
+            "generate_requirements", {"brief_path": str(brief)}
+        )
+
+    assert result.isError
+    assert "deadline of 0.5 seconds" in result.content[0].text
+    assert model.calls >= 1
+    await _wait_until(lambda: model.open_streams == 0)
+    await _wait_until(lambda: _in_flight() == 0)
+    assert _leftovers(brief.parent) == []
+
+
+async def test_client_cancel_releases_llm_permits(session, model, brief):
+    """A cancelled call leaves no permit in flight and writes nothing."""
+    errors = []
+
+    async def generate() -> None:
+        try:
+            await session.call_tool("generate_requirements", {"brief_path": str(brief)})
+        except McpError as e:
+            errors.append(e)
+
+    async with anyio.create_task_group() as tg:
+        tg.start_soon(generate)
+        await _wait_until(lambda: model.open_streams > 0)
+        assert _in_flight() == 1
+
+        request_id = session._request_id - 1
+        await session.send_notification(
+            types.ClientNotification(
+                types.CancelledNotification(
+                    method="notifications/cancelled",
+                    params=types.CancelledNotificationParams(requestId=request_id),
+                )
+            )
+        )
+        await _wait_until(lambda: model.open_streams == 0)
+        await _wait_until(lambda: _in_flight() == 0)
+
+    assert [str(e) for e in errors] == ["Request cancelled"]
+    assert _leftovers(brief.parent) == []
+
+    # The server still answers once the cancelled call is gone
+    with anyio.fail_after(1):
+        result = await session.call_tool(
+            "get_concept_prompt", {"prompt_name": "concept_refinement"}
+        )
+    assert not result.isError
@@ -0,0 +1,103 @@
+"""Tests of token-bounded chunking and trimming of requirements."""
+
+import re
+
+import pytest
+
+from insight.llm.chunking import chunk_requirements, split_sections, trim_sections
+from insight.llm.tokens import estimate_tokens
+
+
+def _dense(text: str) -> int:
+    """Count one token per character, far more than the estimate assumes."""
+    return len(text)
+
+
+def _section(title: str, lines: int = 3) -> str:
+    body = "".join(f"{title}.{n} The tool MUST do thing {n}.\n" for n in range(lines))
+    return f"## {title}\n{body}"
+
+
+def _markers(chunk: str) -> list:
+    return re.findall(r"^# From (.+):$", chunk, re.MULTILINE)
+
+
+def test_sections_are_packed_whole_within_the_budget():
+    """Chunks break at headings and stay within the budget."""
+    content = "".join(_section(f"Section {n}") for n in range(6))
+
+    chunks = chunk_requirements([("api.md", content)], 60)
+
+    assert len(chunks) > 1
+    assert all(estimate_tokens(chunk) <= 60 for chunk in chunks)
+    sections = [s for chunk in chunks for s in split_sections(chunk)]
+    assert [s.split("\n", 1)[0] for s in sections if s.startswith("## ")] == [
+        f"## Section {n}" for n in range(6)
+    ]
+
+
+def test_file_markers_start_every_chunk_and_file():
+    """Each file is introduced by its marker, repeated in every chunk it spans."""
+    files = [
+        ("api.md", "".join(_section(f"API {n}") for n in range(4))),
+        ("ui.md", _section("UI")),
+    ]
+
+    chunks = chunk_requirements(files, 80)
+
+    assert all(chunk.startswith("# From ") for chunk in chunks)
+    markers = [_markers(chunk) for chunk in chunks]
+    assert [m for m in markers if "api.md" in m]
+    assert sum(m.count("ui.md") for m in markers) == 1
+    # api.md continues across chunks, always under its own marker
+    assert sum(m.count("api.md") for m in markers) == sum(
+        1 for chunk in chunks if "API" in chunk
+    )
+
+
+@pytest.mark.parametrize("count", [estimate_tokens, _dense])
+def test_long_line_is_cut_by_measured_tokens(count):
+    """A line longer than the budget is cut into pieces that each fit."""
+    line = "x" * 1000
+    content = f"## Long\n{line}\n"
+
+    chunks = chunk_requirements([("api.md", content)], 100, count)
+
+    assert all(count(chunk) <= 100 for chunk in chunks)
+    body = "".join(re.sub(r"# From api.md:|## Long|\s", "", c) for c in chunks)
+    assert body == line
+
+
+def test_trim_drops_low_priority_sections_first():
+    """Glossary and reference sections go before the document's later sections."""
+    sections = [
+        _section("Overview"),
+        _section("Glossary"),
+        _section("Functional"),
+        _section("References"),
+    ]
+    content = "".join(sections)
+    budget = estimate_tokens(sections[0] + sections[2]) + 1
+
+    trimmed = trim_sections(content, budget)
+
+    assert trimmed == sections[0] + sections[2]
+
+
+def test_trim_drops_later_sections_and_keeps_the_first():
+    """Without low-priority sections, trimming works back from the end."""
+    sections = [_section(f"Section {n}") for n in range(4)]
+
+    trimmed = trim_sections("".join(sections), estimate_tokens(sections[0]) + 5)
+
+    assert trimmed == sections[0]
+
+
+def test_trim_truncates_an_oversized_first_section():
+    """A first section larger than the budget is truncated to fit it."""
+    content = _section("Overview", lines=20)
+
+    trimmed = trim_sections(content, 50, _dense)
+
+    assert len(trimmed) == 50
+    assert content.startswith(trimmed)
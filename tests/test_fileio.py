@@ -0,0 +1,67 @@
+"""Tests of non-blocking file access."""
+
+import threading
+import time
+
+import anyio
+import pytest
+
+from insight import fileio
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_slow_read_does_not_delay_other_requests(session, tmp_path, monkeypatch):
+    """A tool call stuck reading a file leaves the server free for other calls."""
+    brief = tmp_path / "brief.md"
+    brief.write_text("# Brief\nA tool for tracking tasks.\n")
+    reading = threading.Event()
+    release = threading.Event()
+    finished = threading.Event()
+    read = fileio._read
+
+    def slow_read(path: str) -> str:
+        reading.set()
+        release.wait(10)
+        finished.set()
+        return read(path)
+
+    monkeypatch.setattr(fileio, "_read", slow_read)
+
+    async with anyio.create_task_group() as tg:
+        tg.start_soon(
+            session.call_tool, "generate_requirements", {"brief_path": str(brief)}
+        )
+        await anyio.to_thread.run_sync(reading.wait, 5)
+
+        start = time.perf_counter()
+        with anyio.fail_after(1):
+            result = await session.call_tool(
+                "get_concept_prompt", {"prompt_name": "concept_refinement"}
+            )
+        elapsed = time.perf_counter() - start
+        # The prompt was served while the read was still blocked
+        still_reading = not finished.is_set()
+        release.set()
+
+    assert not result.isError
+    assert result.content[0].text
+    assert still_reading
+    assert elapsed < 0.5
+
+
+async def test_failed_write_keeps_previous_content(tmp_path, monkeypatch):
+    """A write that fails before the rename leaves neither a partial nor a .tmp file."""
+    path = tmp_path / "requirements.md"
+    path.write_text("previous")
+
+    def fail(source, target):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(fileio.os, "replace", fail)
+
+    with pytest.raises(OSError, match="disk full"):
+        await fileio.write_text(str(path), "new")
+
+    assert path.read_text() == "previous"
+    assert [p.name for p in tmp_path.iterdir()] == ["requirements.md"]
@@ -0,0 +1,122 @@
+"""Tests of the gateway's rate limits and adaptive concurrency."""
+
+import time
+
+import anyio
+import pytest
+from fakes import FakeChatModel, StatusError
+
+from insight.llm.gateway import AIMDLimiter, LLMGateway, TokenBucket, with_gateway
+
+pytestmark = pytest.mark.anyio
+
+
+async def _call(limiter: AIMDLimiter, latency: float = 0, throttled=False) -> None:
+    await limiter.acquire()
+    await limiter.release(latency, throttled)
+
+
+async def test_rate_limit_halves_the_limit():
+    """A 429 halves the concurrency limit, down to the minimum."""
+    limiter = AIMDLimiter(8)
+
+    await _call(limiter, throttled=True)
+    assert limiter.limit == 4
+    for _ in range(3):
+        await _call(limiter, throttled=True)
+    assert limiter.limit == 1
+    assert limiter.throttled == 4
+
+
+async def test_slow_call_lowers_the_limit_gently():
+    """A call over the latency target cuts the limit by a tenth."""
+    limiter = AIMDLimiter(10, latency_target=1)
+
+    await _call(limiter, latency=2)
+    assert limiter.limit == pytest.approx(9)
+    await _call(limiter, latency=0.5)
+    assert limiter.limit > 9
+
+
+async def test_limit_recovers_additively():
+    """Successful calls raise the limit by one per window, up to the maximum."""
+    limiter = AIMDLimiter(8)
+    await _call(limiter, throttled=True)
+
+    for _ in range(4):
+        await _call(limiter)
+    assert 4.9 < limiter.limit < 5.1
+    for _ in range(100):
+        await _call(limiter)
+    assert limiter.limit == 8
+
+
+async def test_calls_over_the_limit_wait_for_a_slot():
+    """A call waits while the limit's worth of calls is in flight."""
+    limiter = AIMDLimiter(1)
+    await limiter.acquire()
+
+    with pytest.raises(TimeoutError), anyio.fail_after(0.05):
+        await limiter.acquire()
+    assert limiter.waiting == 0
+
+    await limiter.release(0)
+    with anyio.fail_after(0.05):
+        await limiter.acquire()
+    assert limiter.in_flight == 1
+
+
+async def test_empty_bucket_waits_for_the_refill():
+    """An empty bucket delays the next caller until enough tokens refilled."""
+    bucket = TokenBucket(6000)  # 100 tokens a second
+    await bucket.acquire(6000)
+
+    start = time.perf_counter()
+    await bucket.acquire(5)
+    assert 0.03 < time.perf_counter() - start < 0.3
+
+
+async def test_debt_delays_later_callers():
+    """Usage charged after a call takes the bucket into debt."""
+    bucket = TokenBucket(6000)
+    await bucket.acquire(6000)
+    bucket.debit(10)
+    assert bucket.available < 0
+
+    start = time.perf_counter()
+    await bucket.acquire(5)
+    assert 0.12 < time.perf_counter() - start < 0.5
+
+
+async def test_request_larger_than_the_bucket_waits_for_a_full_bucket():
+    """A request above the capacity is capped at it rather than waiting forever."""
+    bucket = TokenBucket(60)
+
+    with anyio.fail_after(0.1):
+        await bucket.acquire(1000)
+    assert bucket.available < 1
+
+
+async def test_rate_limited_call_halves_the_gateway_limit():
+    """A provider's 429 reaches the gateway's limiter."""
+    llm = with_gateway(FakeChatModel(errors=[StatusError(429)]))
+    llm.gateway = LLMGateway(rpm=1000, tpm=1_000_000, max_concurrency=8)
+
+    with pytest.raises(StatusError):
+        await llm.ainvoke("hello")
+
+    snapshot = llm.gateway.snapshot()
+    assert (snapshot["concurrency_limit"], snapshot["throttled"]) == (4, 1)
+    assert snapshot["in_flight"] == 0
+
+
+@pytest.mark.parametrize(
+    "variable", ["INSIGHT_LLM_RPM", "INSIGHT_OPENAI_TPM", "INSIGHT_LLM_MAX_CONCURRENCY"]
+)
+@pytest.mark.parametrize("value", ["0", "0.5", "-1"])
+def test_limits_below_one_are_rejected(variable, value, monkeypatch):
+    """A limit of 0 would stall the gateway, so it is refused at startup."""
+    monkeypatch.setenv(variable, value)
+
+    with pytest.raises(ValueError, match=f"{variable} must be at least 1"):
+        LLMGateway.from_env("openai")
@@ -0,0 +1,106 @@
+"""Tests of background job recovery."""
+
+import asyncio
+import os
+
+import anyio
+import pytest
+from mcp.types import TextContent
+
+from insight import jobs
+from insight.jobs import JobRecord, JobScheduler, JobStore
+
+pytestmark = pytest.mark.anyio
+
+
+async def _run(tool: str, arguments: dict):
+    return [TextContent(type="text", text=f"{tool} done")]
+
+
+@pytest.fixture
+def path(tmp_path):
+    """Path of an empty job database."""
+    return str(tmp_path / "jobs.sqlite3")
+
+
+async def _stop(scheduler: JobScheduler) -> None:
+    for worker in scheduler._workers:
+        worker.cancel()
+    await asyncio.gather(*scheduler._workers, return_exceptions=True)
+
+
+@pytest.fixture
+async def scheduler(path):
+    """A scheduler whose workers are stopped after the test."""
+    scheduler = JobScheduler(_run, path)
+    yield scheduler
+    await _stop(scheduler)
+
+
+async def test_jobs_of_earlier_server_with_same_pid_are_failed(path, scheduler):
+    """A restarted server with its predecessor's pid fails the orphaned jobs."""
+    store = JobStore(path)
+    store.save(
+        JobRecord("orphan", "assess_requirements", {}, status="running", instance="old")
+    )
+
+    record = await scheduler.get("orphan")
+
+    assert record.pid == os.getpid()
+    assert record.status == "failed"
+    assert record.error == "The server stopped before the job finished"
+
+
+async def test_own_jobs_survive_recovery(scheduler):
+    """Recovery leaves the active jobs of the running scheduler alone."""
+    await scheduler._start()
+    record = JobRecord(
+        "own", "assess_requirements", {}, status="running", instance=scheduler.instance
+    )
+    scheduler._store.save(record)
+
+    assert scheduler._store.recover(3600, scheduler.instance) == 0
+    assert scheduler._store.load("own").status == "running"
+
+
+async def test_job_result_is_stored(scheduler):
+    """A finished job's result is served from the database."""
+    record = await scheduler.submit("assess_requirements", {})
+
+    with anyio.fail_after(2):
+        while record.id in scheduler.jobs:
+            await anyio.sleep(0.01)
+
+    stored = await scheduler.get(record.id)
+    assert stored.instance == scheduler.instance
+    assert (stored.status, stored.result) == ("succeeded", ["assess_requirements done"])
+
+
+async def test_job_is_cancelled_through_another_worker(path, monkeypatch):
+    """A cancel request reaching another worker is carried out by the job's owner."""
+    monkeypatch.setattr(jobs, "CANCEL_POLL_INTERVAL", 0.01)
+    started = asyncio.Event()
+
+    async def run_forever(tool: str, arguments: dict):
+        started.set()
+        await asyncio.Event().wait()
+
+    owner = JobScheduler(run_forever, path)
+    other = JobScheduler(_run, path)
+    try:
+        await other._start()
+        record = await owner.submit("assess_requirements", {})
+        with anyio.fail_after(1):
+            await started.wait()
+
+        requested = await other.cancel(record.id)
+        assert requested.status_dict()["cancel_requested"] is True
+
+        with anyio.fail_after(1):
+            while record.id in owner.jobs:
+                await anyio.sleep(0.01)
+        assert (await other.get(record.id)).status == "cancelled"
+        assert owner._store.take_cancel_requests([record.id]) == []
+    finally:
+        await _stop(owner)
+        await _stop(other)
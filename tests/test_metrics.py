@@ -0,0 +1,51 @@
+"""Tests of the per-tool metrics."""
+
+import anyio
+import pytest
+
+from insight import fileio
+from insight.metrics import MetricsRegistry
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_textfile_is_written_from_a_copy(tmp_path, monkeypatch):
+    """The I/O thread renders a copy of the counters, never the live ones."""
+    textfile = tmp_path / "insight.prom"
+    registry = MetricsRegistry(textfile=str(textfile), textfile_interval=0)
+    written = []
+
+    async def run_io(func, *args):
+        written.append(args)
+        # Counters that change after the copy must not reach the file
+        registry.tools["assess_requirements"].calls += 10
+        return func(*args)
+
+    monkeypatch.setattr(fileio, "run_io", run_io)
+
+    with registry.track("assess_requirements"):
+        pass
+    with anyio.fail_after(1):
+        while not textfile.exists():
+            await anyio.sleep(0.01)
+
+    (own,) = written[0]
+    assert own["assess_requirements"]["calls"] == 1
+    assert 'insight_tool_calls_total{tool="assess_requirements"} 1\n' in (
+        textfile.read_text()
+    )
+
+
+async def test_background_writes_are_held_until_done(tmp_path):
+    """The event loop holds tasks weakly; the registry keeps its own reference."""
+    textfile = tmp_path / "insight.prom"
+    registry = MetricsRegistry(textfile=str(textfile), textfile_interval=0)
+
+    with registry.track("assess_requirements"):
+        pass
+    assert len(registry._tasks) == 1
+
+    with anyio.fail_after(1):
+        while registry._tasks:
+            await anyio.sleep(0.01)
+    assert textfile.exists()
@@ -0,0 +1,196 @@
+"""Tests of hedging, failover and circuit breaking across pooled backends."""
+
+import asyncio
+import json
+import time
+
+import anyio
+import pytest
+from fakes import FakeChatModel, StatusError
+from mcp.shared.memory import create_connected_server_and_client_session
+
+from insight.llm.pool import Backend, CircuitBreaker, Permit, PooledChatModel
+from insight.metrics import METRICS_URI
+from insight.server import WorkflowServer
+
+pytestmark = pytest.mark.anyio
+
+
+def _pool(*models, hedge_after: float = 5, failures: int = 5, reset: float = 30):
+    return PooledChatModel(
+        backends=[
+            Backend(llm, breaker=CircuitBreaker(failures, reset)) for llm in models
+        ],
+        hedge_after=hedge_after,
+    )
+
+
+def _model(name: str, **kwargs) -> FakeChatModel:
+    return FakeChatModel(model_name=name, response=f"answer from {name}", **kwargs)
+
+
+async def _stream(pool: PooledChatModel) -> str:
+    return "".join([str(chunk.content) async for chunk in pool.astream("hello")])
+
+
+async def test_slow_backend_is_hedged():
+    """A request slower than the hedge delay is answered by the next backend."""
+    slow = _model("slow", first_token_latency=2)
+    fast = _model("fast")
+    pool = _pool(slow, fast, hedge_after=0.05)
+
+    start = time.perf_counter()
+    with anyio.fail_after(1):
+        message = await pool.ainvoke("hello")
+
+    assert message.content == "answer from fast"
+    assert time.perf_counter() - start < 1
+    assert (slow.calls, fast.calls) == (1, 1)
+    # The losing request was cancelled
+    assert slow.open_streams == 0
+
+
+async def test_hedged_stream_stays_with_first_chunk():
+    """A hedged stream comes from the backend with the first chunk only."""
+    slow = _model("slow", first_token_latency=2)
+    fast = _model("fast", chunk_delay=0.01)
+    pool = _pool(slow, fast, hedge_after=0.05)
+
+    with anyio.fail_after(1):
+        text = await _stream(pool)
+
+    assert text == "answer from fast"
+    assert slow.open_streams == fast.open_streams == 0
+
+
+@pytest.mark.parametrize("offset", [-0.002, 0, 0.002])
+async def test_losing_streams_are_closed(offset):
+    """Streams that lose a close race are closed, not left open."""
+    first = _model("first", first_token_latency=0.02 + offset)
+    second = _model("second", first_token_latency=0.01)
+    pool = _pool(first, second, hedge_after=0.01)
+
+    with anyio.fail_after(1):
+        text = await _stream(pool)
+
+    assert text in ("answer from first", "answer from second")
+    assert first.open_streams == second.open_streams == 0
+
+
+async def test_result_finished_during_cancellation_is_released():
+    """A request that finished just as the race was cancelled is discarded."""
+    pool = _pool(_model("first"), _model("second"))
+    discarded = []
+
+    async def call(llm):
+        # The request finishes in the same step as the race is cancelled
+        race.cancel()
+        return llm.model_name
+
+    async def discard(result):
+        discarded.append(result)
+
+    race = asyncio.create_task(pool._race("invoke", call, discard))
+    with pytest.raises(asyncio.CancelledError):
+        await race
+
+    assert discarded == ["first"]
+
+
+async def test_failed_backend_fails_over():
+    """A backend that fails hands the request over to the next one."""
+    failing = _model("failing", errors=[StatusError(500)])
+    healthy = _model("healthy")
+    pool = _pool(failing, healthy)
+
+    message = await pool.ainvoke("hello")
+
+    assert message.content == "answer from healthy"
+    assert [b["failures"] for b in pool.snapshot()] == [1, 0]
+
+
+async def test_last_error_is_raised_when_every_backend_fails():
+    """With no backend left, the request fails with the last error."""
+    pool = _pool(
+        _model("first", errors=[StatusError(500)]),
+        _model("second", errors=[StatusError(503)]),
+    )
+
+    with pytest.raises(StatusError, match="503"):
+        await pool.ainvoke("hello")
+
+
+async def test_breaker_opens_and_recovers():
+    """A failing backend is skipped once its circuit opens, then trialled."""
+    failing = _model("failing", errors=[StatusError(500), StatusError(500)])
+    healthy = _model("healthy")
+    pool = _pool(failing, healthy, failures=2, reset=0.1)
+
+    for _ in range(2):
+        await pool.ainvoke("hello")
+    assert pool.snapshot()[0]["circuit"] == "open"
+
+    # The open circuit sends requests straight to the next backend
+    message = await pool.ainvoke("hello")
+    assert message.content == "answer from healthy"
+    assert failing.calls == 2
+
+    await anyio.sleep(0.1)
+    assert pool.snapshot()[0]["circuit"] == "half_open"
+    message = await pool.ainvoke("hello")
+    assert message.content == "answer from failing"
+    assert pool.snapshot()[0]["circuit"] == "closed"
+
+
+async def test_cancelled_hedge_keeps_the_trial_slot():
+    """A losing request that is not the half-open trial does not free its slot."""
+    slow = _model("slow", first_token_latency=1)
+    pool = _pool(slow, _model("fast"), hedge_after=0.05, failures=1, reset=0)
+    breaker = pool.backends[0].breaker
+
+    request = asyncio.create_task(pool.ainvoke("hello"))
+    while not slow.calls:
+        await asyncio.sleep(0)
+    # The circuit opens while the request is in flight and another request
+    # takes the trial
+    breaker.record_failure(Permit())
+    trial = breaker.allow()
+    assert trial is not None and trial.trial
+
+    with anyio.fail_after(1):
+        message = await request
+    assert message.content == "answer from fast"
+    assert slow.open_streams == 0
+
+    # The cancelled request held no trial, so a second trial is still refused
+    assert breaker.allow() is None
+    breaker.record_success(trial)
+    assert breaker.state == "closed"
+
+
+async def test_no_backend_available():
+    """A request fails at once when every circuit is open."""
+    model = _model("only", errors=[StatusError(500)])
+    pool = _pool(model, failures=1)
+
+    with pytest.raises(StatusError):
+        await pool.ainvoke("hello")
+    with pytest.raises(ValueError, match="all circuits open: fake/only"):
+        await pool.ainvoke("hello")
+    assert model.calls == 1
+
+
+async def test_backends_are_reported_in_metrics():
+    """The metrics resource shows the circuit state of every pooled backend."""
+    server = WorkflowServer()
+    server.llm = _pool(_model("first", errors=[StatusError(500)]), _model("second"))
+    await server.llm.ainvoke("hello")
+
+    async with create_connected_server_and_client_session(server.server) as session:
+        result = await session.read_resource(METRICS_URI)
+
+    backends = json.loads(result.contents[0].text)["backends"]
+    assert [(b["backend"], b["circuit"], b["failures"]) for b in backends] == [
+        ("fake/first", "closed", 1),
+        ("fake/second", "closed", 0),
+    ]
@@ -0,0 +1,39 @@
+"""Tests of the tool registry."""
+
+import pytest
+from mcp.types import TextContent, Tool
+
+from insight.registry import ToolRegistry
+
+pytestmark = pytest.mark.anyio
+
+
+async def _handler(arguments: dict, llm) -> list:
+    return [TextContent(type="text", text="done")]
+
+
+def _tool(name: str) -> Tool:
+    return Tool(name=name, inputSchema={"type": "object"})
+
+
+async def test_tools_list_serves_the_registry_listing(server, session):
+    """tools/list returns the registered tools in registration order."""
+    result = await session.list_tools()
+
+    assert [tool.name for tool in result.tools] == [
+        tool.name for tool in server.registry.list_tools()
+    ]
+
+
+def test_listing_is_cached_until_the_registry_changes():
+    """The listing is reused until a tool is registered or removed."""
+    registry = ToolRegistry()
+    registry.register(_tool("first"), _handler)
+    listing = registry.list_tools()
+
+    assert registry.list_tools() is listing
+
+    registry.register(_tool("second"), _handler)
+    assert [tool.name for tool in registry.list_tools()] == ["first", "second"]
+    registry.unregister("first")
+    assert [tool.name for tool in registry.list_tools()] == ["second"]
@@ -0,0 +1,96 @@
+"""Tests of recording and replaying LLM responses."""
+
+import time
+
+import pytest
+from fakes import FakeChatModel
+from langchain_core.messages import HumanMessage
+
+from insight.llm import providers
+from insight.llm.cache import ResponseCache
+from insight.llm.replay import ReplayStore, normalize_prompt
+
+pytestmark = pytest.mark.anyio
+
+PROMPT = [HumanMessage(content="Assess these requirements.\n")]
+
+
+@pytest.fixture
+def upstream():
+    """The provider model that is recorded."""
+    return FakeChatModel(model_name="gpt-4o", first_token_latency=0.2, chunk_delay=0.01)
+
+
+@pytest.fixture
+def store_path(tmp_path, monkeypatch, upstream):
+    """Replay store in a temporary directory, recording the fake upstream."""
+    path = tmp_path / "replay.sqlite3"
+    monkeypatch.setenv("INSIGHT_REPLAY_PATH", str(path))
+    monkeypatch.setenv("INSIGHT_REPLAY_PROVIDER", "openai")
+    create = providers.create_chat_model
+
+    def create_chat_model(provider, model=None, temperature=None, max_tokens=None):
+        if provider == "openai":
+            return upstream
+        return create(provider, model, temperature, max_tokens)
+
+    monkeypatch.setattr(providers, "create_chat_model", create_chat_model)
+    return path
+
+
+def _replay_model(monkeypatch, mode: str, scale: str = "1"):
+    monkeypatch.setenv("INSIGHT_REPLAY_MODE", mode)
+    monkeypatch.setenv("INSIGHT_REPLAY_LATENCY_SCALE", scale)
+    return providers.create_chat_model("replay", "gpt-4o")
+
+
+async def _timed_stream(llm, messages) -> "tuple[str, float]":
+    start = time.perf_counter()
+    text = "".join([str(chunk.content) async for chunk in llm.astream(messages)])
+    return text, time.perf_counter() - start
+
+
+async def test_recorded_response_is_replayed(store_path, upstream, monkeypatch):
+    """A recorded response is replayed by prompt, without calling the provider."""
+    recorder = _replay_model(monkeypatch, "record")
+    recorded, _ = await _timed_stream(recorder, PROMPT)
+    assert recorded == upstream.response
+
+    key = ResponseCache.make_key("openai", "gpt-4o", normalize_prompt(PROMPT))
+    record = ReplayStore(str(store_path)).get(key)
+    assert record["content"] == upstream.response
+    assert 0.2 <= record["first_token_seconds"] < record["seconds"] < 1
+
+    # Line endings and trailing whitespace do not change the key
+    player = _replay_model(monkeypatch, "replay")
+    replayed, seconds = await _timed_stream(
+        player, [HumanMessage(content="Assess these requirements.  \r\n")]
+    )
+    assert replayed == upstream.response
+    assert upstream.calls == 1
+    assert record["seconds"] * 0.8 < seconds < record["seconds"] + 0.3
+
+
+async def test_replayed_latency_is_scaled(store_path, monkeypatch):
+    """INSIGHT_REPLAY_LATENCY_SCALE scales the recorded latencies."""
+    await _timed_stream(_replay_model(monkeypatch, "record"), PROMPT)
+    record = ReplayStore(str(store_path)).get(
+        ResponseCache.make_key("openai", "gpt-4o", normalize_prompt(PROMPT))
+    )
+
+    _, halved = await _timed_stream(_replay_model(monkeypatch, "replay", "0.5"), PROMPT)
+    _, immediate = await _timed_stream(
+        _replay_model(monkeypatch, "replay", "0"), PROMPT
+    )
+
+    assert record["seconds"] * 0.4 < halved < record["seconds"] * 0.5 + 0.15
+    assert immediate < 0.1
+
+
+async def test_unrecorded_prompt_fails(store_path, upstream, monkeypatch):
+    """Replaying a prompt that was never recorded names the recorded model."""
+    player = _replay_model(monkeypatch, "replay")
+
+    with pytest.raises(ValueError, match="No recorded response from openai/gpt-4o"):
+        await player.ainvoke(PROMPT)
+    assert upstream.calls == 0
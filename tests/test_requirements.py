@@ -0,0 +1,247 @@
+"""Tests of the requirements handlers."""
+
+import os
+
+import anyio
+import pytest
+
+from insight.handlers import requirements_handlers
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_incremental_assessment_keys_files_by_name(session, model, tmp_path):
+    """Files with the same content but different names are assessed separately."""
+    directory = tmp_path / "requirements"
+    directory.mkdir()
+    for name in ("api.md", "ui.md"):
+        (directory / name).write_text("# Requirements\n1.1 The tool MUST work.\n")
+
+    result = await session.call_tool(
+        "assess_requirements",
+        {"requirements_path": str(directory), "mode": "incremental"},
+    )
+
+    assert not result.isError
+    assert model.calls == 2
+
+
+@pytest.fixture
+def briefs(tmp_path):
+    """Three identical product briefs in separate directories."""
+    paths = []
+    for name in ("a", "b", "c"):
+        directory = tmp_path / name
+        directory.mkdir()
+        path = directory / "brief.md"
+        path.write_text("# Brief\nA tool for tracking tasks.\n")
+        paths.append(str(path))
+    return paths
+
+
+async def _progress(session, tool: str, arguments: dict) -> float:
+    reported = [0.0]
+
+    async def record(progress: float, total, message=None) -> None:
+        reported[0] = max(reported[0], progress)
+
+    result = await session.call_tool(tool, arguments, progress_callback=record)
+    assert not result.isError, result.content[0].text
+    return reported[0]
+
+
+async def test_batch_sharing_work_reports_progress_once(session, model, briefs):
+    """Runs of one batch that share work do not count its progress twice."""
+    model.chunk_delay = 0.005
+    batch = await _progress(
+        session, "generate_requirements_batch", {"brief_paths": briefs[:2]}
+    )
+    single = await _progress(
+        session, "generate_requirements", {"brief_path": briefs[2]}
+    )
+
+    assert model.calls == 4
+    assert batch == single > 0
+
+
+async def test_batch_rejects_zero_concurrency(briefs, model):
+    """An explicit max_concurrency of 0 is rejected, not replaced by the default."""
+    with pytest.raises(ValueError, match="max_concurrency must be at least 1"):
+        await requirements_handlers.handle_generate_requirements_batch(
+            {"brief_paths": briefs, "max_concurrency": 0}, model
+        )
+    assert model.calls == 0
+
+
+async def test_batch_detects_conflicts_between_spellings_of_a_path(
+    session, model, briefs, monkeypatch
+):
+    """Briefs whose outputs are the same file conflict however they are spelled."""
+    monkeypatch.chdir(os.path.dirname(os.path.dirname(briefs[0])))
+
+    result = await session.call_tool(
+        "generate_requirements_batch",
+        {"brief_paths": ["a/brief.md", "./a/brief.md"]},
+    )
+
+    text = result.content[0].text
+    assert text.startswith("Generated 1 of 2 requirements documents.")
+    assert "- failed: ./a/brief.md: ./a/requirements.md is already generated" in text
+
+
+@pytest.fixture
+def large_requirements(tmp_path, monkeypatch):
+    """A requirements document split into several small chunks."""
+    monkeypatch.setenv("INSIGHT_CHUNK_TOKENS", "80")
+    monkeypatch.setenv("INSIGHT_MAX_CONCURRENCY", "2")
+    path = tmp_path / "requirements.md"
+    path.write_text(
+        "".join(
+            f"## Area {n}\n{n}.1 The tool MUST handle case {n} correctly.\n"
+            for n in range(12)
+        )
+    )
+    return path
+
+
+async def test_map_reduce_limits_concurrent_chunks(session, model, large_requirements):
+    """Chunks are assessed at most INSIGHT_MAX_CONCURRENCY at a time."""
+    model.chunk_delay = 0.01
+
+    result = await session.call_tool(
+        "assess_requirements",
+        {"requirements_path": str(large_requirements), "mode": "map_reduce"},
+    )
+
+    assert not result.isError, result.content[0].text
+    assert model.calls > 3
+    assert model.peak_streams == 2
+
+
+async def test_map_reduce_reduces_every_partial(session, model, large_requirements):
+    """The reduce call receives every chunk's findings and gives the result."""
+    result = await session.call_tool(
+        "assess_requirements",
+        {"requirements_path": str(large_requirements), "mode": "map_reduce"},
+    )
+
+    parts = model.calls - 1
+    chunk_prompts, reduce_prompt = model.prompts[:-1], model.prompts[-1]
+    # Every requirement reaches exactly one chunk
+    for n in range(12):
+        assert sum(f"MUST handle case {n} " in p for p in chunk_prompts) == 1
+    for part in range(1, parts + 1):
+        assert f"## Part {part} of {parts}" in reduce_prompt
+    assert result.content[0].text == model.response
+
+
+async def test_follower_gets_progress_of_its_own_flight_only(session, model, tmp_path):
+    """A call joining one file's work is not told of the other files' progress."""
+    model.chunk_delay = 0.02
+    both, one = tmp_path / "both", tmp_path / "one"
+    for directory, names in ((both, ("a.md", "b.md")), (one, ("a.md",))):
+        directory.mkdir()
+        for name in names:
+            (directory / name).write_text(f"# {name}\n1.1 The tool MUST work.\n")
+    arguments = {"mode": "incremental"}
+    progress = {}
+
+    async def assess(name, directory) -> None:
+        progress[name] = await _progress(
+            session,
+            "assess_requirements",
+            {**arguments, "requirements_path": str(directory)},
+        )
+
+    async with anyio.create_task_group() as tg:
+        tg.start_soon(assess, "both", both)
+        with anyio.fail_after(1):
+            while model.open_streams < 2:
+                await anyio.sleep(0.005)
+        tg.start_soon(assess, "one", one)
+
+    words = len(model.response.split(" "))
+    assert model.calls == 2
+    assert progress["both"] == 2 * words
+    assert 0 < progress["one"] <= words
+
+
+@pytest.fixture
+def requirements_dir(tmp_path):
+    """A directory of six requirements files."""
+    directory = tmp_path / "requirements"
+    directory.mkdir()
+    for n in range(6):
+        (directory / f"area{n}.md").write_text(f"# Area {n}\n{n}.1 It MUST work.\n")
+    return directory
+
+
+async def _assess(session, directory, **arguments) -> str:
+    result = await session.call_tool(
+        "assess_requirements",
+        {"requirements_path": str(directory), "mode": "incremental", **arguments},
+    )
+    assert not result.isError, result.content[0].text
+    return result.content[0].text
+
+
+async def test_incremental_reassesses_only_changed_files(
+    session, model, requirements_dir
+):
+    """Without the response cache, a second run assesses only the changed file."""
+    first = await _assess(session, requirements_dir)
+    assert "Re-assessed 6 of 6 files." in first
+
+    (requirements_dir / "area3.md").write_text("# Area 3\n3.1 It MUST work fast.\n")
+    second = await _assess(session, requirements_dir)
+
+    assert model.calls == 7
+    assert "area3.md" in model.prompts[-1]
+    assert "Re-assessed 1 of 6 files; 5 unchanged since their last assessment." in (
+        second
+    )
+
+
+async def test_bypass_cache_reassesses_every_file(session, model, requirements_dir):
+    """bypass_cache assesses unchanged files again."""
+    await _assess(session, requirements_dir)
+
+    report = await _assess(session, requirements_dir, bypass_cache=True)
+
+    assert model.calls == 12
+    assert "Re-assessed 6 of 6 files." in report
+
+
+async def test_cached_and_shared_files_are_reported_apart(
+    session, model, requirements_dir, tmp_path, monkeypatch
+):
+    """Files from the response cache or a concurrent call are not called unchanged."""
+    monkeypatch.setenv("INSIGHT_CACHE_ENABLED", "true")
+    monkeypatch.setenv("INSIGHT_CACHE_DIR", str(tmp_path / "cache"))
+    model.chunk_delay = 0.02
+    copies = [tmp_path / "concurrent", tmp_path / "later"]
+    for copy in copies:
+        copy.mkdir()
+        for path in requirements_dir.iterdir():
+            (copy / path.name).write_text(path.read_text())
+    reports = {}
+
+    async def assess(directory) -> None:
+        reports[directory.name] = await _assess(session, directory)
+
+    async with anyio.create_task_group() as tg:
+        tg.start_soon(assess, requirements_dir)
+        with anyio.fail_after(1):
+            while model.open_streams < 4:
+                await anyio.sleep(0.005)
+        tg.start_soon(assess, copies[0])
+    await assess(copies[1])
+
+    assert model.calls == 6
+    assert "Re-assessed 6 of 6 files." in reports["requirements"]
+    assert "Re-assessed 0 of 6 files; 6 shared with a concurrent assessment." in (
+        reports["concurrent"]
+    )
+    assert "Re-assessed 0 of 6 files; 6 served from the response cache." in (
+        reports["later"]
+    )
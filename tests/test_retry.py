@@ -0,0 +1,132 @@
+"""Tests of retries with backoff, jitter and a retry budget."""
+
+import time
+
+import pytest
+from fakes import FakeChatModel, StatusError
+
+from insight.llm.gateway import LLMGateway, with_gateway
+from insight.llm.retry import RetryBudget, RetryPolicy
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.mark.parametrize("retry, ceiling", [(0, 0.5), (1, 1.0), (2, 2.0)])
+def test_backoff_is_jittered_below_the_ceiling(retry, ceiling):
+    """Each retry waits a random time up to a ceiling that doubles per retry."""
+    policy = RetryPolicy(attempts=10, base_delay=0.5)
+
+    delays = [policy.delay(StatusError(503), retry) for _ in range(200)]
+
+    assert all(0 <= delay <= ceiling for delay in delays)
+    assert len(set(delays)) > 1
+    assert max(delays) > ceiling / 2
+
+
+def test_backoff_is_capped_at_max_delay():
+    """The backoff ceiling stops growing at max_delay."""
+    policy = RetryPolicy(attempts=20, base_delay=0.5, max_delay=2)
+
+    assert all(policy.delay(StatusError(503), 10) <= 2 for _ in range(200))
+
+
+def test_retry_after_takes_precedence_over_a_shorter_backoff():
+    """A provider's Retry-After is waited for even if the backoff is shorter."""
+    policy = RetryPolicy(base_delay=0.01)
+
+    assert policy.delay(StatusError(429, {"retry-after": "3"}), 0) == 3
+    assert policy.delay(StatusError(429, {"retry-after-ms": "1500"}), 0) == 1.5
+
+
+def test_retry_after_beyond_max_delay_is_not_retried():
+    """A call asked to wait longer than max_delay fails instead."""
+    policy = RetryPolicy(max_delay=5)
+
+    assert policy.delay(StatusError(429, {"retry-after": "60"}), 0) is None
+
+
+def test_only_transient_errors_within_the_attempts_are_retried():
+    """Permanent errors and calls out of attempts are not retried."""
+    policy = RetryPolicy(attempts=3)
+
+    assert policy.delay(StatusError(400), 0) is None
+    assert policy.delay(StatusError(503), 1) is not None
+    assert policy.delay(StatusError(503), 2) is None
+
+
+def test_budget_runs_out_within_the_window():
+    """Retries beyond the minimum plus the share of calls are denied."""
+    budget = RetryBudget(ratio=0.5, minimum=1, window=10)
+    for _ in range(4):
+        budget.record_call()
+
+    # One retry from the minimum, two from half of the four calls
+    assert [budget.spend() for _ in range(4)] == [True, True, True, False]
+    assert budget.snapshot() == {
+        "window_calls": 4,
+        "window_retries": 3,
+        "denied": 1,
+    }
+
+
+def test_budget_recovers_once_retries_leave_the_window(monkeypatch):
+    """Retries older than the window no longer count against the budget."""
+    now = [1000.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    budget = RetryBudget(ratio=0, minimum=1, window=10)
+
+    assert budget.spend()
+    assert not budget.spend()
+    now[0] += 10
+    assert budget.spend()
+
+
+def _gateway(attempts: int = 3) -> LLMGateway:
+    return LLMGateway(
+        rpm=1000,
+        tpm=1_000_000,
+        max_concurrency=4,
+        retry=RetryPolicy(attempts=attempts, base_delay=0.001),
+        budget=RetryBudget(),
+    )
+
+
+async def test_transient_failure_is_retried():
+    """A call that fails with a transient error succeeds on its retry."""
+    model = FakeChatModel(errors=[StatusError(503)])
+    llm = with_gateway(model)
+    llm.gateway = _gateway()
+
+    message = await llm.ainvoke("hello")
+
+    assert message.content == model.response
+    assert model.calls == 2
+    assert llm.gateway.retries == 1
+
+
+async def test_stream_is_retried_before_its_first_chunk():
+    """A stream that fails before any output is sent again."""
+    model = FakeChatModel(errors=[StatusError(503)])
+    llm = with_gateway(model)
+    llm.gateway = _gateway()
+
+    text = "".join([str(chunk.content) async for chunk in llm.astream("hello")])
+
+    assert text == model.response
+    assert model.calls == 2
+
+
+async def test_stream_is_not_retried_after_its_first_chunk():
+    """A stream that fails after output reached the caller is not repeated."""
+    model = FakeChatModel(stream_error=StatusError(503))
+    llm = with_gateway(model)
+    llm.gateway = _gateway()
+    chunks = []
+
+    with pytest.raises(StatusError):
+        async for chunk in llm.astream("hello"):
+            chunks.append(chunk.content)
+
+    assert chunks == ["The "]
+    assert model.calls == 1
+    assert llm.gateway.retries == 0
@@ -0,0 +1,66 @@
+"""Tests of per-step model selection."""
+
+import pytest
+from fakes import FakeChatModel, StatusError
+
+from insight.llm.gateway import with_gateway
+from insight.llm.models import unwrap_llm
+from insight.llm.pool import PooledChatModel
+from insight.llm.tiering import step_llm
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def pool():
+    """A pool whose primary backend fails its next call."""
+    return PooledChatModel.from_models(
+        [
+            with_gateway(
+                FakeChatModel(
+                    model_name="primary",
+                    response="answer from primary",
+                    errors=[StatusError(400)],
+                )
+            ),
+            with_gateway(
+                FakeChatModel(model_name="secondary", response="answer from secondary")
+            ),
+        ]
+    )
+
+
+async def test_step_settings_keep_the_pool(pool, monkeypatch):
+    """A step that only changes settings is pooled over every backend."""
+    monkeypatch.setenv(
+        "INSIGHT_STEP_MODELS", '{"assess_requirements": {"max_tokens": 64}}'
+    )
+
+    llm = step_llm(pool, "assess_requirements", "assess")
+
+    assert isinstance(llm, PooledChatModel)
+    models = [unwrap_llm(backend.llm) for backend in llm.backends]
+    assert [(m.model_name, m.max_tokens) for m in models] == [
+        ("primary", 64),
+        ("secondary", 64),
+    ]
+    message = await llm.ainvoke("hello")
+    assert message.content == "answer from secondary"
+
+
+def test_named_step_model_leaves_the_pool(pool, monkeypatch):
+    """A step that names a model runs on that model alone."""
+    monkeypatch.setenv(
+        "INSIGHT_STEP_MODELS", '{"assess_requirements": {"model": "small"}}'
+    )
+    monkeypatch.setattr(
+        "insight.llm.providers.create_chat_model",
+        lambda provider, model, temperature, max_tokens: FakeChatModel(
+            model_name=model, max_tokens=max_tokens
+        ),
+    )
+
+    llm = step_llm(pool, "assess_requirements", "assess")
+
+    assert not isinstance(llm, PooledChatModel)
+    assert unwrap_llm(llm).model_name == "small"
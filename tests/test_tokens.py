@@ -0,0 +1,56 @@
+"""Tests of tokenizer loading."""
+
+import time
+
+import pytest
+import tiktoken.load
+from fakes import FakeChatModel
+
+from insight.llm import tokens
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def openai_model():
+    """A fake model described as an OpenAI model."""
+    return FakeChatModel(llm_type="openai-chat", model_name="gpt-4o")
+
+
+@pytest.fixture
+def offline(monkeypatch):
+    """Fail any attempt of tiktoken to download an encoding."""
+
+    def download(blobpath: str) -> bytes:
+        raise AssertionError(f"tiktoken downloaded {blobpath}")
+
+    monkeypatch.setattr(tiktoken.load, "read_file", download)
+
+
+async def test_uncached_encoding_is_not_downloaded(
+    openai_model, offline, tmp_path, monkeypatch
+):
+    """Without the BPE file in the local cache, tokens are estimated."""
+    monkeypatch.setenv("TIKTOKEN_CACHE_DIR", str(tmp_path))
+
+    await tokens.load_tokenizer(openai_model)
+
+    assert tokens.get_token_counter(openai_model) is tokens.estimate_tokens
+
+
+async def test_slow_encoding_load_falls_back_to_estimate(openai_model, monkeypatch):
+    """A tokenizer that does not load in time leaves the model on the estimate."""
+    monkeypatch.setattr(tokens, "ENCODING_LOAD_TIMEOUT", 0.05)
+    monkeypatch.setattr(tokens, "_load_encoding", lambda model: time.sleep(0.3))
+
+    start = time.perf_counter()
+    await tokens.load_tokenizer(openai_model)
+
+    assert time.perf_counter() - start < 0.25
+    assert tokens.get_token_counter(openai_model) is tokens.estimate_tokens
+
+
+def test_unloaded_tokenizer_is_estimated(openai_model, offline):
+    """Counting never loads a tokenizer itself."""
+    assert tokens.get_token_counter(openai_model) is tokens.estimate_tokens
+    assert tokens._encodings == {}